@@ -131,6 +131,14 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
+    # Token bucket theo user/IP (movies/throttling.py): "N/period" = tối đa N request liền, hồi N mỗi period
+    'DEFAULT_THROTTLE_RATES': {
+        'view_increment': os.getenv('THROTTLE_VIEW_INCREMENT', '60/min'),
+        'keyword_extract': os.getenv('THROTTLE_KEYWORD_EXTRACT', '20/min'),
+        'chat': os.getenv('THROTTLE_CHAT', '10/min'),
+    },
+    # increment_view lặp lại từ cùng client cho cùng phim trong N giây chỉ tính 1 lần (0 = tắt)
+    'VIEW_DEDUPE_WINDOW': int(os.getenv('VIEW_DEDUPE_WINDOW', 30)),
 }
 
 # JWT Settings
@@ -152,6 +160,51 @@ TMDB_API_KEY = os.getenv('TMDB_API_KEY')
 TMDB_BASE_URL = "https://api.themoviedb.org/3"
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+# Typeahead: prefix index tiêu đề phim được build lại sau tối đa N giây (để cập nhật thứ tự theo views)
+SUGGEST_INDEX_MAX_AGE = int(os.getenv('SUGGEST_INDEX_MAX_AGE', 300))
+
+# Facet counts (thể loại/quốc gia/năm) được cache N giây; bị xóa sớm hơn khi phim/thể loại/quốc gia thay đổi
+FACET_CACHE_TIMEOUT = int(os.getenv('FACET_CACHE_TIMEOUT', 600))
+
+# Lượt xem được gom trong bộ nhớ mỗi worker, thread nền ghi DB theo lô N giây sau lượt đầu tiên (và khi tắt process)
+VIEW_COUNTER_FLUSH_INTERVAL = float(os.getenv('VIEW_COUNTER_FLUSH_INTERVAL', 5))
+
+# Play events theo giờ giữ N ngày rồi rollup theo ngày (manage.py rollup_play_events); trending cache N giây
+PLAY_EVENTS_HOURLY_DAYS = int(os.getenv('PLAY_EVENTS_HOURLY_DAYS', 14))
+TRENDING_CACHE_SECONDS = int(os.getenv('TRENDING_CACHE_SECONDS', 300))
+
+# Heartbeat vị trí xem được gom theo (user, phim), thread nền ghi DB theo lô N giây sau heartbeat đầu tiên
+WATCH_PROGRESS_FLUSH_INTERVAL = float(os.getenv('WATCH_PROGRESS_FLUSH_INTERVAL', 15))
+
+# Số mục lịch sử xem giữ lại mỗi user, phần cũ hơn chuyển sang WatchHistoryArchive (manage.py compact_watch_history)
+WATCH_HISTORY_KEEP = int(os.getenv('WATCH_HISTORY_KEEP', 200))
+
+# Snapshot stats của admin dashboard: mới trong N giây, sau đó trả bản cũ và tính lại nền; quá MAX_STALE thì tính đồng bộ
+DASHBOARD_STATS_TTL = int(os.getenv('DASHBOARD_STATS_TTL', 30))
+DASHBOARD_STATS_MAX_STALE = int(os.getenv('DASHBOARD_STATS_MAX_STALE', 600))
+
+# Chatbot: bộ lọc LLM trích từ message được cache N giây; chờ LLM tối đa TIMEOUT giây rồi dùng KeywordExtractor
+CHAT_FILTER_CACHE_SECONDS = int(os.getenv('CHAT_FILTER_CACHE_SECONDS', 3600))
+CHAT_FILTER_TIMEOUT = float(os.getenv('CHAT_FILTER_TIMEOUT', 4))
+# Parser local đạt độ tin cậy >= ngưỡng này thì bỏ qua lượt gọi LLM phân tích bộ lọc
+CHAT_LOCAL_CONFIDENCE = float(os.getenv('CHAT_LOCAL_CONFIDENCE', 0.75))
+
+# OpenAI client (movies/openai_client.py): hạn chót mỗi call tính cả retry, pool kết nối keep-alive,
+# circuit breaker mở sau N lỗi liên tiếp phía provider và từ chối call trong RESET giây
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+OPENAI_DEADLINE = float(os.getenv('OPENAI_DEADLINE', 10))
+OPENAI_POOL_SIZE = int(os.getenv('OPENAI_POOL_SIZE', 10))
+OPENAI_BREAKER_FAILURES = int(os.getenv('OPENAI_BREAKER_FAILURES', 5))
+OPENAI_BREAKER_RESET = float(os.getenv('OPENAI_BREAKER_RESET', 30))
+
+# LLM của chatbot: 'openai' hoặc 'stub' (giả lập cục bộ cho load test, xem movies/llm_backends.py)
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'openai')
+LLM_STUB = {
+    'latency_ms': int(os.getenv('LLM_STUB_LATENCY_MS', 300)),
+    'jitter_ms': int(os.getenv('LLM_STUB_JITTER_MS', 100)),
+    'error_rate': float(os.getenv('LLM_STUB_ERROR_RATE', 0)),
+}
+
 
 # --- CORS & CSRF CONFIGURATION (QUAN TRỌNG CHO DEPLOY) ---
 
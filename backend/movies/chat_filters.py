@@ -0,0 +1,150 @@
+"""
+Movie filter extraction (genres / country / year / keyword) for the chatbot.
+
+Messages are parsed locally first (intent_parser.py); when the local confidence
+reaches CHAT_LOCAL_CONFIDENCE the LLM is not called at all. Otherwise the LLM is
+asked with temperature 0, so the same message always gives the same filters:
+results are cached per normalized message (CHAT_FILTER_CACHE_SECONDS).
+Concurrent identical messages share one in-flight call (single-flight), and a
+request waits at most CHAT_FILTER_TIMEOUT seconds for it before falling back to
+the local parse; a late answer still lands in the cache for the next request.
+Without an API key, or when the call fails, the local parse is used anyway.
+stats() reports how many messages were answered locally vs by the LLM.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .intent_parser import intent_parser, DEFAULT_THRESHOLD as DEFAULT_LOCAL_CONFIDENCE
+from .llm_backends import get_backend as get_llm_backend
+
+CACHE_KEY = 'chat:filters:{}'
+DEFAULT_CACHE_SECONDS = 3600
+DEFAULT_TIMEOUT = 4.0
+MAX_WORKERS = 4
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_PROMPT = (
+    "Bạn là một trợ lý giúp trích xuất thông tin lọc phim từ câu truy vấn.\n"
+    "Trả về một JSON object với các khóa: genres (array of strings), country (string), "
+    "year (integer or null), keyword (string or null). Nếu không có, trả về {}."
+)
+_JSON_RE = re.compile(r"\{[\s\S]*\}")
+
+
+def normalize_message(message) -> str:
+    """Khóa cache: giữ dấu ('hài' khác 'hai'), bỏ khác biệt hoa/thường, khoảng trắng, dấu câu cuối"""
+    text = unicodedata.normalize('NFC', str(message or '')).lower()
+    return ' '.join(text.split()).strip(' ?!.')
+
+
+def has_filters(filters) -> bool:
+    return bool(filters) and any(filters.values())
+
+
+def parse_llm_filters(text) -> dict:
+    """JSON (có thể lẫn trong text) do LLM trả về -> filters chuẩn"""
+    match = _JSON_RE.search(text)
+    parsed = json.loads(match.group(0) if match else text)
+    year = parsed.get('year')
+    return {
+        'genres': [str(g) for g in parsed.get('genres') or []],
+        'country': parsed.get('country') or None,
+        'year': int(year) if str(year or '').isdigit() else None,
+        'keyword': parsed.get('keyword') or None,
+    }
+
+
+class FilterExtractor:
+    """Parse local trước; LLM (cache + single-flight + deadline) khi local chưa đủ chắc chắn"""
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chat-filters')
+        self._inflight = {}
+        self._lock = threading.RLock()
+        self._stats = Counter()
+
+    def extract(self, message) -> tuple[dict, str]:
+        """Returns (filters, source): source là 'local' | 'cache' | 'llm' | 'fallback'"""
+        local, confidence = intent_parser.parse(message)
+        threshold = getattr(settings, 'CHAT_LOCAL_CONFIDENCE', DEFAULT_LOCAL_CONFIDENCE)
+        if confidence >= threshold:
+            self._count('local')
+            return local, 'local'
+
+        key = CACHE_KEY.format(hashlib.sha1(normalize_message(message).encode('utf-8')).hexdigest())
+        filters = cache.get(key)
+        if filters is not None:
+            self._count('cache')
+            return filters, 'cache'
+
+        if not get_llm_backend().available():
+            self._count('fallback')
+            return local, 'fallback'
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._ask_llm, message)
+                self._inflight[key] = future
+                future.add_done_callback(lambda f: self._finish(key, f))
+            else:
+                self._count('shared')
+
+        try:
+            filters = future.result(timeout=getattr(settings, 'CHAT_FILTER_TIMEOUT', DEFAULT_TIMEOUT))
+        except FutureTimeout:
+            self._count('timeout')
+        except Exception as e:
+            logger.warning("LLM filter extraction failed, using local parse: %s", e)
+            self._count('error')
+        else:
+            self._count('llm')
+            return filters, 'llm'
+
+        self._count('fallback')
+        return local, 'fallback'
+
+    def stats(self) -> dict:
+        """
+        Counters của process này. local_ratio: tỉ lệ message không cần gọi LLM
+        (parse local đủ chắc chắn hoặc trúng cache) trên tổng số message.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        total = sum(stats.get(name, 0) for name in ('local', 'cache', 'llm', 'fallback'))
+        stats['local_ratio'] = round((stats.get('local', 0) + stats.get('cache', 0)) / total, 3) if total else None
+        return stats
+
+    def _ask_llm(self, message):
+        text = get_llm_backend().complete(
+            [{"role": "system", "content": ANALYSIS_PROMPT}, {"role": "user", "content": message}],
+            max_tokens=200,
+            temperature=0.0,
+        )
+        return parse_llm_filters(text)
+
+    def _finish(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        if not future.cancelled() and future.exception() is None:
+            ttl = getattr(settings, 'CHAT_FILTER_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+            cache.set(key, future.result(), ttl)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+
+# Singleton instance
+filter_extractor = FilterExtractor()
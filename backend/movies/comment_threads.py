@@ -0,0 +1,144 @@
+"""
+Comment thread loader.
+
+CommentSerializer used to walk replies recursively (one query per comment per level).
+CommentThread loads the whole thread up front (users joined), fetches the viewer's
+own reactions in one query, links parents/children in memory and hands everything
+to CommentSerializer through the serializer context. Like/dislike counts are
+columns on Comment (see reactions.py), so the reactions table is never aggregated.
+
+for_page() is the lazy variant used with cursor pagination: each comment of the
+page carries its reply_count and only its first N replies, so payload and query
+count stay bounded however large the thread is.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment, CommentReaction, comment_path_upper
+
+INLINE_REPLIES = 3
+MAX_INLINE_REPLIES = 10
+
+
+class CommentThread:
+    """In-memory comment tree + reaction data for serialization"""
+
+    def __init__(self, comments, user=None):
+        self.by_id = {c.id: c for c in comments}
+        self.children = defaultdict(list)
+        for c in sorted(self.by_id.values(), key=lambda c: (c.created_at, c.id)):
+            parent = self.by_id.get(c.parent_id)
+            if parent is not None:
+                c.parent = parent  # gắn cache FK, tránh query parent.user khi serialize
+                self.children[parent.id].append(c)
+        self.reply_counts = {pk: len(replies) for pk, replies in self.children.items()}
+
+        self.user_reactions = {}
+        self._user = user if user is not None and user.is_authenticated else None
+
+    @classmethod
+    def for_movie(cls, movie, user=None):
+        """Toàn bộ bình luận của 1 phim trong 1 query; roots mới nhất trước"""
+        comments = list(Comment.objects.filter(movie=movie).select_related('user').order_by())
+        for c in comments:
+            c.movie = movie
+        thread = cls(comments, user)
+        thread._load_reactions(CommentReaction.objects.filter(comment__movie=movie))
+        thread.roots = sorted(
+            (c for c in comments if c.parent_id is None),
+            key=lambda c: (c.created_at, c.id),
+            reverse=True,
+        )
+        return thread
+
+    @classmethod
+    def for_roots(cls, roots, user=None, include_replies=True):
+        """
+        Load replies (mọi cấp) cho danh sách roots đã có trong 1 query (range trên Comment.path).
+        Roots nên được select_related('user', 'movie', 'parent__user') bởi caller.
+        """
+        roots = list(roots)
+        comments = list(roots)
+        if include_replies and roots:
+            subtrees = Q()
+            for c in roots:
+                path = c.ensure_path()
+                subtrees |= Q(path__gt=path, path__lt=comment_path_upper(path))
+            comments.extend(Comment.objects.filter(subtrees).select_related('user', 'movie').order_by())
+
+        thread = cls(comments, user)
+        if not include_replies:
+            thread.reply_counts = _count_replies([c.id for c in roots])
+        thread._load_reactions(CommentReaction.objects.filter(comment_id__in=list(thread.by_id)))
+        thread.roots = roots
+        return thread
+
+    @classmethod
+    def for_page(cls, roots, user=None, inline_replies=INLINE_REPLIES):
+        """
+        Mỗi comment của trang kèm reply_count và tối đa `inline_replies` replies đầu tiên
+        (replies inline chỉ có reply_count, phần còn lại lấy qua /comments/{id}/replies/).
+        Cố định 4 query: roots (caller), replies đầu + tổng bằng window function,
+        reply_count của replies inline, reactions của user.
+        """
+        roots = list(roots)
+        root_ids = [c.id for c in roots]
+        ranked = list(
+            Comment.objects.filter(parent_id__in=root_ids)
+            .select_related('user', 'movie')
+            .annotate(
+                position=Window(RowNumber(), partition_by=[F('parent_id')],
+                                order_by=[F('created_at').asc(), F('id').asc()]),
+                siblings=Window(Count('id'), partition_by=[F('parent_id')]),
+            )
+            .filter(position__lte=max(inline_replies, 1))
+            .order_by()
+        ) if root_ids else []
+
+        root_counts = {c.parent_id: c.siblings for c in ranked}
+        inline = [c for c in ranked if c.position <= inline_replies]
+
+        thread = cls(roots + inline, user)
+        thread.reply_counts = {pk: root_counts.get(pk, 0) for pk in root_ids}
+        thread.reply_counts.update(_count_replies([c.id for c in inline]))
+        thread._load_reactions(CommentReaction.objects.filter(comment_id__in=list(thread.by_id)))
+        thread.roots = roots
+        return thread
+
+    def _load_reactions(self, reactions):
+        if self._user is not None:
+            self.user_reactions = dict(
+                reactions.filter(user=self._user).values_list('comment_id', 'reaction')
+            )
+
+    def serializer_context(self, context=None):
+        context = dict(context or {})
+        context.update({
+            'comment_children': self.children,
+            'user_reactions': self.user_reactions,
+            'reply_counts': self.reply_counts,
+        })
+        return context
+
+
+def _count_replies(comment_ids):
+    """{comment_id: số replies trực tiếp}, 1 GROUP BY trên index (parent, created_at)"""
+    if not comment_ids:
+        return {}
+    rows = (
+        Comment.objects.filter(parent_id__in=comment_ids)
+        .order_by().values('parent_id').annotate(n=Count('id'))
+    )
+    counts = dict.fromkeys(comment_ids, 0)
+    counts.update((row['parent_id'], row['n']) for row in rows)
+    return counts
+
+
+def inline_replies_param(request):
+    """?replies=N (mặc định INLINE_REPLIES, tối đa MAX_INLINE_REPLIES)"""
+    try:
+        return max(0, min(int(request.query_params.get('replies', INLINE_REPLIES)), MAX_INLINE_REPLIES))
+    except (TypeError, ValueError):
+        return INLINE_REPLIES
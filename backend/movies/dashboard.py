@@ -0,0 +1,273 @@
+"""
+Admin dashboard statistics.
+
+Daily series are built with one `WHERE created >= start GROUP BY TruncDate(created)`
+query per table (a range the created_at indexes can serve) instead of one
+`created__date = day` COUNT per table per day, so the number of queries does not
+depend on the window (7 / 30 / 90 days). Each query is timed and reported.
+
+Closed days are read from the DailyStats rollup (`manage.py rollup_stats`, run
+periodically): the dashboard only scans the source tables from the rollup
+watermark onward, usually just today. Rollup recomputes whole days and overwrites
+them, so re-running it or backfilling any historical range is safe.
+
+The finished payload is cached per window with stale-while-revalidate semantics
+(DashboardSnapshots): polling admin tabs share one snapshot and at most one
+request at a time recomputes it, in the background, while the others keep
+getting the previous snapshot. Each snapshot carries an ETag for 304 responses.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Count, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Movie, Comment, Rating, DailyStats, StatsWatermark
+from .upserts import bulk_upsert
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = (7, 30, 90)
+DEFAULT_WINDOW = 7
+
+
+def parse_window(value):
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_WINDOW
+    return days if days in WINDOWS else DEFAULT_WINDOW
+
+
+class Timer:
+    """Đo thời gian từng query, ms"""
+
+    def __init__(self):
+        self.timings = {}
+
+    def run(self, name, func):
+        started = time.perf_counter()
+        result = func()
+        self.timings[name] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+
+WATERMARK = 'daily_stats'
+
+
+def metrics():
+    """metric -> (queryset, cột thời gian tạo)"""
+    from users.models import User
+
+    return {
+        'comments': (Comment.objects.all(), 'created_at'),
+        'movies': (Movie.objects.all(), 'created_at'),
+        'users': (User.objects.all(), 'date_joined'),
+        'ratings': (Rating.objects.all(), 'created_at'),
+    }
+
+
+def day_start(day):
+    """00:00 (giờ địa phương) của ngày, dạng aware datetime"""
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+def window_start(days, today=None):
+    """00:00 của ngày đầu tiên trong cửa sổ"""
+    today = today or timezone.localdate()
+    return day_start(today - timedelta(days=days - 1))
+
+
+def daily_counts(queryset, field, start, end=None):
+    """{date: count} trong 1 query GROUP BY ngày, created trong [start, end)"""
+    queryset = queryset.filter(**{f'{field}__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{field}__lt': end})
+    rows = (
+        queryset
+        .order_by()
+        .annotate(day=TruncDate(field))
+        .values('day')
+        .annotate(n=Count('pk'))
+        .values_list('day', 'n')
+    )
+    return dict(rows)
+
+
+def daily_series(counts, days, today=None):
+    """Dãy liên tục `days` ngày (ngày không có dữ liệu = 0), cũ nhất trước"""
+    today = today or timezone.localdate()
+    series = []
+    for i in range(days - 1, -1, -1):
+        day = today - timedelta(days=i)
+        series.append({'date': day.strftime('%d/%m'), 'count': counts.get(day, 0)})
+    return series
+
+
+def watermark():
+    """Ngày đầu tiên chưa chốt trong DailyStats, None nếu chưa rollup lần nào"""
+    return StatsWatermark.objects.filter(name=WATERMARK).values_list('day', flat=True).first()
+
+
+def rollup(first_day=None, last_day=None, dry_run=False) -> int:
+    """
+    Tính lại và ghi đè DailyStats cho các ngày [first_day, last_day] (mặc định: từ watermark
+    - hoặc ngày có dữ liệu sớm nhất - tới hôm nay). Mỗi metric 1 query GROUP BY.
+    Chỉ dời watermark khi rollup tới hôm nay. Returns số dòng DailyStats (sẽ) ghi.
+    """
+    today = timezone.localdate()
+    sources = metrics()
+    first_day = first_day or watermark() or _earliest_day(sources) or today
+    last_day = min(last_day or today, today)
+    if first_day > last_day:
+        return 0
+
+    rows = []
+    for metric, (queryset, field) in sources.items():
+        counts = daily_counts(queryset, field, day_start(first_day), day_start(last_day + timedelta(days=1)))
+        day = first_day
+        while day <= last_day:
+            rows.append({'date': day, 'metric': metric, 'count': counts.get(day, 0), 'updated_at': timezone.now()})
+            day += timedelta(days=1)
+    if dry_run:
+        return len(rows)
+
+    with transaction.atomic():
+        written = bulk_upsert(DailyStats, rows, unique_fields=('metric', 'date'), set_fields=('count', 'updated_at'))
+        if last_day == today:
+            # Hôm nay chưa hết ngày: lần sau tính lại từ hôm nay
+            StatsWatermark.objects.update_or_create(name=WATERMARK, defaults={'day': today})
+    return written
+
+
+def _earliest_day(sources):
+    days = []
+    for queryset, field in sources.values():
+        first = queryset.aggregate(first=Min(field))['first']
+        if first is not None:
+            days.append(timezone.localtime(first).date())
+    return min(days) if days else None
+
+
+def window_counts(days, today, timer):
+    """
+    {metric: {date: count}} cho cửa sổ: ngày trước watermark đọc từ DailyStats (1 query),
+    từ watermark tới nay đếm trực tiếp (mỗi bảng 1 query GROUP BY nhỏ).
+    """
+    first_day = today - timedelta(days=days - 1)
+    sources = metrics()
+    counts = {metric: {} for metric in sources}
+
+    live_from = first_day
+    mark = watermark()
+    if mark is not None and mark > first_day:
+        live_from = mark
+        rolled = timer.run('daily_stats', lambda: list(
+            DailyStats.objects.filter(date__gte=first_day, date__lt=mark).values_list('metric', 'date', 'count')
+        ))
+        for metric, day, count in rolled:
+            if metric in counts:
+                counts[metric][day] = count
+
+    for metric, (queryset, field) in sources.items():
+        counts[metric].update(timer.run(metric, lambda: daily_counts(queryset, field, day_start(live_from))))
+    return counts
+
+
+def build_stats(days=DEFAULT_WINDOW):
+    from users.models import User
+
+    timer = Timer()
+    today = timezone.localdate()
+    counts = window_counts(days, today, timer)
+    comments, movies, users, ratings = (counts[m] for m in ('comments', 'movies', 'users', 'ratings'))
+
+    return {
+        'window_days': days,
+        'total_movies': timer.run('total_movies', Movie.objects.count),
+        'total_users': timer.run('total_users', User.objects.count),
+        'total_ratings': timer.run('total_ratings', Rating.objects.count),
+        'today_comments': comments.get(today, 0),
+        'daily_comments': daily_series(comments, days, today),
+        'daily_movies': daily_series(movies, days, today),
+        'daily_users': daily_series(users, days, today),
+        'daily_ratings': daily_series(ratings, days, today),
+        'top_viewed_movies': timer.run(
+            'top_viewed_movies',
+            lambda: list(Movie.objects.order_by('-views')[:5].values('title', 'views', 'poster')),
+        ),
+        'timings_ms': timer.timings,
+    }
+
+
+SNAPSHOT_CACHE_KEY = 'movies:dashboard:{days}'
+REFRESH_LOCK_KEY = 'movies:dashboard:{days}:refreshing'
+REFRESH_LOCK_TIMEOUT = 120
+DEFAULT_TTL = 30
+DEFAULT_MAX_STALE = 600
+VOLATILE_KEYS = ('timings_ms', 'generated_at')
+
+
+class DashboardSnapshots:
+    """
+    Snapshot stats theo cửa sổ trong Django cache:
+    - còn mới (< DASHBOARD_STATS_TTL giây): trả luôn
+    - đã cũ: vẫn trả snapshot cũ; request đầu tiên lấy được lock (cache.add) tính lại trong thread nền
+    - chưa có / quá DASHBOARD_STATS_MAX_STALE: tính đồng bộ (mỗi process chỉ 1 thread tính)
+    Snapshot: {'data', 'etag', 'built_at'}.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def get(self, days, build) -> dict:
+        key = SNAPSHOT_CACHE_KEY.format(days=days)
+        snapshot = cache.get(key)
+        if snapshot is None:
+            with self._lock:
+                snapshot = cache.get(key)
+                if snapshot is None:
+                    snapshot = self._store(days, build)
+        elif time.time() - snapshot['built_at'] >= self.ttl() and cache.add(
+            REFRESH_LOCK_KEY.format(days=days), 1, REFRESH_LOCK_TIMEOUT
+        ):
+            threading.Thread(target=self._refresh, args=(days, build), daemon=True).start()
+        return snapshot
+
+    def ttl(self):
+        return getattr(settings, 'DASHBOARD_STATS_TTL', DEFAULT_TTL)
+
+    def _store(self, days, build):
+        data = build()
+        snapshot = {'data': data, 'etag': snapshot_etag(data), 'built_at': time.time()}
+        max_stale = getattr(settings, 'DASHBOARD_STATS_MAX_STALE', DEFAULT_MAX_STALE)
+        cache.set(SNAPSHOT_CACHE_KEY.format(days=days), snapshot, max(max_stale, self.ttl()))
+        return snapshot
+
+    def _refresh(self, days, build):
+        try:
+            self._store(days, build)
+        except Exception:
+            logger.exception("Error refreshing dashboard stats (%d days)", days)
+        finally:
+            cache.delete(REFRESH_LOCK_KEY.format(days=days))
+            connections.close_all()  # connection DB của thread nền
+
+
+def snapshot_etag(data):
+    """Hash nội dung stats; bỏ qua timings/thời điểm tính để số liệu không đổi vẫn ra cùng ETag"""
+    content = {k: v for k, v in data.items() if k not in VOLATILE_KEYS}
+    raw = json.dumps(content, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.md5(raw).hexdigest()
+
+
+# Singleton instance
+dashboard_snapshots = DashboardSnapshots()
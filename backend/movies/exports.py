@@ -0,0 +1,287 @@
+"""
+Streaming data exports (CSV / JSONL / Parquet, optionally gzip) for offline analysis.
+
+Rows are read with values_list(...).iterator(chunk_size=...) - no model instances,
+no full result set in memory - and encoded one chunk at a time, so memory stays
+flat however many rows are exported. The same generator feeds the admin endpoint
+(StreamingHttpResponse) and the export_data management command.
+
+Movie rows carry their category / actor names, fetched per chunk with one query
+per M2M table. Parquet needs pyarrow (optional); each chunk becomes a row group.
+"""
+import csv
+import io
+import json
+import zlib
+from collections import defaultdict
+from itertools import islice
+
+from .models import Movie, Rating, WatchHistory, Favorite, CommentReaction
+
+CHUNK_SIZE = 2000
+FORMATS = ('csv', 'jsonl', 'parquet')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+LIST_SEPARATOR = '|'  # cột dạng list (categories, actors) trong CSV
+
+
+class ExportError(ValueError):
+    """Dataset / định dạng không hợp lệ hoặc thiếu thư viện"""
+
+
+class Dataset:
+    """Bảng export: columns là [(tên cột, lookup, kiểu)], kiểu: int | str | bool | datetime | list"""
+
+    def __init__(self, queryset, columns, extra=None):
+        self.queryset = queryset
+        self.columns = columns
+        self.extra = extra  # (tên cột, hàm(ids) -> {id: [names]}) cho quan hệ M2M
+
+    @property
+    def names(self):
+        names = [name for name, _, _ in self.columns]
+        return names + [name for name, _ in self.extra or ()]
+
+    @property
+    def kinds(self):
+        return [kind for _, _, kind in self.columns] + ['list'] * len(self.extra or ())
+
+    def rows(self, chunk_size=CHUNK_SIZE):
+        """Iterator các tuple theo thứ tự names"""
+        rows = (
+            self.queryset().order_by('id')
+            .values_list(*[lookup for _, lookup, _ in self.columns])
+            .iterator(chunk_size=chunk_size)
+        )
+        if not self.extra:
+            yield from rows
+            return
+        for chunk in _batches(rows, chunk_size):
+            ids = [row[0] for row in chunk]
+            related = [load(ids) for _, load in self.extra]
+            for row in chunk:
+                yield row + tuple(names.get(row[0], []) for names in related)
+
+
+def _movie_names(through, lookup):
+    def load(movie_ids):
+        names = defaultdict(list)
+        pairs = through.objects.filter(movie_id__in=movie_ids).order_by().values_list('movie_id', lookup)
+        for movie_id, name in pairs:
+            names[movie_id].append(name)
+        return names
+    return load
+
+
+DATASETS = {
+    'movies': Dataset(
+        Movie.objects.all,
+        [
+            ('id', 'id', 'int'),
+            ('tmdb_id', 'tmdb_id', 'int'),
+            ('title', 'title', 'str'),
+            ('original_title', 'original_title', 'str'),
+            ('release_year', 'release_year', 'int'),
+            ('duration', 'duration', 'int'),
+            ('status', 'status', 'str'),
+            ('country', 'country__name', 'str'),
+            ('views', 'views', 'int'),
+            ('created_at', 'created_at', 'datetime'),
+        ],
+        extra=[
+            ('categories', _movie_names(Movie.categories.through, 'category__name')),
+            ('actors', _movie_names(Movie.actors.through, 'actor__name')),
+        ],
+    ),
+    'ratings': Dataset(
+        Rating.objects.all,
+        [
+            ('id', 'id', 'int'),
+            ('user_id', 'user_id', 'int'),
+            ('movie_id', 'movie_id', 'int'),
+            ('stars', 'stars', 'int'),
+            ('created_at', 'created_at', 'datetime'),
+        ],
+    ),
+    'watch_history': Dataset(
+        WatchHistory.objects.all,
+        [
+            ('id', 'id', 'int'),
+            ('user_id', 'user_id', 'int'),
+            ('movie_id', 'movie_id', 'int'),
+            ('last_watched_at', 'last_watched_at', 'datetime'),
+            ('position_seconds', 'position_seconds', 'int'),
+            ('duration_seconds', 'duration_seconds', 'int'),
+            ('finished', 'finished', 'bool'),
+        ],
+    ),
+    'favorites': Dataset(
+        Favorite.objects.all,
+        [
+            ('id', 'id', 'int'),
+            ('user_id', 'user_id', 'int'),
+            ('movie_id', 'movie_id', 'int'),
+            ('created_at', 'created_at', 'datetime'),
+        ],
+    ),
+    'comment_reactions': Dataset(
+        CommentReaction.objects.all,
+        [
+            ('id', 'id', 'int'),
+            ('user_id', 'user_id', 'int'),
+            ('comment_id', 'comment_id', 'int'),
+            ('movie_id', 'comment__movie_id', 'int'),
+            ('reaction', 'reaction', 'str'),
+            ('created_at', 'created_at', 'datetime'),
+        ],
+    ),
+}
+
+
+def filename(dataset, fmt, compress=False):
+    suffix = '.gz' if compress and fmt != 'parquet' else ''
+    return f'{dataset}.{fmt}{suffix}'
+
+
+def content_type(fmt, compress=False):
+    if compress and fmt != 'parquet':
+        return 'application/gzip'
+    return CONTENT_TYPES[fmt]
+
+
+def export(dataset, fmt='csv', compress=False, chunk_size=CHUNK_SIZE):
+    """
+    Iterator bytes của file export. Kiểm tra tham số ngay (trước khi stream bắt đầu).
+    compress: gzip cho CSV/JSONL; với Parquet là codec gzip bên trong file (mặc định snappy).
+    """
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown dataset '{dataset}'. Choices: {', '.join(DATASETS)}")
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format '{fmt}'. Choices: {', '.join(FORMATS)}")
+
+    source = DATASETS[dataset]
+    if fmt == 'parquet':
+        return _parquet_chunks(source, chunk_size, 'gzip' if compress else 'snappy')
+
+    encode = _csv_chunks if fmt == 'csv' else _jsonl_chunks
+    chunks = encode(source, chunk_size)
+    return _gzip(chunks) if compress else chunks
+
+
+def _batches(rows, size):
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _text(value, kind):
+    if value is None:
+        return ''
+    if kind == 'datetime':
+        return value.isoformat()
+    if kind == 'list':
+        return LIST_SEPARATOR.join(value)
+    return value
+
+
+def _csv_chunks(source, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(source.names)
+    kinds = source.kinds
+    for batch in _batches(source.rows(chunk_size), chunk_size):
+        writer.writerows([_text(v, k) for v, k in zip(row, kinds)] for row in batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')  # chỉ có header (bảng rỗng)
+
+
+def _jsonl_chunks(source, chunk_size):
+    names = source.names
+    datetimes = [name for name, kind in zip(names, source.kinds) if kind == 'datetime']
+    for batch in _batches(source.rows(chunk_size), chunk_size):
+        lines = []
+        for row in batch:
+            record = dict(zip(names, row))
+            for name in datetimes:
+                if record[name] is not None:
+                    record[name] = record[name].isoformat()
+            lines.append(json.dumps(record, ensure_ascii=False))
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)  # header gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _Drain(io.RawIOBase):
+    """File-like ghi vào bộ nhớ, được xả sau mỗi row group"""
+
+    def __init__(self):
+        self._parts = []
+        self._size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._size
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _parquet_chunks(source, chunk_size, compression):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    types = {
+        'int': pa.int64(),
+        'str': pa.string(),
+        'bool': pa.bool_(),
+        'datetime': pa.timestamp('us', tz='UTC'),
+        'list': pa.list_(pa.string()),
+    }
+    names = source.names
+    schema = pa.schema([(name, types[kind]) for name, kind in zip(names, source.kinds)])
+
+    def chunks():
+        sink = _Drain()
+        writer = pq.ParquetWriter(sink, schema, compression=compression)
+        try:
+            for batch in _batches(source.rows(chunk_size), chunk_size):
+                columns = list(zip(*batch))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                    schema=schema,
+                ))
+                data = sink.drain()
+                if data:
+                    yield data
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    return chunks()
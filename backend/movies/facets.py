@@ -0,0 +1,133 @@
+"""
+Cached facet counts (categories / countries / release years) for filter sidebars.
+
+Each process keeps a compact snapshot of the catalog: movie -> (country_id, year)
+and movie -> set(category_ids), loaded with two queries. Facet counts, optionally
+conditioned on the current filter set, are computed from that snapshot and cached
+in the Django cache. Movie / Category / Country saves and changes to
+Movie.categories replace a version token (see signals.py), which invalidates both the
+snapshots in every process and the cached counts.
+"""
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .normalization import normalize_text
+
+VERSION_CACHE_KEY = 'movies:facets:version'
+DEFAULT_TIMEOUT = 600
+_EMPTY = frozenset()
+
+
+class FacetIndex:
+    """Facet counts computed from an in-memory catalog snapshot"""
+
+    def __init__(self):
+        self._snapshot = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        # Token ngẫu nhiên: bộ đếm bị evict rồi đếm lại có thể trùng version của snapshot đang giữ
+        cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+    def counts(self, category_ids=(), country=None, year=None) -> dict:
+        """
+        Đếm phim theo từng facet với bộ lọc hiện tại.
+        Mỗi facet được đếm trên các phim thỏa các bộ lọc *còn lại* (categories: AND),
+        để sidebar biết chọn thêm một giá trị sẽ còn bao nhiêu phim.
+        Returns {'categories': [...], 'countries': [...], 'years': [...]}
+        """
+        version = cache.get(VERSION_CACHE_KEY, 0)
+        category_ids = sorted({int(c) for c in category_ids})
+        country_key = normalize_text(country)
+        key = f"movies:facets:{version}:{','.join(map(str, category_ids))}:{country_key}:{year or ''}"
+
+        result = cache.get(key)
+        if result is None:
+            result = self._compute(self._get_snapshot(version), set(category_ids), country_key, year)
+            cache.set(key, result, getattr(settings, 'FACET_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+        return result
+
+    def categories(self) -> list[dict]:
+        return self.counts()['categories']
+
+    def countries(self) -> list[dict]:
+        return self.counts()['countries']
+
+    def years(self) -> list[int]:
+        return [item['year'] for item in self.counts()['years']]
+
+    def _compute(self, snapshot, category_ids, country_key, year):
+        movies, movie_categories, categories, countries = snapshot
+
+        country_id = None
+        if country_key:
+            country_id = next((pk for pk, (_, norm) in countries.items() if norm == country_key), -1)
+
+        category_counts = Counter()
+        country_counts = Counter()
+        year_counts = Counter()
+        for movie_id, (movie_country, movie_year) in movies.items():
+            cats = movie_categories.get(movie_id, _EMPTY)
+            ok_categories = category_ids <= cats
+            ok_country = country_id is None or movie_country == country_id
+            ok_year = year is None or movie_year == year
+
+            if ok_categories and ok_country and ok_year:
+                category_counts.update(cats)
+            if ok_categories and ok_year and movie_country is not None:
+                country_counts[movie_country] += 1
+            if ok_categories and ok_country and movie_year is not None:
+                year_counts[movie_year] += 1
+
+        return {
+            'categories': [
+                {'id': pk, 'name': name, 'movie_count': category_counts.get(pk, 0)}
+                for pk, name in categories
+            ],
+            'countries': [
+                {'id': pk, 'name': name, 'movie_count': country_counts.get(pk, 0)}
+                for pk, (name, _) in sorted(countries.items(), key=lambda item: item[1][0])
+            ],
+            'years': [
+                {'year': y, 'movie_count': year_counts[y]}
+                for y in sorted(year_counts, reverse=True)
+                if 1900 <= y <= 2030
+            ],
+        }
+
+    def _get_snapshot(self, version):
+        if self._version == version and self._snapshot is not None:
+            return self._snapshot
+
+        with self._lock:
+            if self._version != version or self._snapshot is None:
+                self._snapshot = self._build()
+                self._version = version
+            return self._snapshot
+
+    def _build(self):
+        from .models import Movie, Category, Country
+
+        movies = {
+            pk: (country_id, year)
+            for pk, country_id, year in Movie.objects.order_by().values_list('id', 'country_id', 'release_year')
+        }
+        movie_categories = {}
+        through = Movie.categories.through.objects.values_list('movie_id', 'category_id')
+        for movie_id, category_id in through.iterator():
+            movie_categories.setdefault(movie_id, set()).add(category_id)
+        categories = list(Category.objects.order_by('id').values_list('id', 'name'))
+        countries = {
+            pk: (name, norm)
+            for pk, name, norm in Country.objects.values_list('id', 'name', 'name_normalized')
+        }
+        return movies, movie_categories, categories, countries
+
+
+# Singleton instance
+facet_index = FacetIndex()
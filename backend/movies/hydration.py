@@ -0,0 +1,39 @@
+"""
+Bulk hydration of movie id lists (embedding / similarity results, strict filters).
+
+Turns an ordered list of tmdb_ids into the compact movie dicts used by the chatbot
+with one movie query plus one prefetch query for categories, whatever the list
+length. The input order (e.g. similarity rank) is restored in Python instead of an
+ORDER BY CASE WHEN ... expression; unknown ids are skipped.
+"""
+from django.db.models import Prefetch
+
+from .models import Movie, Category
+
+OVERVIEW_LENGTH = 300
+
+
+def format_movie(m):
+    """Movie (đã prefetch categories) -> dict gọn cho chatbot"""
+    return {
+        "tmdb_id": m.tmdb_id,
+        "title": m.title,
+        "overview": (m.description or "")[:OVERVIEW_LENGTH],
+        "release_year": m.release_year,
+        "poster": m.poster,
+        "categories": [c.name for c in m.categories.all()],
+    }
+
+
+def hydrate_movies(tmdb_ids, formatter=format_movie):
+    """Danh sách tmdb_id (đã xếp hạng) -> danh sách dict cùng thứ tự"""
+    tmdb_ids = [int(pk) for pk in tmdb_ids]
+    if not tmdb_ids:
+        return []
+    movies = (
+        Movie.objects.filter(tmdb_id__in=tmdb_ids)
+        .only('id', 'tmdb_id', 'title', 'description', 'release_year', 'poster')
+        .prefetch_related(Prefetch('categories', queryset=Category.objects.only('id', 'name')))
+    )
+    by_tmdb_id = {m.tmdb_id: m for m in movies}
+    return [formatter(by_tmdb_id[pk]) for pk in dict.fromkeys(tmdb_ids) if pk in by_tmdb_id]
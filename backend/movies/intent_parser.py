@@ -0,0 +1,131 @@
+"""
+Local, confidence-scored intent parser for the chatbot.
+
+KeywordExtractor rules give the filters (genres / country / year / title); the
+confidence is the share of the message those filters explain - words that are
+matched keywords or filler ('phim', 'cho tôi', 'năm'...). When the rules find no
+genre, the message embedding is compared with genre prototypes (mean SBERT
+embedding of each genre's keywords) and a clear winner is added, contributing
+EMBEDDING_WEIGHT * similarity for the words left unexplained. A title-only query
+gets TITLE_CONFIDENCE only when it is a few words with no filler; any other ASCII
+sentence the rules label as a title is scored by coverage without the title.
+
+FilterExtractor (chat_filters.py) only asks the LLM when the confidence is
+below CHAT_LOCAL_CONFIDENCE.
+"""
+import logging
+import threading
+
+import numpy as np
+
+from .keyword_extractor import extractor
+from .normalization import normalize_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.75
+TITLE_CONFIDENCE = 0.8  # truy vấn ngắn được rule xếp là tên phim
+TITLE_MAX_WORDS = 4
+GENRE_SIMILARITY = 0.55
+GENRE_MARGIN = 0.05  # genre gần nhất phải hơn genre thứ 2 ít nhất chừng này
+EMBEDDING_WEIGHT = 0.5
+
+FILLER_WORDS = frozenset(normalize_text(
+    'phim bộ lẻ cho tôi mình tớ em anh chị xem muốn tìm kiếm gợi ý giới thiệu có nào hay không những các '
+    'một vài về của là với và nhé đi ạ à ơi thì được thể loại quốc gia nước năm sản xuất tên đó này '
+    'movie movies film films show me i want find some a the of from in'
+).split())
+
+
+class IntentParser:
+    """Filters + confidence (0..1) từ message, không gọi mạng"""
+
+    def __init__(self):
+        self._prototypes = None
+        self._lock = threading.Lock()
+
+    def parse(self, message) -> tuple[dict, float]:
+        keywords = extractor.extract_keywords(message)
+        filters = {
+            'genres': list(keywords['genres']),
+            'country': keywords['country'] or None,
+            'year': keywords['year'],
+            'keyword': keywords['movie_title'] or None,
+        }
+        # Rule xếp mọi câu ASCII là title_search: chỉ tin khi ngắn và không có từ đệm,
+        # câu dài ("movies like inception with time travel") không được tính là tên phim
+        title_search = keywords['query_type'] == 'title_search' and filters['keyword']
+        if title_search and self.looks_like_title(filters['keyword']):
+            return filters, TITLE_CONFIDENCE
+
+        words = normalize_text(message).split()
+        if not words:
+            return filters, 0.0
+        explained = FILLER_WORDS | self._matched_words(message.lower(), filters, with_keyword=not title_search)
+        coverage = sum(word in explained for word in words) / len(words)
+        confidence = coverage if any(filters.values()) else 0.0
+
+        if not filters['genres']:
+            genre, similarity = self.closest_genre(message)
+            if genre is not None:
+                filters['genres'] = [genre]
+                confidence += (1 - confidence) * similarity * EMBEDDING_WEIGHT
+        return filters, round(confidence, 3)
+
+    def looks_like_title(self, text) -> bool:
+        """Vài từ, không từ nào là từ đệm ('john wick', 'inception')"""
+        words = normalize_text(text).split()
+        return 0 < len(words) <= TITLE_MAX_WORDS and not any(word in FILLER_WORDS for word in words)
+
+    def closest_genre(self, message):
+        """(genre, cosine) gần nhất theo prototype nếu đủ rõ ràng, ngược lại (None, 0.0)"""
+        prototypes = self._get_prototypes()
+        if prototypes is None:
+            return None, 0.0
+        names, matrix = prototypes
+        try:
+            query = extractor.model.encode([message], convert_to_numpy=True)[0]
+        except Exception:
+            logger.exception("Error encoding chat message")
+            return None, 0.0
+        sims = matrix @ (query / (np.linalg.norm(query) + 1e-12))
+        order = np.argsort(-sims)
+        best = float(sims[order[0]])
+        second = float(sims[order[1]]) if len(order) > 1 else 0.0
+        if best >= GENRE_SIMILARITY and best - second >= GENRE_MARGIN:
+            return names[order[0]], best
+        return None, 0.0
+
+    def _matched_words(self, query, filters, with_keyword=True):
+        """Các từ (đã normalize) của những từ khóa đã khớp"""
+        phrases = []
+        for genre in filters['genres']:
+            phrases += [kw for kw in extractor.genre_keywords.get(genre, ()) if extractor._has_keyword(kw, query)]
+        if filters['country']:
+            for country_vn, country_en_list in extractor.country_mappings.items():
+                if country_en_list[0] == filters['country']:
+                    phrases += [country_vn, *country_en_list]
+        if filters['year']:
+            phrases.append(str(filters['year']))
+        if filters['keyword'] and with_keyword:
+            phrases.append(filters['keyword'])
+        return {word for phrase in phrases for word in normalize_text(phrase).split()}
+
+    def _get_prototypes(self):
+        if self._prototypes is not None or extractor.model is None:
+            return self._prototypes
+        with self._lock:
+            if self._prototypes is None:
+                names, rows = [], []
+                for genre, keywords in extractor.genre_keywords.items():
+                    vectors = extractor.model.encode(keywords, convert_to_numpy=True)
+                    vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+                    mean = vectors.mean(axis=0)
+                    names.append(genre)
+                    rows.append(mean / (np.linalg.norm(mean) + 1e-12))
+                self._prototypes = (names, np.vstack(rows))
+            return self._prototypes
+
+
+# Singleton instance
+intent_parser = IntentParser()
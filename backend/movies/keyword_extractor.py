@@ -3,10 +3,23 @@ SBERT-based keyword extraction for Vietnamese movie search queries.
 Extracts meaningful keywords like genres, countries, and themes from natural language queries.
 """
 import re
+import unicodedata
+from functools import lru_cache
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from .embeddings import load_embeddings, get_top_k
 from .models import Category, Country
+from .normalization import normalize_text, has_diacritics
+
+
+_WORD_RE = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=4096)
+def _tokens(text: str) -> tuple:
+    """Các từ của text: (từ chữ thường NFC, có dấu?, bản không dấu)"""
+    words = _WORD_RE.findall(unicodedata.normalize('NFC', text.lower()))
+    return tuple((word, has_diacritics(word), normalize_text(word)) for word in words)
 
 
 class KeywordExtractor:
@@ -19,29 +32,31 @@ class KeywordExtractor:
         
         # Vietnamese genre keywords mapping - updated to match database categories
         self.genre_keywords = {
-            'Phim Hành Động': ['action', 'hanh dong', 'hành động', 'hanh dong', 'Phim Hành Động'],
-            'Phim Hình Sự': ['crime', 'hinh su', 'hình sự', 'trinh tham', 'trinh thám', 'Phim Hình Sự'],
-            'Phim Lãng Mạn': ['romance', 'lang man', 'lãng mạn', 'tình cảm', 'tình yêu', 'love', 'ngôn tình', 'tâm sự', 'tâm hồn', 'Phim Lãng Mạn'],
-            'Phim Kinh Dị': ['horror', 'kinh di', 'kinh dị', 'rung ron', 'rùng rợn', 'ma', 'sợ', 'đáng sợ', 'ám ảnh', 'kinh hoàng', 'phim ma', 'ghost', 'scary', 'Phim Kinh Dị'],
-            'Phim Hài': ['comedy', 'hai huoc', 'hài hước', 'hài', 'Phim Hài'],
-            'Phim Hoạt Hình': ['animation', 'hoat hinh', 'hoạt hình', 'cartoon', 'phim hoat hinh', 'Phim Hoạt Hình'],
-            'Phim Phiêu Lưu': ['adventure', 'phieu luu', 'phiêu lưu', 'Phim Phiêu Lưu'],
-            'Phim Khoa Học Viễn Tưởng': ['sci-fi', 'science fiction', 'khoa hoc vien tuong', 'khoa học viễn tưởng', 'Phim Khoa Học Viễn Tưởng'],
-            'Phim Gia Đình': ['family', 'gia dinh', 'gia đình', 'Phim Gia Đình'],
-            'Phim Chiến Tranh': ['war', 'chien tranh', 'chiến tranh', 'Phim Chiến Tranh'],
-            'Phim Thể Thao': ['sports', 'the thao', 'thể thao', 'Phim Thể Thao'],
-            'Phim Nhạc': ['music', 'am nhac', 'âm nhạc', 'musical', 'Phim Nhạc', 'phim nhạc','nhạc'],
-            'Phim Tài Liệu': ['documentary', 'tai lieu', 'tài liệu', 'Phim Tài Liệu'],
-            'Phim Chính Kịch': ['drama', 'chinh kich', 'chính kịch', 'Phim Chính Kịch'],
-            'Phim Lịch Sử': ['history', 'lich su', 'lịch sử', 'cổ trang', 'co trang', 'thời xưa', 'vua chúa', 'triều đình', 'xưa', 'quốc gia', 'Phim Lịch Sử'],
-            'Phim Bí Ẩn': ['mystery', 'bi an', 'bí ẩn', 'Phim Bí Ẩn'],
-            'Phim Gây Cấn': ['thriller', 'giat gan', 'giật gân', 'gây cấn', 'Phim Gây Cấn'],
-            'Phim Giả Tượng': ['fantasy', 'gia tuong', 'giả tưởng', 'Phim Giả Tượng'],
-            'Phim Miền Tây': ['western', 'mien tay', 'miền tây', 'Phim Miền Tây'],
+            'Phim Hành Động': ['action', 'hành động', 'Phim Hành Động'],
+            'Phim Hình Sự': ['crime', 'hình sự', 'trinh thám', 'Phim Hình Sự'],
+            'Phim Lãng Mạn': ['romance', 'lãng mạn', 'tình cảm', 'tình yêu', 'love', 'ngôn tình', 'tâm sự', 'tâm hồn', 'Phim Lãng Mạn'],
+            'Phim Kinh Dị': ['horror', 'kinh dị', 'rùng rợn', 'ma', 'sợ', 'đáng sợ', 'ám ảnh', 'kinh hoàng', 'phim ma', 'ghost', 'scary', 'Phim Kinh Dị'],
+            'Phim Hài': ['comedy', 'hài hước', 'hài', 'Phim Hài'],
+            'Phim Hoạt Hình': ['animation', 'hoạt hình', 'cartoon', 'Phim Hoạt Hình'],
+            'Phim Phiêu Lưu': ['adventure', 'phiêu lưu', 'Phim Phiêu Lưu'],
+            'Phim Khoa Học Viễn Tưởng': ['sci-fi', 'science fiction', 'khoa học viễn tưởng', 'Phim Khoa Học Viễn Tưởng'],
+            'Phim Gia Đình': ['family', 'gia đình', 'Phim Gia Đình'],
+            'Phim Chiến Tranh': ['war', 'chiến tranh', 'Phim Chiến Tranh'],
+            'Phim Thể Thao': ['sports', 'thể thao', 'Phim Thể Thao'],
+            'Phim Nhạc': ['music', 'âm nhạc', 'musical', 'Phim Nhạc', 'phim nhạc','nhạc'],
+            'Phim Tài Liệu': ['documentary', 'tài liệu', 'Phim Tài Liệu'],
+            'Phim Chính Kịch': ['drama', 'chính kịch', 'Phim Chính Kịch'],
+            'Phim Lịch Sử': ['history', 'lịch sử', 'cổ trang', 'thời xưa', 'vua chúa', 'triều đình', 'xưa', 'quốc gia', 'Phim Lịch Sử'],
+            'Phim Bí Ẩn': ['mystery', 'bí ẩn', 'Phim Bí Ẩn'],
+            'Phim Gây Cấn': ['thriller', 'giật gân', 'gây cấn', 'Phim Gây Cấn'],
+            'Phim Giả Tượng': ['fantasy', 'giả tưởng', 'Phim Giả Tượng'],
+            'Phim Miền Tây': ['western', 'miền tây', 'Phim Miền Tây'],
             'Chương Trình Truyền Hình': ['tv show', 'truyền hình', 'show', 'chương trình', 'thực tế', 'Chương Trình Truyền Hình'],
             'Category1': ['category1', 'test1', 'Category1'],
             'Category2': ['category2', 'test2', 'Category2'],
         }
+        # Biến thể không dấu không cần liệt kê tay: query không dấu được so khớp
+        # với bản normalize_text() của từ khóa (xem _has_keyword)
         
         # Country name mappings - updated to match database country names
         self.country_mappings = {
@@ -64,6 +79,13 @@ class KeywordExtractor:
             'thái lan': ['thailand', 'thai'],
             'pháp': ['france', 'french'],
         }
+
+        self._normalized_keywords = {
+            kw: normalize_text(kw)
+            for kw in [k for kws in self.genre_keywords.values() for k in kws]
+                      + list(self.country_mappings)
+                      + [c for cs in self.country_mappings.values() for c in cs]
+        }
     
     def _load_model(self):
         """Load SBERT model"""
@@ -72,6 +94,53 @@ class KeywordExtractor:
         except Exception as e:
             print(f"Failed to load SBERT model: {e}")
             self.model = None
+
+    def _has_keyword(self, keyword: str, query: str) -> bool:
+        """
+        Keyword khớp một dãy từ liên tiếp của query, so từng từ:
+        - từ có dấu phải đúng từ khóa có dấu ('mà' không khớp 'ma', 'số' không khớp 'sợ')
+        - từ không dấu so với bản không dấu ('phim hanh dong nhật bản' khớp 'hành động');
+          riêng từ khóa chỉ có 1 từ có dấu ('hài', 'Phim Hài', 'sợ') thì không, nếu người dùng
+          có gõ dấu ở chỗ khác ('phim hai người bạn': 'hai' là "hai", không phải 'hài')
+        """
+        kw_tokens, query_tokens = _tokens(keyword), _tokens(query)
+        if not kw_tokens or len(kw_tokens) > len(query_tokens):
+            return False
+        # Phần riêng của từ khóa (bỏ 'phim') chỉ là 1 từ có dấu: dễ trùng với từ không dấu khác
+        core = [token for token in kw_tokens if token[2] != 'phim']
+        ambiguous = len(core) == 1 and core[0][1] and any(accented for _, accented, _ in query_tokens)
+
+        def same(query_token, kw_token):
+            word, accented, folded = query_token
+            if accented:
+                return word == kw_token[0]
+            return folded == kw_token[2] and not (ambiguous and kw_token[1])
+
+        n = len(kw_tokens)
+        return any(
+            all(same(query_tokens[i + j], kw_tokens[j]) for j in range(n))
+            for i in range(len(query_tokens) - n + 1)
+        )
+
+    def resolve_genre(self, text: str):
+        """Map a free-text genre (e.g. from the LLM) to a category name, or None"""
+        norm = normalize_text(text)
+        if not norm:
+            return None
+        for genre, keywords in self.genre_keywords.items():
+            if norm == normalize_text(genre) or any(norm == self._normalized_keywords[kw] for kw in keywords):
+                return genre
+        return None
+
+    def resolve_country(self, text: str):
+        """Map a Vietnamese/English country name to the English name stored in DB, or None"""
+        norm = normalize_text(text)
+        if not norm:
+            return None
+        for country_vn, country_en_list in self.country_mappings.items():
+            if norm == self._normalized_keywords[country_vn] or any(norm == self._normalized_keywords[c] for c in country_en_list):
+                return country_en_list[0]
+        return None
     
     def extract_keywords(self, query: str) -> dict:
         """
@@ -115,14 +184,19 @@ class KeywordExtractor:
         
         # Check for natural query indicators first
         natural_indicators = ['tìm', 'cho tôi', 'muốn xem', 'gợi ý', 'review', 'nào hay', 'về chủ đề', 'giống', 'như', 'có phim nào', 'tôi muốn']
-        if any(indicator in query for indicator in natural_indicators):
+        if any(self._has_keyword(indicator, query) for indicator in natural_indicators):
             return 'natural'
         
         # Check for structured query (contains commas or clear filter indicators)
         if (',' in query or 
-            any(indicator in query for indicator in ['thể loại', 'quốc gia', 'năm', 'năm sản xuất', 'type', 'country', 'year'])):
+            any(self._has_keyword(indicator, query) for indicator in ['thể loại', 'quốc gia', 'năm', 'năm sản xuất', 'type', 'country', 'year'])):
             return 'structured'
         
+        # "phim hanh dong", "phim nhat ban" (gõ không dấu) cũng là truy vấn có cấu trúc
+        if query.startswith('phim ') and not has_diacritics(query):
+            if any(self._has_keyword(kw, query) for kw in self._normalized_keywords):
+                return 'structured'
+        
         # Check for title patterns first - priority for movie titles
         title_patterns = [
             r'^[A-Za-z\s&\d]+$',  # English titles like "Fast & Furious 10"
@@ -188,7 +262,7 @@ class KeywordExtractor:
             # Extract genres
             for genre, keywords in self.genre_keywords.items():
                 for keyword in keywords:
-                    if keyword in part:
+                    if self._has_keyword(keyword, part):
                         if genre not in result['genres']:
                             result['genres'].append(genre)
                         break
@@ -197,7 +271,7 @@ class KeywordExtractor:
             if not result['country']:
                 for country_vn, country_en_list in self.country_mappings.items():
                     for country_en in country_en_list:
-                        if country_en in part or country_vn in part:
+                        if self._has_keyword(country_en, part) or self._has_keyword(country_vn, part):
                             result['country'] = country_en_list[0]
                             break
                     if result['country']:
@@ -293,14 +367,14 @@ class KeywordExtractor:
         # Extract genres using pattern matching
         for genre, keywords in self.genre_keywords.items():
             for keyword in keywords:
-                if keyword in query_lower:
+                if self._has_keyword(keyword, query_lower):
                     if genre not in result['genres']:
                         result['genres'].append(genre)
         
         # Extract country using pattern matching
         for country_vn, country_en_list in self.country_mappings.items():
             for country_en in country_en_list:
-                if country_en in query_lower or country_vn in query_lower:
+                if self._has_keyword(country_en, query_lower) or self._has_keyword(country_vn, query_lower):
                     result['country'] = country_en_list[0]
                     break
             if result['country']:
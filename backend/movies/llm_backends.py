@@ -0,0 +1,125 @@
+"""
+Pluggable LLM backend for the chatbot, selected with settings.LLM_BACKEND.
+
+- 'openai' (default): the real API through openai_client (pooled session,
+  deadlines, circuit breaker).
+- 'stub': local fake for load tests and development. It answers canned JSON
+  filters when the system prompt asks for JSON and a canned reply otherwise, after
+  a random latency, and fails with the configured probability
+  (settings.LLM_STUB, see DEFAULT_STUB_OPTIONS).
+- or a dotted path to a class with the same interface.
+
+ChatAPIView and FilterExtractor only talk to get_backend(), so the pipeline
+(filters, retrieval, ranking, formatting) can be exercised without provider quota.
+"""
+import json
+import random
+import time
+from typing import Dict, Iterator, List
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import openai_client
+
+DEFAULT_STUB_OPTIONS = {
+    'latency_ms': 300,       # độ trễ trung bình mỗi call
+    'jitter_ms': 100,        # độ lệch chuẩn (phân phối chuẩn, cắt ở 0)
+    'error_rate': 0.0,       # xác suất call lỗi (0..1)
+    'error_latency_ms': 0,   # thời gian chờ trước khi báo lỗi (mô phỏng timeout)
+    'token_delay_ms': 15,    # giữa các token khi stream
+    'filters': {'genres': ['Phim Hành Động'], 'country': None, 'year': None, 'keyword': None},
+    'reply': 'Mình gợi ý cho bạn vài bộ phim phù hợp, xem thử nhé!',
+    'seed': None,
+}
+
+
+class LLMBackend:
+    """Interface: available(), complete(messages, ...) -> str, stream(messages, ...) -> Iterator[str]"""
+    name = None
+
+    def available(self) -> bool:
+        raise NotImplementedError
+
+    def complete(self, messages: List[Dict[str, str]], max_tokens=300, temperature=0.7, deadline=None) -> str:
+        raise NotImplementedError
+
+    def stream(self, messages: List[Dict[str, str]], max_tokens=300, temperature=0.7, deadline=None) -> Iterator[str]:
+        yield self.complete(messages, max_tokens, temperature, deadline)
+
+
+class OpenAIBackend(LLMBackend):
+    name = 'openai'
+
+    def available(self):
+        return openai_client.has_key()
+
+    def complete(self, messages, max_tokens=300, temperature=0.7, deadline=None):
+        return openai_client.chat_completion(messages, max_tokens, temperature, deadline)
+
+    def stream(self, messages, max_tokens=300, temperature=0.7, deadline=None):
+        return openai_client.chat_completion_stream(messages, max_tokens, temperature, deadline)
+
+
+class StubError(RuntimeError):
+    """Lỗi giả lập của StubBackend"""
+
+
+class StubBackend(LLMBackend):
+    name = 'stub'
+
+    def __init__(self, **options):
+        self.options = {**DEFAULT_STUB_OPTIONS, **options}
+        self._random = random.Random(self.options['seed'])
+
+    def available(self):
+        return True
+
+    def complete(self, messages, max_tokens=300, temperature=0.7, deadline=None):
+        self._wait(deadline)
+        system = next((m['content'] for m in messages if m.get('role') == 'system'), '')
+        if 'JSON' in system:
+            return json.dumps(self.options['filters'], ensure_ascii=False)
+        return self.options['reply']
+
+    def stream(self, messages, max_tokens=300, temperature=0.7, deadline=None):
+        self._wait(deadline)
+        delay = self.options['token_delay_ms'] / 1000
+        for i, word in enumerate(self.options['reply'].split(' ')):
+            if i and delay:
+                time.sleep(delay)
+            yield word if i == 0 else ' ' + word
+
+    def _wait(self, deadline):
+        """Ngủ theo độ trễ giả lập (không quá deadline), rồi lỗi ngẫu nhiên theo error_rate"""
+        opts = self.options
+        if self._random.random() < opts['error_rate']:
+            time.sleep(opts['error_latency_ms'] / 1000)
+            raise StubError("stub LLM error")
+        seconds = max(0.0, self._random.gauss(opts['latency_ms'], opts['jitter_ms'])) / 1000
+        if deadline is not None and seconds > deadline:
+            time.sleep(deadline)
+            raise StubError("stub LLM deadline exceeded")
+        time.sleep(seconds)
+
+
+BACKENDS = {
+    'openai': OpenAIBackend,
+    'stub': StubBackend,
+}
+
+_backend = None
+_backend_config = None
+
+
+def get_backend() -> LLMBackend:
+    """Backend theo settings (LLM_BACKEND, LLM_STUB), tạo lại khi settings đổi"""
+    global _backend, _backend_config
+    name = getattr(settings, 'LLM_BACKEND', 'openai') or 'openai'
+    options = getattr(settings, 'LLM_STUB', {}) if name == 'stub' else {}
+    config = (name, json.dumps(options, sort_keys=True, default=str))
+    if _backend is None or _backend_config != config:
+        cls = BACKENDS.get(name) or import_string(name)
+        _backend = cls(**options) if options else cls()
+        _backend_config = config
+    return _backend
@@ -0,0 +1,69 @@
+# movies/management/commands/compact_watch_history.py
+"""
+Keep only the most recent WATCH_HISTORY_KEEP WatchHistory rows per user and move
+older ones to WatchHistoryArchive, in small transactions (no long table locks).
+Usage: python manage.py compact_watch_history [--keep N] [--batch-size N] [--dry-run]
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from movies.models import WatchHistory, WatchHistoryArchive
+from movies.upserts import bulk_upsert
+
+DEFAULT_KEEP = 200
+
+
+class Command(BaseCommand):
+    help = "Archive watch history beyond the N most recent entries per user"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, help='Entries to keep per user (default: WATCH_HISTORY_KEEP)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be archived')
+
+    def handle(self, *args, **options):
+        keep = options['keep'] if options['keep'] is not None else getattr(settings, 'WATCH_HISTORY_KEEP', DEFAULT_KEEP)
+        batch_size = options['batch_size']
+
+        over_limit = (
+            WatchHistory.objects.order_by().values('user_id')
+            .annotate(n=Count('id')).filter(n__gt=keep)
+            .values_list('user_id', 'n')
+        )
+
+        users = archived = 0
+        for user_id, count in list(over_limit):
+            users += 1
+            if options['dry_run']:
+                archived += count - keep
+                continue
+            archived += self.compact_user(user_id, keep, batch_size)
+
+        verb = 'would be archived' if options['dry_run'] else 'archived'
+        self.stdout.write(self.style.SUCCESS(f"{archived} watch history rows {verb} for {users} users (keep={keep})"))
+
+    def compact_user(self, user_id, keep, batch_size):
+        moved = 0
+        while True:
+            with transaction.atomic():
+                # Duyệt index (user, -last_watched_at): bỏ qua `keep` mục mới nhất, lấy 1 lô cũ hơn
+                old = list(
+                    WatchHistory.objects.filter(user_id=user_id)
+                    .order_by('-last_watched_at', '-id')
+                    .values_list('id', 'movie_id', 'last_watched_at', 'finished')[keep:keep + batch_size]
+                )
+                if not old:
+                    return moved
+                bulk_upsert(
+                    WatchHistoryArchive,
+                    [
+                        {'user_id': user_id, 'movie_id': movie_id, 'last_watched_at': watched_at, 'finished': finished}
+                        for _, movie_id, watched_at, finished in old
+                    ],
+                    unique_fields=('user', 'movie'),
+                    set_fields=('last_watched_at', 'finished'),
+                )
+                WatchHistory.objects.filter(id__in=[row[0] for row in old]).delete()
+            moved += len(old)
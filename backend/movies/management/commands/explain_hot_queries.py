@@ -0,0 +1,94 @@
+# movies/management/commands/explain_hot_queries.py
+"""
+Run EXPLAIN on the hot API queries and report whether each one uses an index.
+Usage: python manage.py explain_hot_queries [--verbose]
+Works on SQLite (EXPLAIN QUERY PLAN) and Postgres (EXPLAIN) via QuerySet.explain().
+"""
+import re
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from movies.models import (
+    Movie, Category, Comment, WatchHistory, Favorite, CommentReaction, comment_path_upper, title_word_start_q,
+)
+from users.models import User
+
+# SQLite: "SEARCH t USING INDEX idx", "SCAN t USING INDEX idx", "USING COVERING INDEX idx"
+# Postgres: "Index Scan using idx", "Index Only Scan using idx", "Bitmap Index Scan on idx"
+INDEX_RE = re.compile(r'USING (?:COVERING )?INDEX (\w+)|Index (?:Only )?Scan (?:Backward )?using (\w+)|Bitmap Index Scan on (\w+)')
+# SQLite "SCAN movies_movie" (không kèm USING INDEX) hoặc Postgres "Seq Scan on movies_movie"
+FULL_SCAN_RE = re.compile(r'\bSCAN (\w+)(?!.*USING)|Seq Scan on (\w+)')
+SORT_RE = re.compile(r'USE TEMP B-TREE FOR ORDER BY|Sort Key')
+# SQLite "SCAN t USING INDEX idx": duyệt toàn bộ index theo thứ tự (ổn khi có LIMIT)
+INDEX_WALK_RE = re.compile(r'\bSCAN \w+ USING (?:COVERING )?INDEX')
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot queries and report whether each one uses an index scan"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose', action='store_true', help='Print the full query plan')
+
+    def hot_queries(self):
+        movie_id = Movie.objects.values_list('id', flat=True).first() or 0
+        comment_id = Comment.objects.values_list('id', flat=True).first() or 0
+        comment_path = Comment.objects.filter(id=comment_id).values_list('path', flat=True).first() or '0'
+        user_id = User.objects.values_list('id', flat=True).first() or 0
+        year = Movie.objects.filter(release_year__isnull=False).values_list('release_year', flat=True).first() or 2024
+
+        return [
+            ('movies by views', Movie.objects.order_by('-views', '-id')[:30]),
+            ('movies by created_at', Movie.objects.order_by('-created_at', '-id')[:30]),
+            ('movies of a year by views', Movie.objects.filter(release_year=year).order_by('-release_year', '-views')[:30]),
+            ('distinct release years', Movie.objects.filter(release_year__isnull=False)
+                .values_list('release_year', flat=True).distinct().order_by('-release_year')),
+            # Đúng lookup filter_title (search / chatbot) chạy: vế đầu tên là range, vế giữa tên là LIKE '%...%'
+            ('movie title search', Movie.objects.filter(title_word_start_q('a')).order_by('-views')[:30]),
+            ('category by normalized name', Category.objects.filter(name_normalized='phim hanh dong')),
+            ('top-level comments of a movie', Comment.objects.filter(movie_id=movie_id, parent__isnull=True)
+                .order_by('-created_at')),
+            ('replies of a comment', Comment.objects.filter(parent_id=comment_id).order_by('created_at')),
+            ('subtree of a comment', Comment.objects.filter(path__gte=comment_path, path__lt=comment_path_upper(comment_path))
+                .order_by()),
+            ('watch history of a user', WatchHistory.objects.filter(user_id=user_id).order_by('-last_watched_at')[:50]),
+            ('favorites of a user', Favorite.objects.filter(user_id=user_id).order_by('-created_at')),
+            ('viewer reactions in a thread', CommentReaction.objects.filter(user_id=user_id, comment_id__in=[comment_id])),
+        ]
+
+    def handle(self, *args, **options):
+        verbose = options['verbose']
+        self.stdout.write(self.style.HTTP_INFO(f"Database vendor: {connection.vendor}"))
+
+        missing = 0
+        for name, queryset in self.hot_queries():
+            plan = queryset.explain()
+            indexes = sorted({next(g for g in m.groups() if g) for m in INDEX_RE.finditer(plan)})
+            full_scans = sorted({next(g for g in m.groups() if g) for m in FULL_SCAN_RE.finditer(plan)})
+            sorts = bool(SORT_RE.search(plan))
+            walks = bool(INDEX_WALK_RE.search(plan))
+
+            if indexes and not full_scans:
+                line = self.style.SUCCESS(f"  INDEX  {name}: {', '.join(indexes)}")
+            else:
+                missing += 1
+                detail = f"full scan on {', '.join(full_scans)}" if full_scans else "no index used"
+                line = self.style.WARNING(f"  SCAN   {name}: {detail}")
+            if walks:
+                line += self.style.NOTICE(" (ordered walk of the whole index)")
+            if sorts:
+                line += self.style.NOTICE(" (+ sort step)")
+            self.stdout.write(line)
+
+            if verbose:
+                for plan_line in plan.splitlines():
+                    self.stdout.write(f"           {plan_line}")
+
+        self.stdout.write('')
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f"{missing} queries did not use an index. On small tables the planner may "
+                f"legitimately prefer a sequential scan; run ANALYZE and re-check on production-sized data."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("All hot queries use an index."))
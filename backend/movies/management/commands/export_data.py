@@ -0,0 +1,42 @@
+# movies/management/commands/export_data.py
+"""
+Export tables for offline analysis, streamed chunk by chunk (flat memory).
+Usage: python manage.py export_data movies ratings [--format csv|jsonl|parquet] [--gzip]
+                                    [--output-dir DIR] [--chunk-size N]
+Datasets: movies, ratings, watch_history, favorites, comment_reactions (or "all").
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies import exports
+
+
+class Command(BaseCommand):
+    help = "Stream catalog / rating / interaction tables to CSV, JSONL or Parquet files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('datasets', nargs='+', choices=[*exports.DATASETS, 'all'])
+        parser.add_argument('--format', default='csv', choices=exports.FORMATS)
+        parser.add_argument('--gzip', action='store_true', help='gzip CSV/JSONL output (gzip codec for Parquet)')
+        parser.add_argument('--output-dir', default='.', help='Directory for the exported files (default: current)')
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE, help='Rows fetched and written per chunk')
+
+    def handle(self, *args, **options):
+        datasets = list(exports.DATASETS) if 'all' in options['datasets'] else options['datasets']
+        fmt, compress = options['format'], options['gzip']
+        os.makedirs(options['output_dir'], exist_ok=True)
+
+        for dataset in datasets:
+            path = os.path.join(options['output_dir'], exports.filename(dataset, fmt, compress))
+            try:
+                stream = exports.export(dataset, fmt, compress, chunk_size=max(options['chunk_size'], 1))
+            except exports.ExportError as e:
+                raise CommandError(str(e))
+
+            size = 0
+            with open(path, 'wb') as f:
+                for chunk in stream:
+                    f.write(chunk)
+                    size += len(chunk)
+            self.stdout.write(self.style.SUCCESS(f"{dataset}: {path} ({size} bytes)"))
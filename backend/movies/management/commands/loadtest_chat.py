@@ -0,0 +1,140 @@
+# movies/management/commands/loadtest_chat.py
+"""
+Load-test the chatbot pipeline (filters -> retrieval/ranking -> formatting -> reply).
+Usage: python manage.py loadtest_chat [--requests 200] [--concurrency 8] [--backend stub]
+                                      [--stream] [--messages file.txt] [--url http://host/api/chat/]
+
+Without --url requests go in-process straight to ChatAPIView (no throttle, no HTTP),
+so with --backend stub (LLM_STUB latency / error rate) nothing reaches the provider.
+With --url a running server is driven over HTTP: start it with LLM_BACKEND=stub and
+a high THROTTLE_CHAT (e.g. 100000/min). Per-stage times come from the Server-Timing
+header, so our own overhead is reported separately from end-to-end latency.
+"""
+import json
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+
+DEFAULT_MESSAGES = [
+    "phim hành động nhật bản năm 2020",
+    "Phim hoạt hình, Nhật bản, năm 2025",
+    "cho tôi phim kinh dị hàn quốc",
+    "phim hai my",
+    "john wick",
+    "tìm phim tên là avengers",
+    "phim nào xem buồn khóc về tình bạn",
+    "gợi ý phim gia đình cuối tuần",
+]
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))], 1)
+    return {'p50': pick(0.50), 'p90': pick(0.90), 'p99': pick(0.99), 'max': round(values[-1], 1)}
+
+
+def parse_server_timing(header):
+    """'filters;dur=1.2, retrieval;dur=8.3' -> {'filters': 1.2, 'retrieval': 8.3}"""
+    timings = {}
+    for part in (header or '').split(','):
+        name, _, rest = part.strip().partition(';')
+        if name and rest.startswith('dur='):
+            timings[name] = float(rest[4:])
+    return timings
+
+
+class Command(BaseCommand):
+    help = "Drive the chat pipeline with concurrent requests and report latency per stage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--backend', help='Override LLM_BACKEND for in-process runs (e.g. stub)')
+        parser.add_argument('--stream', action='store_true', help='Use SSE mode and read the whole stream')
+        parser.add_argument('--messages', help='Text file, one message per line (default: built-in set)')
+        parser.add_argument('--url', help='Drive a running server over HTTP instead of in-process')
+
+    def handle(self, *args, **options):
+        messages = DEFAULT_MESSAGES
+        if options['messages']:
+            with open(options['messages'], encoding='utf-8') as f:
+                messages = [line.strip() for line in f if line.strip()]
+        if not messages:
+            raise CommandError("No messages to send")
+        if options['url'] and options['backend']:
+            raise CommandError("--backend only applies in-process; set LLM_BACKEND on the server instead")
+
+        send = self._http_sender(options['url']) if options['url'] else self._local_sender()
+        total = max(options['requests'], 1)
+
+        def run(i):
+            body = {'message': messages[i % len(messages)], 'stream': options['stream']}
+            started = time.perf_counter()
+            try:
+                status_code, timing = send(body)
+            except Exception as e:
+                status_code, timing = f'error:{type(e).__name__}', {}
+            finally:
+                connections.close_all()
+            return status_code, (time.perf_counter() - started) * 1000, timing
+
+        overrides = {'LLM_BACKEND': options['backend']} if options['backend'] else {}
+        with override_settings(**overrides):
+            from movies.llm_backends import get_backend
+            backend = get_backend().name if not options['url'] else 'server'
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(options['concurrency'], 1)) as pool:
+                results = list(pool.map(run, range(total)))
+            elapsed = time.perf_counter() - started
+
+        statuses = Counter(str(status_code) for status_code, _, _ in results)
+        stages = defaultdict(list)
+        for _, _, timing in results:
+            for name, ms in timing.items():
+                stages[name].append(ms)
+
+        self.stdout.write(self.style.HTTP_INFO(
+            f"{total} requests, concurrency {options['concurrency']}, backend {backend}, "
+            f"{'stream' if options['stream'] else 'json'} mode: {elapsed:.2f}s, {total / elapsed:.1f} req/s"
+        ))
+        self.stdout.write(f"  status: {dict(statuses)}")
+        self.stdout.write(f"  end-to-end ms: {percentiles([ms for _, ms, _ in results])}")
+        for name in sorted(stages):
+            self.stdout.write(f"  {name} ms: {percentiles(stages[name])}")
+        self.stdout.write(self.style.NOTICE(
+            "  filters/reply include LLM time (stub latency with --backend stub); retrieval is our own work."
+        ))
+
+    def _local_sender(self):
+        from rest_framework.test import APIRequestFactory
+        from movies.views import ChatAPIView
+
+        factory = APIRequestFactory()
+        view = ChatAPIView.as_view(throttle_classes=[])
+
+        def send(body):
+            response = view(factory.post('/api/chat/', body, format='json'))
+            if getattr(response, 'streaming', False):
+                for _ in response.streaming_content:
+                    pass
+            return response.status_code, parse_server_timing(response.get('Server-Timing'))
+        return send
+
+    def _http_sender(self, url):
+        import requests
+
+        session = requests.Session()
+
+        def send(body):
+            with session.post(url, data=json.dumps(body), headers={'Content-Type': 'application/json'},
+                              stream=body['stream'], timeout=60) as response:
+                for _ in response.iter_content(chunk_size=None):
+                    pass
+                return response.status_code, parse_server_timing(response.headers.get('Server-Timing'))
+        return send
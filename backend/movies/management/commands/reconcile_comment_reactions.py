@@ -0,0 +1,28 @@
+# movies/management/commands/reconcile_comment_reactions.py
+"""
+Recompute Comment.likes_count / dislikes_count from CommentReaction rows.
+Usage: python manage.py reconcile_comment_reactions [--dry-run] [--movie TMDB_ID]
+"""
+from django.core.management.base import BaseCommand
+
+from movies.models import Comment
+from movies.reactions import reconcile_counts
+
+
+class Command(BaseCommand):
+    help = "Repair drift between the denormalized comment reaction counters and the reactions table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report drifted comments')
+        parser.add_argument('--movie', type=int, help='Only comments of this movie (tmdb_id)')
+
+    def handle(self, *args, **options):
+        queryset = Comment.objects.all()
+        if options['movie']:
+            queryset = queryset.filter(movie__tmdb_id=options['movie'])
+
+        drifted = reconcile_counts(queryset, dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{drifted} comments have drifted counters"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Reconciled {drifted} comments"))
@@ -0,0 +1,28 @@
+# movies/management/commands/rollup_play_events.py
+"""
+Compact hourly MoviePlayBucket rows older than PLAY_EVENTS_HOURLY_DAYS into daily buckets.
+Usage: python manage.py rollup_play_events [--days N] [--dry-run]
+Run daily (cron).
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from movies.play_events import rollup, hourly_retention
+
+
+class Command(BaseCommand):
+    help = "Roll hourly play-event buckets up into daily buckets"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Keep hourly buckets for the last N days (default: PLAY_EVENTS_HOURLY_DAYS)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many hourly buckets would be compacted')
+
+    def handle(self, *args, **options):
+        keep = timedelta(days=options['days']) if options['days'] is not None else hourly_retention()
+        count = rollup(before=timezone.now() - keep, dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{count} hourly buckets would be rolled up"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rolled up {count} hourly buckets into daily buckets"))
@@ -0,0 +1,40 @@
+# movies/management/commands/rollup_stats.py
+"""
+Recompute DailyStats (per-day comments / movies / users / ratings) read by the admin dashboard.
+Usage: python manage.py rollup_stats [--from YYYY-MM-DD] [--to YYYY-MM-DD] [--dry-run]
+Without --from it continues from the last run (or the earliest data on the first run).
+Run periodically (cron, e.g. hourly); re-running or backfilling a range is safe.
+"""
+from argparse import ArgumentTypeError
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.dashboard import rollup, watermark
+
+
+def _day(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Roll per-day dashboard counts up into DailyStats"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='first_day', type=_day, help='First day to recompute (default: watermark)')
+        parser.add_argument('--to', dest='last_day', type=_day, help='Last day to recompute (default: today)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many DailyStats rows would be written')
+
+    def handle(self, *args, **options):
+        first_day, last_day = options['first_day'], options['last_day']
+        if first_day and last_day and first_day > last_day:
+            raise CommandError("--from must not be after --to")
+
+        count = rollup(first_day, last_day, dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{count} DailyStats rows would be written"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {count} DailyStats rows (watermark: {watermark()})"))
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 22:09
+
+from django.db import migrations, models
+
+from movies.normalization import normalize_text
+
+
+def backfill_normalized(apps, schema_editor):
+    for model_name, source, target in (
+        ('Movie', 'title', 'title_normalized'),
+        ('Category', 'name', 'name_normalized'),
+        ('Country', 'name', 'name_normalized'),
+        ('Actor', 'name', 'name_normalized'),
+    ):
+        model = apps.get_model('movies', model_name)
+        batch = []
+        for obj in model.objects.only('pk', source).iterator(chunk_size=1000):
+            setattr(obj, target, normalize_text(getattr(obj, source)))
+            batch.append(obj)
+            if len(batch) >= 1000:
+                model.objects.bulk_update(batch, [target])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, [target])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_movie_video_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actor',
+            name='name_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='name_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='country',
+            name='name_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='title_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_normalized, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 22:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('parent__isnull', True)), fields=['movie', '-created_at'], name='comment_movie_toplevel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['parent', 'created_at'], name='comment_parent_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commentreaction',
+            index=models.Index(fields=['comment', 'reaction'], name='reaction_comment_kind_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', '-created_at'], name='favorite_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('release_year__isnull', False)), fields=['-release_year', '-views'], name='movie_release_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='watchhistory',
+            index=models.Index(fields=['user', '-last_watched_at'], name='watchhistory_user_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 22:19
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    Comment = apps.get_model('movies', 'Comment')
+    batch = []
+    comments = Comment.objects.order_by().annotate(
+        n_likes=Count('reactions', filter=Q(reactions__reaction='like')),
+        n_dislikes=Count('reactions', filter=Q(reactions__reaction='dislike')),
+    ).filter(Q(n_likes__gt=0) | Q(n_dislikes__gt=0)).only('pk')
+    for comment in comments.iterator(chunk_size=1000):
+        comment.likes_count = comment.n_likes
+        comment.dislikes_count = comment.n_dislikes
+        batch.append(comment)
+        if len(batch) >= 1000:
+            Comment.objects.bulk_update(batch, ['likes_count', 'dislikes_count'])
+            batch = []
+    if batch:
+        Comment.objects.bulk_update(batch, ['likes_count', 'dislikes_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='dislikes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 22:22
+
+from django.db import migrations, models
+
+PATH_STEP = 10
+
+
+def backfill_paths(apps, schema_editor):
+    Comment = apps.get_model('movies', 'Comment')
+    parents = dict(Comment.objects.order_by().values_list('id', 'parent_id'))
+
+    paths = {}
+
+    def path_of(pk):
+        # Đi ngược lên gốc, rồi tính path cho cả chuỗi tổ tiên
+        chain = []
+        while pk is not None and pk not in paths:
+            chain.append(pk)
+            pk = parents.get(pk)
+        prefix = paths.get(pk, '')
+        for node in reversed(chain):
+            prefix += str(node).zfill(PATH_STEP)
+            paths[node] = prefix
+        return paths[chain[0]] if chain else prefix
+
+    batch = []
+    for pk in parents:
+        batch.append(Comment(pk=pk, path=path_of(pk)))
+        if len(batch) >= 1000:
+            Comment.objects.bulk_update(batch, ['path'])
+            batch = []
+    if batch:
+        Comment.objects.bulk_update(batch, ['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0010_comment_reaction_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=500),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
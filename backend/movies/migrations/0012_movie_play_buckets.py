@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 22:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0011_comment_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoviePlayBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], default='hour', max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('watches', models.PositiveIntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='play_buckets', to='movies.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolution', 'bucket_start'], name='playbucket_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('movie', 'resolution', 'bucket_start'), name='playbucket_unique')],
+            },
+        ),
+    ]
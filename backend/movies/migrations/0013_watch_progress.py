@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 22:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0012_movie_play_buckets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watchhistory',
+            name='duration_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='watchhistory',
+            name='finished',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='watchhistory',
+            name='position_seconds',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='watchhistory',
+            index=models.Index(condition=models.Q(('finished', False), ('position_seconds__gt', 0)), fields=['user', '-last_watched_at'], name='watchhistory_continue_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 22:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0013_watch_progress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WatchHistoryArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_watched_at', models.DateTimeField()),
+                ('finished', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='watchhistory',
+            name='watchhistory_user_recent_idx',
+        ),
+        migrations.AddIndex(
+            model_name='watchhistory',
+            index=models.Index(fields=['user', '-last_watched_at'], include=('id', 'movie'), name='watchhistory_user_recent_idx'),
+        ),
+        migrations.AddField(
+            model_name='watchhistoryarchive',
+            name='movie',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie'),
+        ),
+        migrations.AddField(
+            model_name='watchhistoryarchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='watchhistoryarchive',
+            unique_together={('user', 'movie')},
+        ),
+    ]
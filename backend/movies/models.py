@@ -2,6 +2,15 @@ from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify  # <-- ĐÃ THÊM IMPORT
+from .normalization import normalize_text
+
+
+def _with_normalized_field(kwargs, source, target):
+    """Nếu save(update_fields=...) có trường gốc thì lưu kèm cột normalized"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and source in update_fields and target not in update_fields:
+        kwargs['update_fields'] = list(update_fields) + [target]
+    return kwargs
 
 # ==================================
 # MODELS HỖ TRỢ (Phân loại)
@@ -11,6 +20,8 @@ class Category(models.Model):
     """Thể loại phim (Vd: Hành động, Tình cảm)"""
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=110, unique=True, blank=True)
+    # Bản không dấu, chữ thường của name (xem normalize_text) để lọc không phân biệt dấu
+    name_normalized = models.CharField(max_length=100, blank=True, db_index=True, editable=False)
     
     def __str__(self):
         return self.name
@@ -19,7 +30,8 @@ class Category(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:  # Nếu slug đang rỗng
             self.slug = slugify(self.name)  # Tự động tạo slug từ name
-        super().save(*args, **kwargs)  # Gọi hàm save gốc
+        self.name_normalized = normalize_text(self.name)
+        super().save(*args, **_with_normalized_field(kwargs, 'name', 'name_normalized'))  # Gọi hàm save gốc
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -28,6 +40,7 @@ class Country(models.Model):
     """Quốc gia sản xuất"""
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=110, unique=True, blank=True)
+    name_normalized = models.CharField(max_length=100, blank=True, db_index=True, editable=False)
     
     def __str__(self):
         return self.name
@@ -36,7 +49,8 @@ class Country(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        self.name_normalized = normalize_text(self.name)
+        super().save(*args, **_with_normalized_field(kwargs, 'name', 'name_normalized'))
 
     class Meta:
         verbose_name_plural = "Countries"
@@ -44,10 +58,15 @@ class Country(models.Model):
 class Actor(models.Model):
     """Diễn viên"""
     name = models.CharField(max_length=255, unique=True)
+    name_normalized = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
     
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_text(self.name)
+        super().save(*args, **_with_normalized_field(kwargs, 'name', 'name_normalized'))
+
 # ==================================
 # MODEL CHÍNH (Phim)
 # ==================================
@@ -67,6 +86,7 @@ class Movie(models.Model):
     
     # Thông tin cơ bản
     title = models.CharField(max_length=255)
+    title_normalized = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
     original_title = models.CharField(max_length=255, null=True, blank=True)
     description = models.TextField()
     poster = models.URLField(max_length=500, null=True, blank=True, help_text="Link URL đến poster")
@@ -103,10 +123,38 @@ class Movie(models.Model):
 
     class Meta:
         ordering = ['-created_at'] # Phim mới nhất lên đầu
+        indexes = [
+            # Keyset pagination (?cursor=) theo lượt xem / ngày tạo, id để phá hòa
+            models.Index(fields=['-views', '-id'], name='movie_views_id_idx'),
+            models.Index(fields=['-created_at', '-id'], name='movie_created_id_idx'),
+            # Lọc/sắp xếp theo năm, danh sách năm (YearViewSet) - bỏ qua phim chưa có năm
+            models.Index(
+                fields=['-release_year', '-views'],
+                name='movie_release_year_idx',
+                condition=models.Q(release_year__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.release_year})"
 
+    def save(self, *args, **kwargs):
+        self.title_normalized = normalize_text(self.title)
+        super().save(*args, **_with_normalized_field(kwargs, 'title', 'title_normalized'))
+
+
+def title_word_start_q(text):
+    """
+    Q khớp tên phim (không dấu) có một từ bắt đầu bằng `text`: 'man' -> Man of Steel, Iron Man, Spider-Man.
+    Đầu tên viết dạng range (>= term, < term + U+FFFF) để dùng được index title_normalized cả trên SQLite;
+    vế ' term' giữa tên vẫn là LIKE '%...%'.
+    """
+    term = normalize_text(text)
+    return (
+        models.Q(title_normalized__gte=term, title_normalized__lt=term + '\uffff')
+        | models.Q(title_normalized__contains=' ' + term)
+    )
+
 # ==================================
 # MODEL TẬP PHIM
 # ==================================
@@ -152,10 +200,30 @@ class Rating(models.Model):
     class Meta:
         # Mỗi user chỉ được đánh giá 1 phim 1 lần
         unique_together = ('user', 'movie')
+        indexes = [
+            # Thống kê dashboard: WHERE created_at >= ? GROUP BY ngày
+            models.Index(fields=['created_at'], name='rating_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.movie.title}: {self.stars} sao"
 
+COMMENT_PATH_STEP = 10  # mỗi cấp trong Comment.path là id zero-pad 10 chữ số
+COMMENT_PATH_MAX_LENGTH = 500
+COMMENT_MAX_DEPTH = COMMENT_PATH_MAX_LENGTH // COMMENT_PATH_STEP - 1  # comment gốc có depth 0
+
+
+def comment_path_upper(path):
+    """
+    Cận trên (không bao gồm) của mọi path bắt đầu bằng `path`.
+    Path chỉ gồm chữ số nên so sánh chuỗi đúng với mọi collation và dùng được index.
+    Path rỗng (comment chưa có path) không có cận trên: dùng Comment.ensure_path() trước.
+    """
+    if not path:
+        raise ValueError("comment path is empty, call Comment.ensure_path() first")
+    return str(int(path) + 1).zfill(len(path))
+
+
 class Comment(models.Model):
     """Lưu trữ bình luận của người dùng"""
     user = models.ForeignKey(
@@ -179,12 +247,60 @@ class Comment(models.Model):
         related_name='replies'
     )
 
+    # Materialized path: id của các tổ tiên + chính nó, vd "0000000012" + "0000000034".
+    # Subtree = 1 range query trên index (xem subtree()/descendants())
+    path = models.CharField(max_length=COMMENT_PATH_MAX_LENGTH, blank=True, db_index=True, editable=False)
+
+    # Đếm sẵn reactions, cập nhật bởi movies/reactions.py (sửa lệch: manage.py reconcile_comment_reactions)
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    dislikes_count = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         ordering = ['-created_at'] # Bình luận mới nhất lên đầu
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='comment_created_id_idx'),
+            # Bình luận gốc của 1 phim: WHERE movie_id = ? AND parent_id IS NULL ORDER BY created_at
+            models.Index(
+                fields=['movie', '-created_at'],
+                name='comment_movie_toplevel_idx',
+                condition=models.Q(parent__isnull=True),
+            ),
+            # Replies của 1 bình luận theo thứ tự thời gian
+            models.Index(fields=['parent', 'created_at'], name='comment_parent_created_idx'),
+        ]
 
     def __str__(self):
         return f"Comment của {self.user.username} trên {self.movie.title}"
 
+    def save(self, *args, **kwargs):
+        creating = self._state.adding
+        super().save(*args, **kwargs)
+        if creating and not self.path:
+            # Cần id mới có path -> UPDATE ngay sau INSERT
+            self.ensure_path()
+
+    def ensure_path(self):
+        """Path của comment; comment chưa có path (vd tạo bằng bulk_create) được tính từ parent và lưu lại"""
+        if not self.path:
+            parent_path = self.parent.ensure_path() if self.parent_id else ''
+            self.path = parent_path + str(self.pk).zfill(COMMENT_PATH_STEP)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+        return self.path
+
+    @property
+    def depth(self):
+        return len(self.ensure_path()) // COMMENT_PATH_STEP - 1
+
+    def subtree(self):
+        """Comment này và mọi replies (mọi cấp)"""
+        path = self.ensure_path()
+        return Comment.objects.filter(path__gte=path, path__lt=comment_path_upper(path))
+
+    def descendants(self):
+        """Mọi replies (mọi cấp), không gồm chính nó"""
+        path = self.ensure_path()
+        return Comment.objects.filter(path__gt=path, path__lt=comment_path_upper(path))
+
 
 # === NEW: Watch History ===
 class WatchHistory(models.Model):
@@ -200,14 +316,56 @@ class WatchHistory(models.Model):
         related_name='watched_by'
     )
     last_watched_at = models.DateTimeField(auto_now=True)
+    # Vị trí xem (giây) để xem tiếp, ghi theo lô từ heartbeat của player (movies/watch_progress.py)
+    position_seconds = models.PositiveIntegerField(default=0)
+    duration_seconds = models.PositiveIntegerField(null=True, blank=True)
+    finished = models.BooleanField(default=False)
+
+    FINISHED_RATIO = 0.95  # xem tới 95% coi như đã xem hết
 
     class Meta:
         unique_together = ('user', 'movie')
         ordering = ['-last_watched_at']
+        indexes = [
+            # Covering (Postgres INCLUDE): lịch sử của user và lệnh compact_watch_history chỉ cần đọc index
+            models.Index(fields=['user', '-last_watched_at'], name='watchhistory_user_recent_idx', include=['id', 'movie']),
+            # "Xem tiếp": phim đang xem dở của user, mới nhất trước
+            models.Index(
+                fields=['user', '-last_watched_at'],
+                name='watchhistory_continue_idx',
+                condition=models.Q(finished=False, position_seconds__gt=0),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} watched {self.movie.title} at {self.last_watched_at}"
 
+    @property
+    def progress(self):
+        """Phần trăm đã xem, None nếu chưa biết thời lượng"""
+        if self.finished:
+            return 100
+        if not self.duration_seconds:
+            return None
+        return min(100, round(self.position_seconds * 100 / self.duration_seconds))
+
+
+class WatchHistoryArchive(models.Model):
+    """
+    Lịch sử xem cũ hơn WATCH_HISTORY_KEEP mục gần nhất của mỗi user,
+    chuyển từ WatchHistory bởi manage.py compact_watch_history (chỉ giữ dữ liệu cần cho thống kê)
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    last_watched_at = models.DateTimeField()
+    finished = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('user', 'movie')
+
+    def __str__(self):
+        return f"{self.user_id} watched {self.movie_id} at {self.last_watched_at} (archived)"
+
 
 class Favorite(models.Model):
     """Lưu trữ danh sách phim yêu thích của người dùng (tách biệt với rating)"""
@@ -226,6 +384,9 @@ class Favorite(models.Model):
     class Meta:
         unique_together = ('user', 'movie')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='favorite_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} favorited {self.movie.title}"
@@ -246,6 +407,70 @@ class CommentReaction(models.Model):
 
     class Meta:
         unique_together = ('user', 'comment')
+        indexes = [
+            # Đếm like/dislike theo comment
+            models.Index(fields=['comment', 'reaction'], name='reaction_comment_kind_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} {self.reaction} comment {self.comment_id}"
+
+
+# === Play events theo thời gian (trending) ===
+class MoviePlayBucket(models.Model):
+    """
+    Số lượt xem (increment_view) / xem phim (watch) của 1 phim trong 1 giờ.
+    Chỉ cộng dồn (xem movies/play_events.py); giờ cũ được rollup thành bucket theo ngày.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    RESOLUTION_CHOICES = (
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    )
+
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='play_buckets')
+    resolution = models.CharField(max_length=4, choices=RESOLUTION_CHOICES, default=HOUR)
+    bucket_start = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+    watches = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'resolution', 'bucket_start'], name='playbucket_unique'),
+        ]
+        indexes = [
+            # Trending: mọi bucket từ mốc thời gian X; rollup: bucket giờ cũ hơn X
+            models.Index(fields=['resolution', 'bucket_start'], name='playbucket_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} @ {self.bucket_start:%Y-%m-%d %H:00} ({self.resolution}): {self.views} views, {self.watches} watches"
+
+
+# === Thống kê dashboard theo ngày (rollup) ===
+class DailyStats(models.Model):
+    """Số bản ghi mới mỗi ngày theo metric (comments, movies, users, ratings), ghi bởi manage.py rollup_stats"""
+    date = models.DateField()
+    metric = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'date'], name='dailystats_metric_date_unique'),
+        ]
+        verbose_name_plural = "Daily stats"
+
+    def __str__(self):
+        return f"{self.date} {self.metric}: {self.count}"
+
+
+class StatsWatermark(models.Model):
+    """Mốc đã rollup tới (các ngày trước `day` đã chốt trong DailyStats)"""
+    name = models.CharField(max_length=50, unique=True)
+    day = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.day}"
@@ -0,0 +1,45 @@
+"""
+Cached tmdb_id -> Movie.pk lookup for the lightweight write actions (watch/favorite/rate).
+
+Those actions only need the internal id to write a row, so they skip get_object()
+(and the filtered get_queryset() behind it). Entries are dropped when a movie is
+deleted (signals.py) and expire after MOVIE_ID_CACHE_TIMEOUT otherwise.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import NotFound
+
+DEFAULT_TIMEOUT = 3600
+_MISSING = 0  # cache cả kết quả "không có phim" để tmdb_id sai không query lặp lại
+
+
+def _key(tmdb_id):
+    return f'movies:tmdb_id:{tmdb_id}'
+
+
+def movie_id_for_tmdb(tmdb_id):
+    """Returns Movie.pk hoặc None"""
+    try:
+        tmdb_id = int(tmdb_id)
+    except (TypeError, ValueError):
+        return None
+
+    movie_id = cache.get(_key(tmdb_id))
+    if movie_id is None:
+        from .models import Movie
+
+        movie_id = Movie.objects.filter(tmdb_id=tmdb_id).values_list('pk', flat=True).first() or _MISSING
+        timeout = getattr(settings, 'MOVIE_ID_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+        cache.set(_key(tmdb_id), movie_id, timeout if movie_id else 60)
+    return movie_id or None
+
+
+def movie_id_or_404(tmdb_id):
+    movie_id = movie_id_for_tmdb(tmdb_id)
+    if movie_id is None:
+        raise NotFound('Movie not found')
+    return movie_id
+
+
+def forget(tmdb_id):
+    cache.delete(_key(tmdb_id))
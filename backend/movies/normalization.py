@@ -0,0 +1,37 @@
+"""
+Text normalization helpers for Vietnamese/English movie search.
+Strips diacritics (including 'đ'), lowercases and collapses punctuation/whitespace
+so 'Hành Động', 'hanh dong' and 'HÀNH-ĐỘNG' all compare equal.
+
+The same normalize_text() fills the *_normalized shadow columns on the models and
+normalizes query values, so DB filters become a single indexed equality/prefix lookup.
+"""
+import re
+import unicodedata
+
+_NON_WORD_RE = re.compile(r'[^\w\s]+')
+
+
+def fold_accents(value) -> str:
+    """Lowercase and strip Vietnamese diacritics, keeping punctuation as-is."""
+    if not value:
+        return ''
+
+    # 'đ'/'Đ' không tách dấu được bằng NFD nên phải thay thủ công
+    text = str(value).replace('đ', 'd').replace('Đ', 'D')
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn').lower()
+
+
+def normalize_text(value) -> str:
+    """
+    Normalize a string for accent-insensitive matching.
+    Returns '' for None/empty input.
+    """
+    text = _NON_WORD_RE.sub(' ', fold_accents(value))
+    return ' '.join(text.split())
+
+
+def has_diacritics(value) -> bool:
+    """True nếu chuỗi có dấu tiếng Việt (người dùng gõ có dấu)."""
+    return bool(value) and fold_accents(value) != str(value).lower()
@@ -1,77 +1,242 @@
-import os
+"""
+OpenAI Chat Completions client for the chatbot.
+
+All calls go through one pooled requests.Session (keep-alive, no new TLS
+handshake per call) and share a per-call deadline (settings.OPENAI_DEADLINE
+seconds): retries only happen for transient errors and only while the deadline
+allows, never by sleeping past it. A circuit breaker opens after
+OPENAI_BREAKER_FAILURES consecutive provider failures (network errors, timeouts,
+429 and 5xx; a 4xx caused by the request itself does not count) and rejects
+calls immediately (CircuitOpenError) for OPENAI_BREAKER_RESET seconds, so callers
+fall straight back to their local template reply instead of tying up workers
+during a provider incident. Latency percentiles per operation are available
+from stats().
+"""
+import asyncio
+import json
+import threading
 import time
-from typing import List, Dict, Any
-
-try:
-    import openai
-except Exception:
-    openai = None
+from collections import deque
+from typing import List, Dict, Any, Iterator
 
 import requests
-
-MODEL = os.environ.get("OPENAI_MODEL", "gpt-3.5-turbo")
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+API_URL = "https://api.openai.com/v1/chat/completions"
+CONNECT_TIMEOUT = 3.05
+DEFAULT_MODEL = "gpt-3.5-turbo"
+DEFAULT_DEADLINE = 10.0
+DEFAULT_POOL_SIZE = 10
+DEFAULT_BREAKER_FAILURES = 5
+DEFAULT_BREAKER_RESET = 30.0
+MAX_ATTEMPTS = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+LATENCY_SAMPLES = 500
+
+
+class CircuitOpenError(RuntimeError):
+    """Circuit breaker đang mở: không gọi API"""
+
+
+class CircuitBreaker:
+    """closed -> open sau N lần lỗi liên tiếp -> half-open sau reset_timeout (cho 1 call thử)"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class LatencyRecorder:
+    """N mẫu gần nhất theo operation -> count / errors / p50 / p90 / p99 (ms)"""
+
+    def __init__(self, size=LATENCY_SAMPLES):
+        self._samples = {}
+        self._counts = {}
+        self._size = size
+        self._lock = threading.Lock()
+
+    def record(self, operation, seconds, ok=True):
+        with self._lock:
+            self._samples.setdefault(operation, deque(maxlen=self._size)).append(seconds * 1000)
+            counts = self._counts.setdefault(operation, {"count": 0, "errors": 0})
+            counts["count"] += 1
+            counts["errors"] += 0 if ok else 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = {op: (sorted(samples), dict(self._counts[op])) for op, samples in self._samples.items()}
+        result = {}
+        for op, (samples, counts) in snapshot.items():
+            pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))], 1)
+            result[op] = {**counts, "p50_ms": pick(0.50), "p90_ms": pick(0.90), "p99_ms": pick(0.99)}
+        return result
+
+
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=4, pool_maxsize=getattr(settings, "OPENAI_POOL_SIZE", DEFAULT_POOL_SIZE),
+))
+breaker = CircuitBreaker(
+    failure_threshold=getattr(settings, "OPENAI_BREAKER_FAILURES", DEFAULT_BREAKER_FAILURES),
+    reset_timeout=getattr(settings, "OPENAI_BREAKER_RESET", DEFAULT_BREAKER_RESET),
+)
+latency = LatencyRecorder()
 
 
 def has_key() -> bool:
-    return bool(os.environ.get("OPENAI_API_KEY"))
+    return bool(getattr(settings, "OPENAI_API_KEY", None))
 
 
-def chat_completion(messages: List[Dict[str, str]], max_tokens: int = 300, temperature: float = 0.7) -> str:
-    """Call OpenAI Chat Completion API (uses openai package if available, else requests).
+def stats() -> dict:
+    return {"breaker": breaker.state, "rejected": breaker.rejected, "latency": latency.stats()}
 
-    messages: list of {"role":"system"|"user"|"assistant", "content": str}
-    Returns assistant content string. Raises on persistent failures.
-    """
-    api_key = os.environ.get("OPENAI_API_KEY")
+
+def _headers():
+    api_key = getattr(settings, "OPENAI_API_KEY", None)
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY not set")
+    return {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+
+
+def _model():
+    return getattr(settings, "OPENAI_MODEL", DEFAULT_MODEL)
+
 
-    # If openai package is available, prefer it (handles models and responses)
-    if openai is not None:
-        openai.api_key = api_key
-        attempts = 0
-        while attempts < 3:
-            try:
-                resp = openai.ChatCompletion.create(
-                    model=MODEL,
-                    messages=messages,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                )
-                return resp.choices[0].message.content.strip()
-            except Exception:
-                attempts += 1
-                if attempts >= 3:
-                    raise
-                time.sleep(1 + attempts)
-
-    # Fallback to direct HTTP call if openai package missing
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    payload = {"model": MODEL, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
-
-    attempts = 0
-    while attempts < 3:
+def _retryable(exc) -> bool:
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    response = getattr(exc, "response", None)
+    return response is not None and response.status_code in RETRY_STATUSES
+
+
+def _provider_failure(exc) -> bool:
+    """Lỗi phía provider (mạng, timeout, 429, 5xx) mới tính cho breaker; 4xx khác là lỗi của request"""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return True
+    return response.status_code in RETRY_STATUSES or response.status_code >= 500
+
+
+def _post(operation, payload, deadline=None, stream=False):
+    """
+    POST tới API trong hạn `deadline` giây (mặc định settings.OPENAI_DEADLINE), qua circuit breaker.
+    Returns response (với stream=True caller phải đóng response).
+    """
+    headers = _headers()
+    if not breaker.allow():
+        raise CircuitOpenError("OpenAI circuit breaker is open")
+
+    started = time.monotonic()
+    until = started + (deadline or getattr(settings, "OPENAI_DEADLINE", DEFAULT_DEADLINE))
+    attempt = 0
+    while True:
+        attempt += 1
+        remaining = until - time.monotonic()
         try:
-            r = requests.post(url, json=payload, headers=headers, timeout=15)
+            r = _session.post(API_URL, json=payload, headers=headers, stream=stream,
+                              timeout=(min(CONNECT_TIMEOUT, remaining), remaining))
             r.raise_for_status()
-            data = r.json()
-            return data["choices"][0]["message"]["content"].strip()
-        except Exception:
-            attempts += 1
-            if attempts >= 3:
-                raise
-            time.sleep(1 + attempts)
+        except Exception as e:
+            backoff = 0.5 * attempt
+            if attempt < MAX_ATTEMPTS and _retryable(e) and until - time.monotonic() > backoff + 1:
+                time.sleep(backoff)
+                continue
+            if _provider_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()  # API vẫn trả lời: request sai không làm mở breaker cho mọi người
+            latency.record(operation, time.monotonic() - started, ok=False)
+            raise
+        breaker.record_success()
+        latency.record(operation, time.monotonic() - started)
+        return r
+
+
+def chat_completion(messages: List[Dict[str, str]], max_tokens: int = 300, temperature: float = 0.7,
+                    deadline: float = None) -> str:
+    """Call OpenAI Chat Completion API.
+
+    messages: list of {"role":"system"|"user"|"assistant", "content": str}
+    Returns assistant content string. Raises on failure, timeout or open circuit.
+    """
+    payload = {"model": _model(), "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+    data = _post("chat", payload, deadline).json()
+    return data["choices"][0]["message"]["content"].strip()
+
+
+async def achat_completion(messages: List[Dict[str, str]], max_tokens: int = 300, temperature: float = 0.7,
+                           deadline: float = None) -> str:
+    """
+    chat_completion cho async view / task. Không phải async I/O: call requests (blocking) chạy
+    trong thread qua asyncio.to_thread, event loop không bị chặn nhưng mỗi call vẫn giữ 1 thread.
+    """
+    return await asyncio.to_thread(chat_completion, messages, max_tokens, temperature, deadline)
+
+
+def chat_completion_stream(messages: List[Dict[str, str]], max_tokens: int = 300, temperature: float = 0.7,
+                           deadline: float = None) -> Iterator[str]:
+    """Stream the assistant reply: yields content deltas as the API sends them (SSE).
+
+    The deadline covers the time to the response headers; latency is recorded as "stream_first_byte".
+    """
+    payload = {"model": _model(), "messages": messages, "max_tokens": max_tokens, "temperature": temperature, "stream": True}
+
+    with _post("stream_first_byte", payload, deadline, stream=True) as r:
+        r.encoding = "utf-8"  # text/event-stream không kèm charset
+        for line in r.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                return
+            choices = json.loads(data).get("choices") or [{}]
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
 
 
 def chat_completion_with_tools(messages: List[Dict[str, str]], tools: List[Dict], tool_choice: str = "auto") -> Any:
     """Optional helper for function-calling/tool flow. Returns either assistant text or tool arguments dict.
     This uses a requests-based payload including `tools` field (experimental and depends on model support).
     """
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY not set")
-
     payload = {
         "model": "gpt-3.5-turbo-0613",
         "messages": messages,
@@ -79,12 +244,7 @@ def chat_completion_with_tools(messages: List[Dict[str, str]], tools: List[Dict]
         "max_tokens": 300,
     }
 
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-
-    r = requests.post(url, json=payload, headers=headers, timeout=15)
-    r.raise_for_status()
-    data = r.json()
+    data = _post("tools", payload).json()
     message_data = data["choices"][0].get("message", {})
 
     # Attempt to parse function/tool call if present
@@ -92,4 +252,4 @@ def chat_completion_with_tools(messages: List[Dict[str, str]], tools: List[Dict]
         fc = message_data["function_call"]
         # return name and arguments if available
         return {"name": fc.get("name"), "arguments": fc.get("arguments")}
-    return message_data.get("content", "").strip()
\ No newline at end of file
+    return message_data.get("content", "").strip()
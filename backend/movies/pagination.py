@@ -0,0 +1,182 @@
+"""
+Pagination classes for the movies API.
+
+PageNumberPagination runs COUNT(*) on the filtered queryset and an OFFSET scan per
+page, which gets slower the deeper the page. Clients doing infinite scroll can opt
+in to keyset (cursor) mode by sending `?cursor=` (empty for the first page):
+rows are fetched with `WHERE (ordering columns) < (last row values) LIMIT n` on a
+composite index, with `id` as the final tie-breaker so pages never overlap or skip.
+"""
+import base64
+import json
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Ước lượng số dòng từ thống kê của query planner (Postgres) thay vì COUNT(*).
+    Trả về None với các DB khác.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+    except Exception:
+        return None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination on a composite ordering ending with a unique column.
+    The view sets `cursor_ordering`, e.g. ('-views', '-id'), or a subclass sets `ordering`
+    when paginating inside an action (called without view); ordering columns must be NOT NULL.
+    """
+    page_size = 30
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('-id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = tuple(getattr(view, 'cursor_ordering', None) or self.ordering)
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-')) for name in self.ordering
+        ]
+
+        self.count = estimate_count(queryset)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self._after(position))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def _after(self, position):
+        """(a, b, id) < (va, vb, vid) theo chiều của từng cột, viết dạng OR lồng nhau"""
+        condition = Q()
+        for i, name in enumerate(self.ordering):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            term = Q(**{f'{field}__{lookup}': position[i]})
+            for prev_name, prev_value in zip(self.ordering[:i], position[:i]):
+                term &= Q(**{prev_name.lstrip('-'): prev_value})
+            condition |= term
+        return condition
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if len(raw) != len(self.fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(self.fields, raw)]
+        except Exception:
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, obj):
+        values = []
+        for field in self.fields:
+            value = field.value_from_object(obj)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,  # ước lượng (Postgres) hoặc None - không chạy COUNT(*)
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """?page=N như cũ; gửi ?cursor= để chuyển sang keyset pagination (infinite scroll)"""
+    page_size = 30
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self._keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self._keyset = self.keyset_class()
+            self._keyset.page_size = self.page_size
+            self._keyset.max_page_size = self.max_page_size
+            return self._keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self._keyset is not None:
+            return self._keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class CommentResultsSetPagination(StandardResultsSetPagination):
+    """Giữ page size 50 như DEFAULT PAGE_SIZE trước đây cho danh sách comment"""
+    page_size = 50
+
+
+class CommentThreadPagination(KeysetPagination):
+    """Bình luận gốc của 1 phim, mới nhất trước (GET /movies/{id}/comments/?cursor=)"""
+    page_size = 20
+    max_page_size = 50
+    ordering = ('-created_at', '-id')
+
+
+class ReplyPagination(KeysetPagination):
+    """Replies của 1 bình luận theo thứ tự thời gian (GET /comments/{id}/replies/?cursor=)"""
+    page_size = 20
+    max_page_size = 50
+    ordering = ('created_at', 'id')
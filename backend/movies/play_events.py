@@ -0,0 +1,78 @@
+"""
+Time-bucketed play events (MoviePlayBucket).
+
+increment_view and watch feed per-movie counters for the current hour; the
+counts are buffered together with Movie.views in view_counter.py and written
+with one additive upsert per flush. Hourly buckets older than
+PLAY_EVENTS_HOURLY_DAYS are compacted into one bucket per movie per day by
+`manage.py rollup_play_events`, so storage stays ~24x smaller for history.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from .models import MoviePlayBucket
+from .upserts import bulk_upsert
+
+DEFAULT_HOURLY_DAYS = 14
+VIEW = 'views'
+WATCH = 'watches'
+
+
+def hour_start(when=None):
+    when = when or timezone.now()
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def write_buckets(counts, resolution=MoviePlayBucket.HOUR):
+    """counts: {(movie_id, bucket_start): {'views': n, 'watches': m}} -> 1 upsert cộng dồn"""
+    rows = [
+        {
+            'movie_id': movie_id,
+            'resolution': resolution,
+            'bucket_start': bucket_start,
+            'views': values.get(VIEW, 0),
+            'watches': values.get(WATCH, 0),
+        }
+        for (movie_id, bucket_start), values in counts.items()
+    ]
+    return bulk_upsert(
+        MoviePlayBucket, rows,
+        unique_fields=('movie', 'resolution', 'bucket_start'),
+        add_fields=('views', 'watches'),
+    )
+
+
+def hourly_retention():
+    return timedelta(days=getattr(settings, 'PLAY_EVENTS_HOURLY_DAYS', DEFAULT_HOURLY_DAYS))
+
+
+def rollup(before=None, dry_run=False) -> int:
+    """
+    Gộp bucket giờ của các ngày trước `before` thành bucket ngày rồi xóa bucket giờ.
+    Chỉ gộp ngày đã trọn (before làm tròn xuống 00:00). Returns số bucket giờ đã gộp.
+    """
+    before = before or timezone.now() - hourly_retention()
+    before = timezone.localtime(before).replace(hour=0, minute=0, second=0, microsecond=0)
+    hourly = MoviePlayBucket.objects.filter(resolution=MoviePlayBucket.HOUR, bucket_start__lt=before)
+
+    with transaction.atomic():
+        daily = defaultdict(dict)
+        rows = (
+            hourly.order_by()
+            .annotate(day=TruncDay('bucket_start'))
+            .values('movie_id', 'day')
+            .annotate(total_views=Sum('views'), total_watches=Sum('watches'))
+        )
+        for row in rows:
+            daily[(row['movie_id'], row['day'])] = {VIEW: row['total_views'], WATCH: row['total_watches']}
+        if dry_run or not daily:
+            return hourly.count() if dry_run else 0
+        write_buckets(daily, resolution=MoviePlayBucket.DAY)
+        deleted, _ = hourly.delete()
+    return deleted
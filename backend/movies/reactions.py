@@ -0,0 +1,88 @@
+"""
+Like/dislike on comments with denormalized counters.
+
+Comment.likes_count / dislikes_count are maintained here with F() updates inside
+the same transaction as the CommentReaction row change, so reads never have to
+aggregate the reactions table. Rows removed outside these helpers (e.g. cascade
+when a user is deleted) leave the counters stale; reconcile_counts() repairs them.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+
+from .models import Comment, CommentReaction
+
+COUNTER_FIELDS = {
+    CommentReaction.LIKE: 'likes_count',
+    CommentReaction.DISLIKE: 'dislikes_count',
+}
+
+
+def _adjust(comment_id, increment=None, decrement=None):
+    updates = {}
+    if increment:
+        updates[COUNTER_FIELDS[increment]] = F(COUNTER_FIELDS[increment]) + 1
+    if decrement:
+        # Không để counter âm nếu đã lệch sẵn
+        updates[COUNTER_FIELDS[decrement]] = Greatest(F(COUNTER_FIELDS[decrement]) - 1, Value(0))
+    if updates:
+        Comment.objects.filter(pk=comment_id).update(**updates)
+
+
+def set_reaction(user, comment, reaction):
+    """Tạo hoặc đổi reaction (like <-> dislike) của user và cập nhật counters"""
+    with transaction.atomic():
+        obj, created = CommentReaction.objects.get_or_create(
+            user=user, comment=comment, defaults={'reaction': reaction}
+        )
+        if created:
+            _adjust(comment.pk, increment=reaction)
+            return
+        if obj.reaction == reaction:
+            return
+        # Conditional UPDATE: request đồng thời chỉ một bên được đổi counters
+        switched = CommentReaction.objects.filter(pk=obj.pk, reaction=obj.reaction).update(reaction=reaction)
+        if switched:
+            _adjust(comment.pk, increment=reaction, decrement=obj.reaction)
+
+
+def remove_reaction(user, comment):
+    """Xóa reaction của user (nếu có) và giảm counter tương ứng"""
+    with transaction.atomic():
+        for reaction in COUNTER_FIELDS:
+            deleted, _ = CommentReaction.objects.filter(user=user, comment=comment, reaction=reaction).delete()
+            if deleted:
+                _adjust(comment.pk, decrement=reaction)
+
+
+def reconcile_counts(queryset=None, dry_run=False, batch_size=1000):
+    """
+    So counters với số reactions thực tế và sửa các comment bị lệch.
+    Returns số comment bị lệch.
+    """
+    queryset = Comment.objects.all() if queryset is None else queryset
+    drifted = (
+        queryset.order_by()
+        .annotate(
+            actual_likes=Count('reactions', filter=Q(reactions__reaction=CommentReaction.LIKE)),
+            actual_dislikes=Count('reactions', filter=Q(reactions__reaction=CommentReaction.DISLIKE)),
+        )
+        .exclude(likes_count=F('actual_likes'), dislikes_count=F('actual_dislikes'))
+        .only('pk', 'likes_count', 'dislikes_count')
+    )
+
+    fixed = 0
+    batch = []
+    for comment in drifted.iterator(chunk_size=batch_size):
+        fixed += 1
+        if dry_run:
+            continue
+        comment.likes_count = comment.actual_likes
+        comment.dislikes_count = comment.actual_dislikes
+        batch.append(comment)
+        if len(batch) >= batch_size:
+            Comment.objects.bulk_update(batch, ['likes_count', 'dislikes_count'])
+            batch = []
+    if batch:
+        Comment.objects.bulk_update(batch, ['likes_count', 'dislikes_count'])
+    return fixed
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Movie, Category, Comment, Rating, Episode, Country, Actor, Favorite
+from .models import Movie, Category, Comment, Rating, Episode, Country, Actor, Favorite, COMMENT_MAX_DEPTH
+from .normalization import normalize_text
 from django.db.models import Avg, Count, Q
 from django.contrib.auth import get_user_model
 
@@ -62,36 +63,42 @@ class CommentSerializer(serializers.ModelSerializer):
     movie_poster = serializers.CharField(source='movie.poster', read_only=True)
     parent_username = serializers.CharField(source='parent.user.username', read_only=True, allow_null=True)
     parent_nickname = serializers.CharField(source='parent.user.nickname', read_only=True, allow_null=True)
-    likes_count = serializers.SerializerMethodField()
-    dislikes_count = serializers.SerializerMethodField()
     user_reaction = serializers.SerializerMethodField()
+    reply_count = serializers.SerializerMethodField()
     replies = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
-        fields = '__all__'
+        exclude = ('path',)  # materialized path chỉ dùng nội bộ (models.Comment)
         read_only_fields = ('user', 'movie', 'created_at')
     
-    def get_likes_count(self, obj):
-        return obj.reactions.filter(reaction='like').count()
-    
-    def get_dislikes_count(self, obj):
-        return obj.reactions.filter(reaction='dislike').count()
-    
     def get_user_reaction(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
+            user_reactions = self.context.get('user_reactions')
+            if user_reactions is not None:
+                return user_reactions.get(obj.id)
             reaction = obj.reactions.filter(user=request.user).first()
             return reaction.reaction if reaction else None
         return None
     
+    def get_reply_count(self, obj):
+        reply_counts = self.context.get('reply_counts')
+        if reply_counts is not None:
+            return reply_counts.get(obj.id, 0)
+        return obj.replies.count()
+
     def get_replies(self, obj):
         """Get all replies for this comment"""
         include_replies = self.context.get('include_replies', True)
         if not include_replies:
             return []
         
-        replies = obj.replies.all().order_by('created_at')
+        children = self.context.get('comment_children')
+        if children is not None:
+            replies = children.get(obj.id, [])
+        else:
+            replies = obj.replies.all().order_by('created_at')
         return CommentSerializer(replies, many=True, context=self.context).data
 
 class AdminCommentSerializer(serializers.ModelSerializer):
@@ -137,12 +144,19 @@ class MovieSerializer(serializers.ModelSerializer):
         fields = ('title', 'poster', 'release_year', 'tmdb_id', 'categories', 'country', 'description', 'average_rating', 'is_favorite', 'views')
 
     def get_average_rating(self, obj):
-        avg = obj.ratings.aggregate(Avg('stars'))['stars__avg']
+        # avg_rating có thể đã được annotate / gán sẵn cho cả trang (tránh 1 query mỗi phim)
+        if hasattr(obj, 'avg_rating'):
+            avg = obj.avg_rating
+        else:
+            avg = obj.ratings.aggregate(Avg('stars'))['stars__avg']
         return round(avg, 1) if avg else None
 
     def get_is_favorite(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
+            favorite_ids = self.context.get('favorite_movie_ids')
+            if favorite_ids is not None:
+                return obj.id in favorite_ids
             from .models import Favorite
             return Favorite.objects.filter(user=request.user, movie=obj).exists()
         return False
@@ -189,6 +203,17 @@ class CommentCreateSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ('movie_tmdb_id', 'content', 'parent_id')
 
+    def validate_parent_id(self, value):
+        if value is None:
+            return value
+        parent = Comment.objects.filter(pk=value).first()
+        if parent is None:
+            raise serializers.ValidationError("Parent comment does not exist")
+        # Mỗi cấp thêm COMMENT_PATH_STEP ký tự vào path: quá sâu thì path vượt max_length
+        if parent.depth >= COMMENT_MAX_DEPTH:
+            raise serializers.ValidationError(f"Replies cannot be nested more than {COMMENT_MAX_DEPTH} levels deep")
+        return value
+
     def create(self, validated_data):
         movie_tmdb_id = validated_data.pop('movie_tmdb_id')
         parent_id = validated_data.pop('parent_id', None)
@@ -239,7 +264,7 @@ class AdminMovieSerializer(serializers.ModelSerializer):
             if isinstance(country_value, str):
                 # Try to find country by name
                 try:
-                    country = Country.objects.get(name__iexact=country_value)
+                    country = Country.objects.get(name_normalized=normalize_text(country_value))
                     attrs['country'] = country
                 except Country.DoesNotExist:
                     raise serializers.ValidationError(f"Country '{country_value}' not found")
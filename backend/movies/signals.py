@@ -0,0 +1,38 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Movie, Category, Country
+from .suggest_index import suggest_index
+from .facets import facet_index
+from . import movie_ids
+
+
+def _views_only(kwargs):
+    update_fields = kwargs.get('update_fields')
+    return bool(update_fields) and set(update_fields) <= {'views'}
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def invalidate_movie_indexes(sender, instance, **kwargs):
+    # Chỉ tăng views thì không cần rebuild, suggest index tự làm mới theo SUGGEST_INDEX_MAX_AGE
+    if _views_only(kwargs):
+        return
+    suggest_index.invalidate()
+    facet_index.invalidate()
+    # Phim mới import có thể đang bị cache là "không có" -> xóa entry tmdb_id
+    movie_ids.forget(instance.tmdb_id)
+
+
+@receiver(m2m_changed, sender=Movie.categories.through)
+def invalidate_category_facets(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        facet_index.invalidate()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+def invalidate_facets(sender, instance, **kwargs):
+    facet_index.invalidate()
@@ -0,0 +1,131 @@
+"""
+In-memory prefix index over movie titles for typeahead suggestions.
+
+Each process keeps a sorted list of normalized title keys (Vietnamese title and
+original title, plus every word-start suffix so 'wick' finds 'John Wick').
+A prefix lookup is two bisects over that list, so suggestions never touch the DB.
+The index is rebuilt lazily when a Movie changes (version token in the cache,
+replaced by signals) or when it is older than SUGGEST_INDEX_MAX_AGE seconds so
+popularity ranking follows `views`. Only one request per process rebuilds; the
+others keep answering from the previous snapshot meanwhile.
+"""
+import bisect
+import heapq
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .normalization import normalize_text
+
+VERSION_CACHE_KEY = 'movies:suggest_index:version'
+DEFAULT_MAX_AGE = 300
+
+
+class TitleSuggestIndex:
+    """Sorted prefix index of normalized titles, ranked by views"""
+
+    def __init__(self):
+        # (keys, entries, movies, views):
+        #   keys    - sorted normalized keys
+        #   entries - (movie_pk, is_title_start) song song với keys
+        #   movies  - movie_pk -> payload trả về cho client
+        #   views   - movie_pk -> views tại thời điểm build
+        self._snapshot = ([], [], {}, {})
+        self._version = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """
+        Đánh dấu index cũ ở mọi process dùng chung cache. Token ngẫu nhiên thay vì bộ đếm:
+        bộ đếm bị cache evict rồi đếm lại từ 1 có thể trùng đúng version đã build.
+        """
+        cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+    def suggest(self, query: str, limit: int = 8) -> list[dict]:
+        prefix = normalize_text(query)
+        if not prefix:
+            return []
+
+        self._ensure_fresh()
+        # Rebuild ở thread khác chỉ thay cả snapshot, không sửa tại chỗ
+        keys, entries, movies, views = self._snapshot
+
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + '\uffff')
+
+        matched = {}
+        for i in range(lo, hi):
+            pk, is_title_start = entries[i]
+            matched[pk] = matched.get(pk, False) or is_title_start
+
+        # Ưu tiên phim có tiêu đề bắt đầu bằng prefix, sau đó theo lượt xem
+        top = heapq.nsmallest(
+            limit,
+            matched.items(),
+            key=lambda item: (not item[1], -views[item[0]], movies[item[0]]['title']),
+        )
+        return [dict(movies[pk]) for pk, _ in top]
+
+    def _ensure_fresh(self):
+        version = cache.get(VERSION_CACHE_KEY)
+        max_age = getattr(settings, 'SUGGEST_INDEX_MAX_AGE', DEFAULT_MAX_AGE)
+        if self._is_fresh(version, max_age):
+            return
+
+        # Đã có snapshot: chỉ 1 request build lại, các request khác dùng tạm snapshot cũ
+        if not self._lock.acquire(blocking=not self._built_at):
+            return
+        try:
+            if not self._is_fresh(version, max_age):
+                self._build(version)
+        finally:
+            self._lock.release()
+
+    def _is_fresh(self, version, max_age):
+        return bool(self._built_at) and self._version == version and time.monotonic() - self._built_at < max_age
+
+    def _build(self, version):
+        from .models import Movie
+
+        rows = Movie.objects.order_by().values_list(
+            'id', 'tmdb_id', 'title', 'original_title', 'poster', 'release_year', 'views'
+        )
+
+        pairs = []
+        movies = {}
+        views = {}
+        for pk, tmdb_id, title, original_title, poster, release_year, view_count in rows.iterator():
+            movies[pk] = {
+                'tmdb_id': tmdb_id,
+                'title': title,
+                'poster': poster,
+                'release_year': release_year,
+            }
+            views[pk] = view_count or 0
+            for key, is_title_start in self._keys_for(title, original_title):
+                pairs.append((key, pk, is_title_start))
+
+        pairs.sort()
+        keys = [key for key, _, _ in pairs]
+        entries = [(pk, is_title_start) for _, pk, is_title_start in pairs]
+        self._snapshot = (keys, entries, movies, views)
+        self._version = version
+        self._built_at = time.monotonic()
+
+    @staticmethod
+    def _keys_for(*titles):
+        keys = {}
+        for title in titles:
+            words = normalize_text(title).split()
+            for i in range(len(words)):
+                key = ' '.join(words[i:])
+                keys[key] = keys.get(key, False) or i == 0
+        return keys.items()
+
+
+# Singleton instance
+suggest_index = TitleSuggestIndex()
@@ -1,3 +1,1163 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import requests
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+from rest_framework.settings import api_settings
+
+from . import dashboard, exports, llm_backends, openai_client, play_events, throttling
+from .chat_filters import FilterExtractor
+from .management.commands import loadtest_chat
+from .reactions import reconcile_counts
+from .trending import trending_index
+from .upserts import bulk_upsert
+from .suggest_index import suggest_index
+from .hydration import hydrate_movies
+from .intent_parser import DEFAULT_THRESHOLD as DEFAULT_LOCAL_CONFIDENCE, TITLE_CONFIDENCE, intent_parser
+from .keyword_extractor import extractor
+from .models import (
+    COMMENT_MAX_DEPTH, COMMENT_PATH_STEP, Category, Comment, CommentReaction, Country, DailyStats, Favorite, Movie,
+    MoviePlayBucket, Rating, WatchHistory, WatchHistoryArchive,
+)
+from .views import ChatAPIView
+from .view_counter import ViewCounter, view_counter
+from .watch_progress import ProgressBuffer, progress_buffer
+
+User = get_user_model()
+
+
+def make_movie(tmdb_id, title='Phim', **fields):
+    fields.setdefault('description', '')
+    return Movie.objects.create(tmdb_id=tmdb_id, title=title, **fields)
+
+
+class ApiTestCase(TestCase):
+    def setUp(self):
+        cache.clear()  # throttle bucket, dedupe lượt xem, facet/snapshot cache
+        self.user = User.objects.create_user(username='viewer', password='secret-pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        # Buffer của worker là singleton: ghi nốt trong transaction của test, không để lại cho test sau
+        view_counter.flush()
+        progress_buffer.flush()
+
+
+class WatchActionTests(ApiTestCase):
+    def test_first_watch_creates_history_row(self):
+        movie = make_movie(1)
+
+        response = self.client.post('/api/movies/1/watch/')
+
+        self.assertEqual(response.status_code, 200)
+        history = WatchHistory.objects.get(user=self.user, movie=movie)
+        self.assertEqual(history.position_seconds, 0)
+        self.assertFalse(history.finished)
+
+    def test_rewatch_keeps_progress(self):
+        movie = make_movie(1)
+        WatchHistory.objects.create(user=self.user, movie=movie, position_seconds=120, duration_seconds=600)
+
+        response = self.client.post('/api/movies/1/watch/')
+
+        self.assertEqual(response.status_code, 200)
+        history = WatchHistory.objects.get(user=self.user, movie=movie)
+        self.assertEqual(history.position_seconds, 120)
+        self.assertEqual(WatchHistory.objects.count(), 1)
+
+
+class AccentInsensitiveSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        action = Category.objects.create(name='Phim Hành Động')
+        japan = Country.objects.create(name='Japan')
+        self.match = make_movie(1, 'Kiếm Khách', country=japan)
+        self.match.categories.add(action)
+        make_movie(2, 'Kiếm Khách 2', country=japan)
+
+    def search(self, query):
+        response = self.client.get('/api/movies/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [movie['tmdb_id'] for movie in response.data['results']]
+
+    def test_mixed_accent_query_keeps_genre(self):
+        keywords = extractor.extract_keywords('phim hanh dong nhật bản')
+
+        self.assertEqual(keywords['genres'], ['Phim Hành Động'])
+        self.assertEqual(keywords['country'], 'japan')
+
+    def test_accented_words_only_match_the_same_accented_keyword(self):
+        for query in ('phim hai người bạn', 'phim mà tôi thích', 'số phận của tôi'):
+            with self.subTest(query=query):
+                self.assertEqual(extractor.extract_keywords(query)['genres'], [])
+
+        self.assertEqual(extractor.extract_keywords('phim hai my')['genres'], ['Phim Hài'])
+        self.assertEqual(extractor.extract_keywords('phim hài hàn quốc')['genres'], ['Phim Hài'])
+
+    def test_accented_unaccented_and_mixed_queries_match_the_same_movies(self):
+        for query in ('phim hành động nhật bản', 'phim hanh dong nhat ban', 'phim hanh dong nhật bản'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), [1])
+
+    def test_title_search_matches_the_start_of_any_word(self):
+        make_movie(3, 'John Wick')
+        make_movie(4, 'The Wicker Man')
+        make_movie(5, 'Iron Man')
+        make_movie(6, 'Man of Steel')
+        make_movie(7, 'Spider-Man')
+        make_movie(8, 'Batman')
+
+        self.assertEqual(self.search('john'), [3])
+        self.assertCountEqual(self.search('wick'), [3, 4])
+        self.assertCountEqual(self.search('man'), [4, 5, 6, 7])
+
+    def test_tmdb_ids_filter_ignores_invalid_ids(self):
+        response = self.client.get('/api/movies/', {'tmdb_ids': '2, x,1'})
+
+        self.assertCountEqual([movie['tmdb_id'] for movie in response.data['results']], [1, 2])
+
+
+class ViewCounterTests(ApiTestCase):
+    def test_increment_view_is_buffered_until_flush(self):
+        movie = make_movie(1)
+
+        response = self.client.post('/api/movies/1/increment_view/')
+
+        self.assertEqual(response.data, {'status': 'success', 'views': 1})
+        movie.refresh_from_db()
+        self.assertEqual(movie.views, 0)
+
+        self.assertEqual(view_counter.flush(), 1)
+        movie.refresh_from_db()
+        self.assertEqual(movie.views, 1)
+        self.assertEqual(MoviePlayBucket.objects.get(movie=movie).views, 1)
+
+    def test_repeated_view_from_same_client_is_not_counted(self):
+        make_movie(1)
+
+        self.client.post('/api/movies/1/increment_view/')
+        response = self.client.post('/api/movies/1/increment_view/')
+
+        self.assertEqual(response.data['status'], 'duplicate')
+        self.assertEqual(view_counter.pending(Movie.objects.get().pk), 1)
+
+    @override_settings(VIEW_COUNTER_FLUSH_INTERVAL=0.01)
+    def test_timer_flushes_an_idle_buffer(self):
+        counter = ViewCounter()
+        written = threading.Event()
+        counter._write = lambda batch: written.set()
+
+        counter.increment(42)
+
+        self.assertTrue(written.wait(timeout=2))
+        self.assertEqual(counter.pending(42), 0)
+
+    def test_flush_failure_keeps_counts_buffered(self):
+        counter = ViewCounter()
+
+        def fail(batch):
+            raise RuntimeError('database down')
+        counter._write = fail
+        counter.increment(42, n=3)
+        with self.assertLogs('movies.view_counter', 'ERROR'):
+            counter.flush()
+
+        self.assertEqual(counter.pending(42), 3)
+        counter._timer.cancel()
+
+
+class WatchProgressTests(ApiTestCase):
+    def heartbeat(self, position, duration=600):
+        return self.client.post('/api/movies/1/progress/', {'position': position, 'duration': duration}, format='json')
+
+    def test_heartbeats_are_coalesced_and_reach_continue_watching_after_flush(self):
+        make_movie(1, 'Kiếm Khách')
+
+        self.assertEqual(self.heartbeat(10).status_code, 202)
+        self.assertEqual(self.heartbeat(30).status_code, 202)
+        self.assertEqual(self.client.get('/api/movies/1/progress/').data['position_seconds'], 30)
+        self.assertFalse(WatchHistory.objects.exists())
+
+        self.assertEqual(progress_buffer.flush(), 1)
+        response = self.client.get('/api/auth/profile/continue-watching/')
+        self.assertEqual([(item['tmdb_id'], item['position_seconds']) for item in response.data], [(1, 30)])
+
+    def test_near_end_position_marks_finished(self):
+        make_movie(1)
+
+        self.heartbeat(590)
+        progress_buffer.flush()
+
+        self.assertTrue(WatchHistory.objects.get().finished)
+        self.assertEqual(self.client.get('/api/auth/profile/continue-watching/').data, [])
+
+    def test_position_past_duration_is_rejected(self):
+        make_movie(1)
+
+        self.assertEqual(self.heartbeat(700).status_code, 400)
+
+    def test_non_finite_position_is_rejected(self):
+        make_movie(1)
+
+        for position in ('inf', '-inf', 'nan', 'abc'):
+            with self.subTest(position=position):
+                self.assertEqual(self.heartbeat(position).status_code, 400)
+
+    @override_settings(WATCH_PROGRESS_FLUSH_INTERVAL=0.01)
+    def test_timer_flushes_an_idle_buffer(self):
+        buffer = ProgressBuffer()
+        written = threading.Event()
+        buffer._write = lambda batch: written.set()
+
+        buffer.record(1, 1, 10, 600)
+
+        self.assertTrue(written.wait(timeout=2))
+        self.assertIsNone(buffer.get(1, 1))
+
+    def test_flush_failure_keeps_positions_buffered(self):
+        buffer = ProgressBuffer()
+
+        def fail(batch):
+            raise RuntimeError('database down')
+        buffer._write = fail
+        buffer.record(1, 1, 10, 600)
+        with self.assertLogs('movies.watch_progress', 'ERROR'):
+            buffer.flush()
+
+        self.assertEqual(buffer.get(1, 1)[0], 10)
+        buffer._timer.cancel()
+
+
+class SuggestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        make_movie(1, 'John Wick', views=10)
+        make_movie(2, 'Johnny English', views=50)
+        make_movie(3, 'Đảo Hải Tặc', views=5)
+
+    def suggest(self, **params):
+        response = self.client.get('/api/movies/suggest/', params)
+        self.assertEqual(response.status_code, 200)
+        return [movie['tmdb_id'] for movie in response.data]
+
+    def test_prefix_matches_title_and_word_starts(self):
+        self.assertEqual(self.suggest(q='john'), [2, 1])
+        self.assertEqual(self.suggest(q='wick'), [1])
+        self.assertEqual(self.suggest(q='dao hai'), [3])
+
+    def test_invalid_limit_falls_back_to_default(self):
+        self.assertEqual(self.suggest(q='john', limit='abc'), [2, 1])
+        self.assertEqual(self.suggest(q='john', limit='-3'), [2, 1])
+
+    def test_limit_is_clamped_to_at_least_one(self):
+        self.assertEqual(self.suggest(q='john', limit='0'), [2])
+        self.assertEqual(self.suggest(q='john', limit='1'), [2])
+
+    def test_new_version_after_cache_eviction_still_rebuilds(self):
+        cache.clear()
+        make_movie(4, 'John Doe')  # version đầu tiên sau khi cache trống
+        self.assertEqual(self.suggest(q='john'), [2, 1, 4])
+        cache.clear()  # mất version (evict / restart cache)
+
+        make_movie(5, 'John Carter', views=99)  # lại là version đầu tiên sau khi cache trống
+
+        self.assertEqual(self.suggest(q='john'), [5, 2, 1, 4])
+
+    def test_stale_snapshot_is_served_while_another_request_rebuilds(self):
+        self.assertEqual(self.suggest(q='john'), [2, 1])
+        make_movie(4, 'John Carter', views=99)
+
+        with suggest_index._lock:  # request khác đang build lại
+            self.assertEqual(self.suggest(q='john'), [2, 1])
+        self.assertEqual(self.suggest(q='john'), [4, 2, 1])
+
+
+class CommentPathTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.movie = make_movie(1)
+        self.root = Comment.objects.create(user=self.user, movie=self.movie, content='root')
+        self.reply = Comment.objects.create(user=self.user, movie=self.movie, content='reply', parent=self.root)
+        self.nested = Comment.objects.create(user=self.user, movie=self.movie, content='nested', parent=self.reply)
+        self.other = Comment.objects.create(user=self.user, movie=self.movie, content='other')
+
+    def test_path_is_ancestor_ids_and_subtree_is_a_range(self):
+        self.assertEqual(self.nested.path, self.reply.path + str(self.nested.pk).zfill(COMMENT_PATH_STEP))
+        self.assertEqual(self.nested.depth, 2)
+        self.assertCountEqual(self.root.subtree(), [self.root, self.reply, self.nested])
+        self.assertCountEqual(self.root.descendants(), [self.reply, self.nested])
+
+    def test_comment_without_path_gets_one_on_demand(self):
+        Comment.objects.filter(pk__in=[self.reply.pk, self.nested.pk]).update(path='')
+        nested = Comment.objects.get(pk=self.nested.pk)
+
+        self.assertEqual(list(nested.subtree()), [nested])
+        self.assertEqual(nested.path, Comment.objects.get(pk=self.nested.pk).path)
+        self.assertTrue(Comment.objects.get(pk=self.reply.pk).path)
+
+    def test_api_nests_replies_and_hides_path(self):
+        response = self.client.get('/api/movies/1/comments/')
+
+        self.assertEqual(response.status_code, 200)
+        root = next(c for c in response.data if c['id'] == self.root.pk)
+        self.assertNotIn('path', root)
+        self.assertEqual([r['id'] for r in root['replies']], [self.reply.pk])
+        self.assertEqual([r['id'] for r in root['replies'][0]['replies']], [self.nested.pk])
+
+    def reply_to(self, parent):
+        return self.client.post('/api/comments/', {'movie_tmdb_id': 1, 'content': 'hay', 'parent_id': parent.pk})
+
+    def test_reply_deeper_than_the_path_allows_is_rejected(self):
+        parent = self.nested
+        while parent.depth < COMMENT_MAX_DEPTH:
+            parent = Comment.objects.create(user=self.user, movie=self.movie, content='deeper', parent=parent)
+
+        response = self.reply_to(parent)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent_id', response.data)
+        self.assertEqual(self.reply_to(parent.parent).status_code, 201)
+        self.assertEqual(self.client.post('/api/comments/', {
+            'movie_tmdb_id': 1, 'content': 'hay', 'parent_id': 999999,
+        }).status_code, 400)
+
+
+def api_response(status_code, body=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body or {}).encode()
+    return response
+
+
+def completion(text):
+    return api_response(200, {'choices': [{'message': {'content': text}}]})
+
+
+@override_settings(OPENAI_API_KEY='test-key')
+class OpenAIClientTests(TestCase):
+    def setUp(self):
+        self.breaker = openai_client.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        for patcher in (
+            mock.patch.object(openai_client, 'breaker', self.breaker),
+            mock.patch.object(openai_client.time, 'sleep'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def chat(self, *responses):
+        with mock.patch.object(openai_client._session, 'post', side_effect=list(responses)) as post:
+            try:
+                return openai_client.chat_completion([{'role': 'user', 'content': 'hi'}])
+            finally:
+                self.calls = post.call_count
+
+    def test_transient_error_is_retried_within_the_deadline(self):
+        self.assertEqual(self.chat(api_response(503), completion(' ok ')), 'ok')
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_breaker_opens_after_consecutive_provider_failures(self):
+        for _ in range(2):
+            with self.assertRaises(requests.HTTPError):
+                self.chat(*[api_response(500)] * openai_client.MAX_ATTEMPTS)
+
+        self.assertEqual(self.breaker.state, 'open')
+        with self.assertRaises(openai_client.CircuitOpenError):
+            self.chat(completion('never sent'))
+        self.assertEqual(self.calls, 0)
+
+    def test_client_errors_do_not_open_the_breaker(self):
+        for _ in range(3):
+            with self.assertRaises(requests.HTTPError):
+                self.chat(api_response(400))
+            self.assertEqual(self.calls, 1)
+
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_half_open_breaker_lets_one_probe_through(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker._opened_at -= 60
+
+        self.assertEqual(self.breaker.state, 'half-open')
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    @override_settings(OPENAI_MODEL='test-model')
+    def test_model_comes_from_settings(self):
+        with mock.patch.object(openai_client._session, 'post', return_value=completion('ok')) as post:
+            openai_client.chat_completion([{'role': 'user', 'content': 'hi'}])
+
+        self.assertEqual(post.call_args.kwargs['json']['model'], 'test-model')
+
+
+class DashboardStatsTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.movie = make_movie(1, views=7)
+        Comment.objects.create(user=self.user, movie=self.movie, content='hay')
+
+    def test_build_stats_counts_today_with_a_fixed_number_of_queries(self):
+        with self.assertNumQueries(9):
+            stats = dashboard.build_stats(7)
+
+        self.assertEqual(stats['today_comments'], 1)
+        self.assertEqual(len(stats['daily_comments']), 7)
+        self.assertEqual(stats['daily_comments'][-1]['count'], 1)
+        self.assertEqual(stats['total_movies'], 1)
+        self.assertEqual(stats['top_viewed_movies'][0]['views'], 7)
+
+    def test_failed_background_refresh_is_logged_and_releases_the_lock(self):
+        def fail():
+            raise RuntimeError('database down')
+        cache.set(dashboard.REFRESH_LOCK_KEY.format(days=7), 1)
+
+        with self.assertLogs('movies.dashboard', 'ERROR'):
+            worker = threading.Thread(target=dashboard.dashboard_snapshots._refresh, args=(7, fail))
+            worker.start()
+            worker.join()
+
+        self.assertIsNone(cache.get(dashboard.REFRESH_LOCK_KEY.format(days=7)))
+
+
+STUB_FAILING = {'latency_ms': 0, 'jitter_ms': 0, 'error_rate': 1.0}
+
+
+class ChatFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.extractor = FilterExtractor(max_workers=1)
+
+    def test_confident_local_parse_skips_the_llm(self):
+        with mock.patch('movies.chat_filters.get_llm_backend') as backend:
+            filters, source = self.extractor.extract('phim hành động nhật bản năm 2020')
+
+        self.assertEqual(source, 'local')
+        self.assertEqual(filters['genres'], ['Phim Hành Động'])
+        self.assertEqual(filters['year'], 2020)
+        backend.assert_not_called()
+
+    def test_english_sentences_are_not_trusted_as_titles(self):
+        for message in ('recommend me a funny action movie from Japan', 'movies like inception with time travel',
+                        'something sad to watch tonight'):
+            with self.subTest(message=message):
+                _, confidence = intent_parser.parse(message)
+                self.assertLess(confidence, DEFAULT_LOCAL_CONFIDENCE)
+
+        self.assertEqual(intent_parser.parse('john wick'), (
+            {'genres': [], 'country': None, 'year': None, 'keyword': 'John Wick'}, TITLE_CONFIDENCE,
+        ))
+
+    @override_settings(LLM_BACKEND='stub', LLM_STUB=STUB_FAILING)
+    def test_failed_llm_call_is_logged_and_falls_back_to_local_parse(self):
+        with self.assertLogs('movies.chat_filters', 'WARNING'):
+            filters, source = self.extractor.extract('phim nào xem buồn khóc về tình bạn')
+
+        self.assertEqual(source, 'fallback')
+        self.assertEqual(self.extractor.stats()['error'], 1)
+
+    def llm_backend(self, reply='{"genres": ["Phim Tâm Lý"], "keyword": "tình bạn"}', release=None):
+        def complete(*args, **kwargs):
+            if release is not None:
+                release.wait(5)
+            return reply
+
+        backend = mock.Mock()
+        backend.available.return_value = True
+        backend.complete.side_effect = complete
+        return mock.patch('movies.chat_filters.get_llm_backend', return_value=backend), backend
+
+    def settle(self):
+        # Callback ghi cache chạy trên worker sau khi result() trả về: chờ worker (1 thread) rảnh
+        self.extractor._executor.submit(lambda: None).result()
+
+    def test_repeated_message_is_answered_from_cache(self):
+        patch, backend = self.llm_backend()
+        with patch:
+            first = self.extractor.extract('phim nào xem buồn khóc về tình bạn')
+            self.settle()
+            second = self.extractor.extract('Phim nào xem buồn khóc về   tình bạn?')
+
+        self.assertEqual(first, ({'genres': ['Phim Tâm Lý'], 'country': None, 'year': None, 'keyword': 'tình bạn'}, 'llm'))
+        self.assertEqual(second, (first[0], 'cache'))
+        backend.complete.assert_called_once()
+
+    def test_concurrent_identical_messages_share_one_llm_call(self):
+        release = threading.Event()
+        patch, backend = self.llm_backend(release=release)
+        results = []
+
+        def ask():
+            results.append(self.extractor.extract('phim nào xem buồn khóc về tình bạn'))
+
+        with patch:
+            workers = [threading.Thread(target=ask) for _ in range(3)]
+            for worker in workers:
+                worker.start()
+            for _ in range(500):
+                if self.extractor.stats().get('shared') == 2:
+                    break
+                time.sleep(0.01)
+            release.set()
+            for worker in workers:
+                worker.join()
+
+        backend.complete.assert_called_once()
+        self.assertEqual([source for _, source in results], ['llm'] * 3)
+        self.assertEqual(self.extractor.stats()['shared'], 2)
+
+    @override_settings(CHAT_FILTER_TIMEOUT=0.05)
+    def test_slow_llm_falls_back_and_the_late_answer_is_cached(self):
+        release = threading.Event()
+        patch, backend = self.llm_backend(release=release)
+        with patch:
+            _, source = self.extractor.extract('phim nào xem buồn khóc về tình bạn')
+            release.set()
+            self.settle()
+            _, later = self.extractor.extract('phim nào xem buồn khóc về tình bạn')
+
+        self.assertEqual((source, later), ('fallback', 'cache'))
+        self.assertEqual(self.extractor.stats()['timeout'], 1)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        # Lượt xem trùng nhau: id phải phá hòa để trang không trùng/bỏ sót
+        for tmdb_id, views in [(1, 5), (2, 9), (3, 5), (4, 0), (5, 5)]:
+            make_movie(tmdb_id, views=views)
+
+    def test_cursor_round_trip_visits_every_movie_once_in_order(self):
+        url, seen = '/api/movies/?cursor=&page_size=2', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen += [movie['tmdb_id'] for movie in response.data['results']]
+            url = response.data['next']
+
+        expected = list(Movie.objects.order_by('-views', '-id').values_list('tmdb_id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_cursor_mode_skips_count_query(self):
+        response = self.client.get('/api/movies/', {'cursor': '', 'page_size': 2})
+
+        self.assertIsNone(response.data['count'])
+
+    def test_invalid_cursor_is_404(self):
+        self.assertEqual(self.client.get('/api/movies/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+    def test_page_number_mode_is_unchanged(self):
+        response = self.client.get('/api/movies/', {'page': 2, 'page_size': 2})
+
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 2)
+
+
+class HotQueryIndexTests(ApiTestCase):
+    def test_hot_queries_use_their_indexes(self):
+        movie = make_movie(1, release_year=2020)
+        Comment.objects.create(user=self.user, movie=movie, content='hay')
+        out = io.StringIO()
+
+        call_command('explain_hot_queries', stdout=out)
+
+        self.assertIn('All hot queries use an index.', out.getvalue())
+        for index in ('movie_views_id_idx', 'movie_release_year_idx', 'comment_movie_toplevel_idx',
+                      'comment_parent_created_idx', 'watchhistory_user_recent_idx'):
+            self.assertIn(index, out.getvalue())
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.action = Category.objects.create(name='Phim Hành Động')
+        self.comedy = Category.objects.create(name='Phim Hài')
+        self.japan = Country.objects.create(name='Japan')
+        self.korea = Country.objects.create(name='South Korea')
+        for tmdb_id, country, year, categories in [
+            (1, self.japan, 2020, [self.action]),
+            (2, self.japan, 2021, [self.action, self.comedy]),
+            (3, self.korea, 2020, [self.comedy]),
+        ]:
+            make_movie(tmdb_id, country=country, release_year=year).categories.set(categories)
+
+    def facets(self, **params):
+        response = self.client.get('/api/movies/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        return {
+            'categories': {c['name']: c['movie_count'] for c in response.data['categories']},
+            'countries': {c['name']: c['movie_count'] for c in response.data['countries']},
+            'years': {y['year']: y['movie_count'] for y in response.data['years']},
+        }
+
+    def test_counts_without_filters(self):
+        self.assertEqual(self.facets(), {
+            'categories': {'Phim Hành Động': 2, 'Phim Hài': 2},
+            'countries': {'Japan': 2, 'South Korea': 1},
+            'years': {2021: 1, 2020: 2},
+        })
+
+    def test_each_facet_is_counted_against_the_other_filters(self):
+        facets = self.facets(categories=str(self.comedy.pk), country='japan')
+
+        self.assertEqual(facets['categories'], {'Phim Hành Động': 1, 'Phim Hài': 1})
+        self.assertEqual(facets['countries'], {'Japan': 1, 'South Korea': 1})
+        self.assertEqual(facets['years'], {2021: 1})
+
+    def test_counts_are_cached_until_the_catalog_changes(self):
+        self.facets()
+        with self.assertNumQueries(0):
+            self.facets()
+
+        make_movie(4, country=self.korea, release_year=2020)
+        self.assertEqual(self.facets()['countries'], {'Japan': 2, 'South Korea': 2})
+
+
+class CommentThreadQueryTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.movie = make_movie(1)
+        self.other_user = User.objects.create_user(username='other', password='secret-pass')
+
+    def add_thread(self, replies):
+        root = Comment.objects.create(user=self.user, movie=self.movie, content='root')
+        parent = root
+        for i in range(replies):
+            author = self.user if i % 2 else self.other_user
+            parent = Comment.objects.create(user=author, movie=self.movie, content=f'reply {i}', parent=parent)
+        return root
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/movies/1/comments/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_the_thread(self):
+        self.add_thread(replies=2)
+        small = self.count_queries()
+
+        for _ in range(3):
+            self.add_thread(replies=6)
+
+        self.assertEqual(self.count_queries(), small)
+
+
+class CommentReactionCounterTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.comment = Comment.objects.create(user=self.user, movie=make_movie(1), content='hay')
+        self.url = f'/api/comments/{self.comment.pk}/'
+
+    def counts(self):
+        self.comment.refresh_from_db()
+        return self.comment.likes_count, self.comment.dislikes_count
+
+    def test_react_switch_and_remove_keep_counters_in_sync(self):
+        response = self.client.post(self.url + 'react/', {'reaction': 'like'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user_reaction'], 'like')
+        self.assertEqual(self.counts(), (1, 0))
+
+        self.client.post(self.url + 'react/', {'reaction': 'like'}, format='json')
+        self.assertEqual(self.counts(), (1, 0))
+
+        self.client.post(self.url + 'react/', {'reaction': 'dislike'}, format='json')
+        self.assertEqual(self.counts(), (0, 1))
+
+        self.client.delete(self.url + 'remove_reaction/')
+        self.assertEqual(self.counts(), (0, 0))
+        self.assertFalse(CommentReaction.objects.exists())
+
+    def test_invalid_reaction_is_rejected(self):
+        response = self.client.post(self.url + 'react/', {'reaction': 'love'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_reconcile_repairs_drifted_counters(self):
+        CommentReaction.objects.create(user=self.user, comment=self.comment, reaction=CommentReaction.LIKE)
+        Comment.objects.filter(pk=self.comment.pk).update(dislikes_count=4)
+
+        self.assertEqual(reconcile_counts(dry_run=True), 1)
+        self.assertEqual(self.counts(), (0, 4))
+        self.assertEqual(reconcile_counts(), 1)
+        self.assertEqual(self.counts(), (1, 0))
+
+
+class LazyCommentThreadTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        movie = make_movie(1)
+        self.root = Comment.objects.create(user=self.user, movie=movie, content='root')
+        self.replies = [
+            Comment.objects.create(user=self.user, movie=movie, content=f'reply {i}', parent=self.root)
+            for i in range(5)
+        ]
+        Comment.objects.create(user=self.user, movie=movie, content='nested', parent=self.replies[0])
+
+    def test_page_carries_reply_counts_and_first_replies_only(self):
+        response = self.client.get('/api/movies/1/comments/', {'cursor': '', 'replies': 2})
+
+        self.assertEqual(response.status_code, 200)
+        [root] = response.data['results']
+        self.assertEqual(root['reply_count'], 5)
+        self.assertEqual([r['id'] for r in root['replies']], [c.pk for c in self.replies[:2]])
+        self.assertEqual(root['replies'][0]['reply_count'], 1)
+        self.assertEqual(root['replies'][0]['replies'], [])
+
+    def test_replies_endpoint_pages_through_direct_replies_in_order(self):
+        url, seen = f'/api/comments/{self.root.pk}/replies/?cursor=&page_size=2&replies=0', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [r['id'] for r in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(seen, [c.pk for c in self.replies])
+
+
+class PlayEventTests(TestCase):
+    def setUp(self):
+        trending_index.invalidate()
+        self.movie = make_movie(1)
+        self.hour = play_events.hour_start()
+
+    def test_buckets_are_additive_upserts(self):
+        play_events.write_buckets({(self.movie.pk, self.hour): {'views': 2}})
+        play_events.write_buckets({(self.movie.pk, self.hour): {'views': 3, 'watches': 1}})
+
+        bucket = MoviePlayBucket.objects.get()
+        self.assertEqual((bucket.views, bucket.watches), (5, 1))
+
+    def test_rollup_merges_old_hours_into_one_day_bucket(self):
+        day = timezone.localtime(self.hour).replace(hour=0) - timedelta(days=20)
+        play_events.write_buckets({
+            (self.movie.pk, day + timedelta(hours=1)): {'views': 2},
+            (self.movie.pk, day + timedelta(hours=5)): {'views': 3, 'watches': 1},
+            (self.movie.pk, self.hour): {'views': 7},
+        })
+
+        self.assertEqual(play_events.rollup(), 2)
+        self.assertEqual(play_events.rollup(), 0)
+
+        daily = MoviePlayBucket.objects.get(resolution=MoviePlayBucket.DAY)
+        self.assertEqual((daily.views, daily.watches), (5, 1))
+        self.assertEqual(MoviePlayBucket.objects.get(resolution=MoviePlayBucket.HOUR).views, 7)
+
+    def test_trending_favours_recent_plays_and_weights_watches(self):
+        old, recent, watched = self.movie, make_movie(2), make_movie(3)
+        play_events.write_buckets({
+            (old.pk, self.hour - timedelta(hours=40)): {'views': 20},
+            (recent.pk, self.hour): {'views': 10},
+            (watched.pk, self.hour): {'views': 2, 'watches': 3},
+        })
+
+        ranked = [movie_id for movie_id, _ in trending_index.top('day', 10)]
+
+        self.assertEqual(ranked, [watched.pk, recent.pk, old.pk])
+
+    def test_trending_endpoint_fills_empty_slots_by_views(self):
+        make_movie(2, views=50)
+        make_movie(3, views=80)
+        make_movie(4, views=10)
+        play_events.write_buckets({(self.movie.pk, self.hour): {'views': 1}})
+
+        response = APIClient().get('/api/movies/trending/', {'limit': 3})
+
+        self.assertEqual([movie['tmdb_id'] for movie in response.data], [1, 3, 2])
+
+
+class UpsertTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.movie = make_movie(1)
+
+    def test_insert_then_conflict_overwrites_set_fields(self):
+        row = {'user_id': self.user.pk, 'movie_id': self.movie.pk, 'stars': 4, 'created_at': timezone.now()}
+
+        self.assertEqual(bulk_upsert(Rating, [row], unique_fields=('user', 'movie'), set_fields=('stars',)), 1)
+        bulk_upsert(Rating, [{**row, 'stars': 9}], unique_fields=('user', 'movie'), set_fields=('stars',))
+
+        self.assertEqual(Rating.objects.get().stars, 9)
+
+    def test_conflict_without_update_fields_does_nothing(self):
+        row = {'user_id': self.user.pk, 'movie_id': self.movie.pk, 'created_at': timezone.now()}
+
+        self.assertEqual(bulk_upsert(Favorite, [row, row], unique_fields=('user', 'movie')), 1)
+        self.assertEqual(Favorite.objects.count(), 1)
+
+    def test_rate_inserts_then_overwrites(self):
+        self.assertEqual(self.client.post('/api/movies/1/rate/', {'score': 6}, format='json').status_code, 200)
+        self.assertEqual(self.client.post('/api/movies/1/rate/', {'score': 8}, format='json').status_code, 200)
+
+        self.assertEqual(list(Rating.objects.values_list('stars', flat=True)), [8])
+
+    def test_favorite_toggles(self):
+        self.assertEqual(self.client.post('/api/movies/1/favorite/').status_code, 201)
+        self.assertTrue(Favorite.objects.exists())
+
+        self.assertEqual(self.client.post('/api/movies/1/favorite/').status_code, 200)
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_actions_on_unknown_movie_are_404(self):
+        self.assertEqual(self.client.post('/api/movies/999/watch/').status_code, 404)
+        self.assertEqual(self.client.post('/api/movies/999/rate/', {'score': 5}, format='json').status_code, 404)
+
+
+class WatchHistoryCompactionTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        for i in range(5):
+            history = WatchHistory.objects.create(user=self.user, movie=make_movie(i + 1), finished=i == 0)
+            # auto_now: đặt thời điểm xem bằng update(); phim 5 là mới nhất
+            WatchHistory.objects.filter(pk=history.pk).update(last_watched_at=now - timedelta(days=5 - i))
+
+    def compact(self, *args):
+        out = io.StringIO()
+        call_command('compact_watch_history', '--keep', '2', '--batch-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_only_reports(self):
+        self.assertIn('3 watch history rows would be archived', self.compact('--dry-run'))
+        self.assertEqual(WatchHistory.objects.count(), 5)
+
+    def test_older_rows_move_to_the_archive(self):
+        self.assertIn('3 watch history rows archived', self.compact())
+
+        kept = WatchHistory.objects.values_list('movie__tmdb_id', flat=True)
+        self.assertCountEqual(kept, [4, 5])
+        archived = WatchHistoryArchive.objects.values_list('movie__tmdb_id', 'finished')
+        self.assertCountEqual(archived, [(1, True), (2, False), (3, False)])
+
+        self.assertIn('0 watch history rows archived', self.compact())
+
+
+class TokenBucketThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        patcher = mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'keyword_extract': '2/min'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def extract(self):
+        return self.client.post('/api/movies/extract_keywords/', {'query': 'phim hài'}, format='json')
+
+    def test_burst_beyond_capacity_is_rejected_then_refills(self):
+        now = 1_000_000.0
+        with mock.patch.object(throttling.time, 'time', side_effect=lambda: now):
+            self.assertEqual([self.extract().status_code for _ in range(3)], [200, 200, 429])
+            self.assertEqual(throttling.counters(), {'keyword_extract:rejected': 1})
+
+            now += 30  # 2 token/phút -> hồi 1 token sau 30 giây
+            self.assertEqual(self.extract().status_code, 200)
+            self.assertEqual(self.extract().status_code, 429)
+
+    def test_rejection_tells_the_client_when_to_retry(self):
+        for _ in range(2):
+            self.extract()
+
+        response = self.extract()
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+
+class DailyStatsRollupTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        movie = make_movie(1)
+        for days_ago in (2, 2, 0):
+            comment = Comment.objects.create(user=self.user, movie=movie, content='hay')
+            Comment.objects.filter(pk=comment.pk).update(
+                created_at=dashboard.day_start(self.today - timedelta(days=days_ago)) + timedelta(hours=12)
+            )
+
+    def comment_counts(self):
+        return dict(DailyStats.objects.filter(metric='comments').values_list('date', 'count'))
+
+    def test_rollup_writes_every_day_and_moves_the_watermark_to_today(self):
+        dashboard.rollup()
+
+        counts = self.comment_counts()
+        self.assertEqual(counts[self.today - timedelta(days=2)], 2)
+        self.assertEqual(counts[self.today - timedelta(days=1)], 0)
+        self.assertEqual(counts[self.today], 1)
+        self.assertEqual(dashboard.watermark(), self.today)
+
+    def test_rerun_overwrites_instead_of_adding(self):
+        dashboard.rollup()
+        dashboard.rollup(first_day=self.today - timedelta(days=2))
+
+        self.assertEqual(self.comment_counts()[self.today - timedelta(days=2)], 2)
+
+    def test_stats_read_days_before_the_watermark_from_daily_stats(self):
+        dashboard.rollup()
+        DailyStats.objects.filter(metric='comments', date=self.today - timedelta(days=2)).update(count=40)
+
+        series = dashboard.build_stats(7)['daily_comments']
+
+        self.assertEqual(series[-3]['count'], 40)
+        self.assertEqual(series[-1]['count'], 1)  # hôm nay vẫn đếm trực tiếp
+
+    def test_command_dry_run_writes_nothing(self):
+        out = io.StringIO()
+        call_command('rollup_stats', '--dry-run', stdout=out)
+
+        self.assertIn('would be written', out.getvalue())
+        self.assertFalse(DailyStats.objects.exists())
+        self.assertIsNone(dashboard.watermark())
+
+
+class DashboardSnapshotTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.save()
+        make_movie(1, views=3)
+
+    def test_unchanged_stats_answer_304_to_if_none_match(self):
+        first = self.client.get('/api/admin/stats/', {'days': 7})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data['total_movies'], 1)
+
+        second = self.client.get('/api/admin/stats/', {'days': 7}, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_etag_ignores_timings_but_follows_the_numbers(self):
+        data = {'total_movies': 1, 'timings_ms': {'movies': 1.0}, 'generated_at': 'a'}
+        same = {'total_movies': 1, 'timings_ms': {'movies': 9.0}, 'generated_at': 'b'}
+
+        self.assertEqual(dashboard.snapshot_etag(data), dashboard.snapshot_etag(same))
+        self.assertNotEqual(dashboard.snapshot_etag(data), dashboard.snapshot_etag({**data, 'total_movies': 2}))
+
+    def test_fresh_snapshot_is_served_from_cache(self):
+        snapshots, build = dashboard.DashboardSnapshots(), mock.Mock(return_value={'total_movies': 1})
+
+        snapshots.get(7, build)
+        snapshot = snapshots.get(7, build)
+
+        build.assert_called_once()
+        self.assertEqual(snapshot['data'], {'total_movies': 1})
+
+    @override_settings(DASHBOARD_STATS_TTL=0)
+    def test_stale_snapshot_is_returned_while_one_refresh_runs_in_background(self):
+        snapshots, build = dashboard.DashboardSnapshots(), mock.Mock(return_value={'total_movies': 1})
+        snapshots.get(7, build)
+        refreshed = threading.Event()
+
+        with mock.patch.object(snapshots, '_refresh', side_effect=lambda days, build: refreshed.set()) as refresh:
+            stale = snapshots.get(7, build)
+            self.assertTrue(refreshed.wait(5))
+            snapshots.get(7, build)  # lock vẫn giữ: không mở thêm thread
+
+        self.assertEqual(stale['data'], {'total_movies': 1})
+        build.assert_called_once()
+        refresh.assert_called_once()
+
+    def test_non_admin_is_forbidden(self):
+        self.user.is_staff = False
+        self.user.save()
+
+        self.assertEqual(self.client.get('/api/admin/stats/').status_code, 403)
+
+
+class ExportTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.save()
+        drama = Category.objects.create(name='Tâm Lý')
+        action = Category.objects.create(name='Hành Động')
+        for tmdb_id in (1, 2, 3):
+            make_movie(tmdb_id, title=f'Phim {tmdb_id}').categories.add(drama, action)
+
+    def download(self, dataset, **params):
+        response = self.client.get(f'/api/admin/export/{dataset}/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_has_header_and_joined_m2m_names(self):
+        rows = list(csv.reader(io.StringIO(self.download('movies', output='csv').decode('utf-8'))))
+
+        self.assertEqual(rows[0][-2:], ['categories', 'actors'])
+        self.assertEqual([row[2] for row in rows[1:]], ['Phim 1', 'Phim 2', 'Phim 3'])
+        self.assertEqual(sorted(rows[1][-2].split('|')), ['Hành Động', 'Tâm Lý'])
+
+    def test_gzipped_jsonl_decompresses_to_one_record_per_row(self):
+        lines = gzip.decompress(self.download('movies', output='jsonl', gzip='1')).decode('utf-8').splitlines()
+
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record['tmdb_id'] for record in records], [1, 2, 3])
+        self.assertEqual(len(records[0]['categories']), 2)
+
+    def test_m2m_names_are_loaded_once_per_chunk(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(exports.DATASETS['movies'].rows(chunk_size=2))
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(len(queries), 1 + 2 * 2)  # rows + (categories, actors) cho mỗi chunk
+
+    def test_unknown_dataset_and_missing_pyarrow_are_400(self):
+        self.assertEqual(self.client.get('/api/admin/export/passwords/').status_code, 400)
+        with mock.patch.dict(sys.modules, {'pyarrow': None, 'pyarrow.parquet': None}):
+            response = self.client.get('/api/admin/export/movies/', {'output': 'parquet'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('pyarrow', response.data['error'])
+
+    def test_command_writes_one_file_per_dataset(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('export_data', 'movies', 'ratings', '--output-dir', output_dir, stdout=io.StringIO())
+
+            self.assertEqual(sorted(os.listdir(output_dir)), ['movies.csv', 'ratings.csv'])
+            with open(os.path.join(output_dir, 'ratings.csv'), encoding='utf-8') as f:
+                self.assertEqual(f.read().strip(), 'id,user_id,movie_id,stars,created_at')
+
+
+STUB_FAST = {'latency_ms': 0, 'jitter_ms': 0, 'token_delay_ms': 0, 'reply': 'Xem thử Kiếm Khách nhé'}
+
+
+def read_events(response):
+    """Body text/event-stream -> [(event, data)]"""
+    events = []
+    for block in b''.join(response.streaming_content).decode('utf-8').strip().split('\n\n'):
+        name, data = block.split('\n')
+        events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+class ChatStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        action = Category.objects.create(name='Phim Hành Động')
+        japan = Country.objects.create(name='Japan')
+        make_movie(1, 'Kiếm Khách', release_year=2020, country=japan).categories.add(action)
+        self.view = ChatAPIView.as_view(throttle_classes=[])
+
+    def chat(self, **body):
+        return self.view(APIRequestFactory().post('/api/chat/', body, format='json'))
+
+    @override_settings(LLM_BACKEND='stub', LLM_STUB=STUB_FAST)
+    def test_stream_sends_movies_then_tokens_then_done(self):
+        response = self.chat(message='phim hành động nhật bản năm 2020', stream=True)
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('retrieval;dur=', response['Server-Timing'])
+        events = read_events(response)
+        self.assertEqual(events[0][0], 'movies')
+        self.assertEqual([movie['tmdb_id'] for movie in events[0][1]['movies']], [1])
+        tokens = [data['text'] for name, data in events if name == 'token']
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual(events[-1], ('done', {'reply': ''.join(tokens)}))
+        self.assertEqual(events[-1][1]['reply'], STUB_FAST['reply'])
+
+    @override_settings(LLM_BACKEND='stub', LLM_STUB=STUB_FAILING)
+    def test_failed_stream_ends_with_the_template_reply(self):
+        with self.assertLogs('movies.views', 'WARNING'):
+            events = read_events(self.chat(message='phim hành động nhật bản năm 2020', stream=True))
+
+        self.assertEqual([name for name, _ in events], ['movies', 'token', 'done'])
+        self.assertEqual(events[-1][1]['reply'], 'Dựa trên yêu cầu, mình tìm thấy: Kiếm Khách.')
+
+    @override_settings(LLM_BACKEND='stub', LLM_STUB=STUB_FAST)
+    def test_without_stream_flag_the_reply_is_plain_json(self):
+        response = self.chat(message='phim hành động nhật bản năm 2020')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['reply'], STUB_FAST['reply'])
+
+
+class HydrateMoviesTests(TestCase):
+    def setUp(self):
+        drama = Category.objects.create(name='Tâm Lý')
+        for tmdb_id in range(1, 7):
+            make_movie(tmdb_id, title=f'Phim {tmdb_id}', description='x' * 500).categories.add(drama)
+
+    def test_query_count_does_not_grow_with_the_list(self):
+        for tmdb_ids in ([1, 2], [1, 2, 3, 4, 5, 6]):
+            with self.subTest(size=len(tmdb_ids)), self.assertNumQueries(2):
+                movies = hydrate_movies(tmdb_ids)
+            self.assertEqual(len(movies), len(tmdb_ids))
+
+    def test_rank_order_is_kept_and_unknown_or_repeated_ids_are_skipped(self):
+        movies = hydrate_movies(['5', 99, 2, 5, 4])
+
+        self.assertEqual([movie['tmdb_id'] for movie in movies], [5, 2, 4])
+        self.assertEqual(movies[0]['categories'], ['Tâm Lý'])
+        self.assertEqual(len(movies[0]['overview']), 300)
+
+    def test_empty_list_runs_no_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(hydrate_movies([]), [])
+
+
+class LLMBackendTests(TestCase):
+    def test_stub_answers_json_filters_to_json_prompts_and_the_reply_otherwise(self):
+        stub = llm_backends.StubBackend(**STUB_FAST)
+
+        filters = stub.complete([{'role': 'system', 'content': 'Trả về JSON'}, {'role': 'user', 'content': 'x'}])
+        self.assertEqual(json.loads(filters), llm_backends.DEFAULT_STUB_OPTIONS['filters'])
+        self.assertEqual(stub.complete([{'role': 'user', 'content': 'x'}]), STUB_FAST['reply'])
+        self.assertEqual(''.join(stub.stream([{'role': 'user', 'content': 'x'}])), STUB_FAST['reply'])
+
+    def test_stub_errors_and_deadlines(self):
+        with self.assertRaises(llm_backends.StubError):
+            llm_backends.StubBackend(**STUB_FAILING).complete([])
+        with self.assertRaisesMessage(llm_backends.StubError, 'deadline'):
+            llm_backends.StubBackend(latency_ms=1000, jitter_ms=0).complete([], deadline=0.01)
+
+    def test_backend_follows_settings(self):
+        with override_settings(LLM_BACKEND='openai'):
+            self.assertEqual(llm_backends.get_backend().name, 'openai')
+        with override_settings(LLM_BACKEND='stub', LLM_STUB=STUB_FAST):
+            backend = llm_backends.get_backend()
+            self.assertEqual((backend.name, backend.options['reply']), ('stub', STUB_FAST['reply']))
+            self.assertIs(llm_backends.get_backend(), backend)
+        with override_settings(LLM_BACKEND='movies.llm_backends.StubBackend'):
+            self.assertIsInstance(llm_backends.get_backend(), llm_backends.StubBackend)
+
+    @override_settings(LLM_STUB=STUB_FAST)
+    def test_loadtest_command_drives_the_pipeline_in_process(self):
+        out = io.StringIO()
+        call_command('loadtest_chat', '--requests', '4', '--concurrency', '1', '--backend', 'stub', stdout=out)
+
+        report = out.getvalue()
+        self.assertIn('4 requests, concurrency 1, backend stub', report)
+        self.assertIn("status: {'200': 4}", report)
+        self.assertIn('retrieval ms:', report)
+
+    def test_server_timing_header_is_parsed(self):
+        self.assertEqual(
+            loadtest_chat.parse_server_timing('filters;dur=1.2, retrieval;dur=8.3, cache'),
+            {'filters': 1.2, 'retrieval': 8.3},
+        )
@@ -0,0 +1,116 @@
+"""
+Token-bucket throttles for the expensive or write-heavy public endpoints.
+
+Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope] ("30/min" =
+bucket of 30 tokens refilled at 30 per minute, so short bursts are allowed but
+the sustained rate is capped). Buckets are kept in the Django cache per scope and
+per user (or client IP for anonymous requests); with a shared cache (Redis /
+Memcached) the limit holds across workers. The read-update is not atomic, so a
+few extra requests may slip through under heavy concurrency.
+
+Rejections and deduplicated views are counted per scope (see counters()),
+exposed to admins at /api/admin/throttle-stats/.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+COUNTER_KEY = 'throttle:counter:{}'
+COUNTER_NAMES_KEY = 'throttle:counter-names'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+DEFAULT_VIEW_DEDUPE_WINDOW = 30
+
+
+def parse_rate(rate):
+    """'30/min' -> (30, 60)"""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def count(name):
+    """Tăng counter (dùng chung giữa các worker nếu cache dùng chung)"""
+    key = COUNTER_KEY.format(name)
+    if cache.add(key, 1, None):
+        names = cache.get(COUNTER_NAMES_KEY) or []
+        if name not in names:
+            cache.set(COUNTER_NAMES_KEY, names + [name], None)
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def counters() -> dict:
+    names = cache.get(COUNTER_NAMES_KEY) or []
+    values = cache.get_many([COUNTER_KEY.format(name) for name in names])
+    return {name: values.get(COUNTER_KEY.format(name), 0) for name in sorted(names)}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle token bucket; subclass đặt `scope` trùng key trong DEFAULT_THROTTLE_RATES"""
+    scope = None
+    cache_format = 'throttle:bucket:{scope}:{ident}'
+
+    def __init__(self):
+        self._wait = None
+
+    def get_ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{super().get_ident(request)}'
+
+    def allow_request(self, request, view):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        if rate is None:
+            return True
+        capacity, period = parse_rate(rate)
+        refill_per_second = capacity / period
+
+        key = self.cache_format.format(scope=self.scope, ident=self.get_ident(request))
+        now = time.time()
+        tokens, updated = cache.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self._wait = (1 - tokens) / refill_per_second
+            count(f'{self.scope}:rejected')
+        # Bucket đầy lại sau `period` giây thì không cần giữ key nữa
+        cache.set(key, (tokens, now), period + 1)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class ViewIncrementThrottle(TokenBucketThrottle):
+    scope = 'view_increment'
+
+
+class KeywordExtractThrottle(TokenBucketThrottle):
+    scope = 'keyword_extract'
+
+
+class ChatThrottle(TokenBucketThrottle):
+    scope = 'chat'
+
+
+def is_duplicate_view(request, movie_id):
+    """
+    True nếu cùng client đã tăng view phim này trong VIEW_DEDUPE_WINDOW giây
+    (REST_FRAMEWORK['VIEW_DEDUPE_WINDOW']); lượt trùng không được đếm.
+    """
+    window = settings.REST_FRAMEWORK.get('VIEW_DEDUPE_WINDOW', DEFAULT_VIEW_DEDUPE_WINDOW)
+    if not window:
+        return False
+    ident = ViewIncrementThrottle().get_ident(request)
+    if cache.add(f'throttle:view-dedupe:{movie_id}:{ident}', 1, window):
+        return False
+    count('view_increment:deduped')
+    return True
@@ -0,0 +1,73 @@
+"""
+Local trending ("hôm nay" / "tuần này") from MoviePlayBucket.
+
+Score = sum over buckets of (views + WATCH_WEIGHT * watches) * 0.5 ** (age / half_life),
+so recent plays dominate and old ones fade out smoothly. Each process caches the
+ranking per window for TRENDING_CACHE_SECONDS; a request only slices that list.
+"""
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+DEFAULT_CACHE_SECONDS = 300
+WATCH_WEIGHT = 3
+MAX_RANKED = 200
+
+# window -> (khoảng thời gian xét, half-life)
+WINDOWS = {
+    'day': (timedelta(hours=48), timedelta(hours=6)),
+    'week': (timedelta(days=14), timedelta(days=2)),
+}
+
+
+class TrendingIndex:
+    """Xếp hạng phim theo điểm lượt xem có suy giảm theo thời gian"""
+
+    def __init__(self):
+        self._rankings = {}  # window -> (built_at, [(movie_id, score), ...])
+        self._lock = threading.Lock()
+
+    def top(self, window='day', limit=10) -> list[tuple[int, float]]:
+        window = window if window in WINDOWS else 'day'
+        cached = self._rankings.get(window)
+        if cached is None or time.monotonic() - cached[0] >= self._max_age():
+            with self._lock:
+                cached = self._rankings.get(window)
+                if cached is None or time.monotonic() - cached[0] >= self._max_age():
+                    cached = (time.monotonic(), self._compute(window))
+                    self._rankings[window] = cached
+        return cached[1][:limit]
+
+    def invalidate(self):
+        self._rankings = {}
+
+    def _compute(self, window):
+        from .models import MoviePlayBucket
+
+        lookback, half_life = WINDOWS[window]
+        now = timezone.now()
+        half_life_hours = half_life.total_seconds() / 3600
+
+        scores = defaultdict(float)
+        rows = (
+            MoviePlayBucket.objects.filter(bucket_start__gte=now - lookback)
+            .order_by()
+            .values_list('movie_id', 'bucket_start', 'views', 'watches')
+        )
+        for movie_id, bucket_start, views, watches in rows.iterator(chunk_size=2000):
+            age_hours = max((now - bucket_start).total_seconds() / 3600, 0)
+            scores[movie_id] += (views + WATCH_WEIGHT * watches) * 0.5 ** (age_hours / half_life_hours)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:MAX_RANKED]
+
+    def _max_age(self):
+        return getattr(settings, 'TRENDING_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+
+
+# Singleton instance
+trending_index = TrendingIndex()
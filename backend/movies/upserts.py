@@ -0,0 +1,56 @@
+"""
+Single-statement upserts: INSERT ... ON CONFLICT (...) DO UPDATE / DO NOTHING.
+
+Django's bulk_create(update_conflicts=True) can only overwrite columns with the
+new values; counters need `col = col + EXCLUDED.col`. Supported by Postgres and
+SQLite >= 3.24, the two backends this project runs on.
+"""
+from django.db import connections, router
+
+BATCH_SIZE = 500
+
+
+def bulk_upsert(model, rows, unique_fields, add_fields=(), set_fields=(), using=None) -> int:
+    """
+    rows: list các dict {field_name: value}, cùng tập key.
+    unique_fields: các cột của unique constraint dùng cho ON CONFLICT.
+    add_fields: cộng dồn khi trùng (col = col + EXCLUDED.col).
+    set_fields: ghi đè khi trùng (col = EXCLUDED.col). Cả hai rỗng -> DO NOTHING.
+    Returns tổng rowcount (số dòng được insert/update).
+    """
+    if not rows:
+        return 0
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    opts = model._meta
+
+    def col(name):
+        return qn(opts.get_field(name).column)
+
+    names = list(rows[0])
+    fields = [opts.get_field(name) for name in names]
+    table = qn(opts.db_table)
+    columns = ', '.join(col(name) for name in names)
+    conflict = ', '.join(col(name) for name in unique_fields)
+
+    assignments = [f"{col(name)} = {table}.{col(name)} + EXCLUDED.{col(name)}" for name in add_fields]
+    assignments += [f"{col(name)} = EXCLUDED.{col(name)}" for name in set_fields]
+    action = f"DO UPDATE SET {', '.join(assignments)}" if assignments else "DO NOTHING"
+
+    total = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), BATCH_SIZE):
+            batch = rows[start:start + BATCH_SIZE]
+            placeholders = ', '.join(['(' + ', '.join(['%s'] * len(fields)) + ')'] * len(batch))
+            params = [
+                field.get_db_prep_save(row[name], connection)
+                for row in batch
+                for name, field in zip(names, fields)
+            ]
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {placeholders} ON CONFLICT ({conflict}) {action}",
+                params,
+            )
+            total += max(cursor.rowcount, 0)
+    return total
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     MovieViewSet, CategoryViewSet, CommentViewSet, CountryViewSet, YearViewSet,
-    DashboardStatsView, FetchTMDBView, ImportTMDBView, ChatAPIView,
+    DashboardStatsView, ThrottleStatsView, ChatStatsView, ExportView, FetchTMDBView, ImportTMDBView, ChatAPIView,
     AdminMovieViewSet, AdminCategoryViewSet, AdminActorViewSet, AdminCountryViewSet, AdminUserViewSet, AdminCommentViewSet
 )
 
@@ -22,6 +22,9 @@ router.register(r'admin/comments', AdminCommentViewSet, basename='admin-comment'
 # Tạo danh sách URL cho Admin
 admin_patterns = [
     path('stats/', DashboardStatsView.as_view(), name='admin-stats'),
+    path('throttle-stats/', ThrottleStatsView.as_view(), name='admin-throttle-stats'),
+    path('chat-stats/', ChatStatsView.as_view(), name='admin-chat-stats'),
+    path('export/<str:dataset>/', ExportView.as_view(), name='admin-export'),
     path('fetch-tmdb/', FetchTMDBView.as_view(), name='admin-fetch-tmdb'),
     path('import-tmdb/', ImportTMDBView.as_view(), name='admin-import-tmdb'),
 ]
@@ -0,0 +1,94 @@
+"""
+Write-behind view counter for MovieViewSet.increment_view.
+
+Each worker process buffers view increments in memory and flushes them with a
+single `UPDATE ... SET views = views + CASE id WHEN ... END` from a daemon timer
+thread VIEW_COUNTER_FLUSH_INTERVAL seconds after the first buffered increment
+(so an idle worker does not hold counts), and at interpreter exit; a hard-killed
+worker loses at most one interval of counts. Increments are additive, so several
+workers flushing independently never lose counts; a failed flush puts the counts
+back in the buffer and retries one interval later (see write_behind.py).
+
+The same buffer carries the hourly play-event counters (views and watches, see
+play_events.py), written in the same transaction with one additive upsert.
+"""
+import atexit
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from .write_behind import WriteBehindBuffer
+
+
+class ViewCounter(WriteBehindBuffer):
+    """Bộ đếm lượt xem gom trong bộ nhớ, ghi DB theo lô"""
+    interval_setting = 'VIEW_COUNTER_FLUSH_INTERVAL'
+    default_interval = 5
+
+    def __init__(self):
+        super().__init__()
+        self._pending = {}
+        self._buckets = {}
+
+    def increment(self, movie_id, n=1) -> int:
+        """Cộng n lượt xem; trả về số lượt của phim này chưa có trong DB trước lần flush (nếu có) này"""
+        with self._lock:
+            pending = self._pending.get(movie_id, 0) + n
+            self._pending[movie_id] = pending
+            self._add_event(movie_id, 'views', n)
+            self._schedule()
+        return pending
+
+    def record_watch(self, movie_id):
+        """Ghi 1 lượt watch vào bucket giờ hiện tại (không đổi Movie.views)"""
+        with self._lock:
+            self._add_event(movie_id, 'watches', 1)
+            self._schedule()
+
+    def _add_event(self, movie_id, kind, n):
+        from .play_events import hour_start
+
+        counts = self._buckets.setdefault((movie_id, hour_start()), {})
+        counts[kind] = counts.get(kind, 0) + n
+
+    def pending(self, movie_id) -> int:
+        return self._pending.get(movie_id, 0)
+
+    def flush(self) -> int:
+        """Ghi mọi lượt xem đang chờ trong 1 UPDATE; trả về số phim được cập nhật"""
+        return super().flush()
+
+    def _swap(self):
+        batch = (self._pending, self._buckets)
+        self._pending, self._buckets = {}, {}
+        return batch
+
+    def _restore(self, batch):
+        views, buckets = batch
+        for movie_id, n in views.items():
+            self._pending[movie_id] = self._pending.get(movie_id, 0) + n
+        for key, counts in buckets.items():
+            merged = self._buckets.setdefault(key, {})
+            for kind, n in counts.items():
+                merged[kind] = merged.get(kind, 0) + n
+
+    def _size(self, batch):
+        views, buckets = batch
+        return len(set(views) | {movie_id for movie_id, _ in buckets})
+
+    def _write(self, batch):
+        from .models import Movie
+        from .play_events import write_buckets
+
+        views, buckets = batch
+        with transaction.atomic():
+            if views:
+                increment = Case(*[When(pk=movie_id, then=Value(n)) for movie_id, n in views.items()], default=Value(0))
+                # .update() không gửi post_save nên suggest/facet index không bị invalidate mỗi lần flush
+                Movie.objects.filter(pk__in=list(views)).update(views=F('views') + increment)
+            write_buckets(buckets)
+
+
+# Singleton instance
+view_counter = ViewCounter()
+atexit.register(view_counter.flush)
@@ -1,11 +1,33 @@
+import logging
 import requests
 import os, json
-from .openai_client import has_key as openai_has_key, chat_completion_with_tools
+from .openai_client import chat_completion_with_tools, stats as openai_stats
+from .llm_backends import get_backend as get_llm_backend
 from .embeddings import load_embeddings, get_top_k
 from .keyword_extractor import extractor
+from .suggest_index import suggest_index
+from .facets import facet_index
+from .normalization import normalize_text
+from .comment_threads import CommentThread, inline_replies_param
+from .reactions import set_reaction, remove_reaction
+from .view_counter import view_counter
+from .trending import trending_index
+from .movie_ids import movie_id_or_404
+from .upserts import bulk_upsert
+from .watch_progress import progress_buffer
+from .dashboard import build_stats as build_dashboard_stats, dashboard_snapshots, parse_window, Timer
+from . import exports
+from .hydration import hydrate_movies
+from .chat_filters import filter_extractor, has_filters as has_chat_filters
+from .throttling import (
+    ViewIncrementThrottle, KeywordExtractThrottle, ChatThrottle, is_duplicate_view, counters as throttle_counters,
+)
 from sentence_transformers import SentenceTransformer
 from .tmdb_service import import_movie_from_tmdb
 from django.conf import settings
+from django.utils import timezone
+from django.utils.http import parse_etags
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAdminUser
 from django.db.models import Sum, Count, Q, Avg
@@ -15,6 +37,7 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter
@@ -23,7 +46,10 @@ from django.db.models import Count
 
 User = get_user_model()
 
-from .models import Movie, Category, Rating, Comment, Actor, Country, Episode, WatchHistory, CommentReaction, Favorite
+from .models import (
+    Movie, Category, Rating, Comment, Actor, Country, Episode, WatchHistory, CommentReaction, Favorite,
+    title_word_start_q,
+)
 from .serializers import (
     MovieSerializer, MovieDetailSerializer, CategorySerializer, CountrySerializer,
     ActorSerializer, RatingCreateSerializer, UserSerializer, UserCreateSerializer,
@@ -31,26 +57,42 @@ from .serializers import (
     EpisodeSerializer, AdminMovieSerializer
 )
 from .permissions import IsOwnerOrReadOnly
+from .pagination import (
+    StandardResultsSetPagination, CommentResultsSetPagination, CommentThreadPagination, ReplyPagination,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def filter_title(queryset, text):
+    """Lọc theo tên phim (không dấu), khớp ở đầu từ bất kỳ - xem title_word_start_q"""
+    return queryset.filter(title_word_start_q(text))
+
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all().annotate(movie_count=Count('movies', distinct=True))
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 30
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+    def list(self, request, *args, **kwargs):
+        # Số phim mỗi thể loại lấy từ facet cache thay vì COUNT trên bảng M2M mỗi request
+        data = facet_index.categories()
+        page = self.paginate_queryset(data)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(data)
 
 class MovieViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Movie.objects.all().order_by('-views')
     lookup_field = 'tmdb_id'
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [SearchFilter]
-    search_fields = ['title']
+    # Param 'search' được xử lý trong get_queryset (keyword extraction + cột normalized);
+    # SearchFilter sẽ lọc thêm title__icontains=<search thô> và làm mất kết quả không dấu/thể loại
+    filter_backends = []
     pagination_class = StandardResultsSetPagination
+    cursor_ordering = ('-views', '-id')  # ?cursor= (keyset), dùng index movie_views_id_idx
 
-    @action(detail=False, methods=['post'], permission_classes=[AllowAny])
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny], throttle_classes=[KeywordExtractThrottle])
     def extract_keywords(self, request):
         """Extract keywords from search query using SBERT"""
         query = request.data.get('query', '').strip()
@@ -71,45 +113,40 @@ class MovieViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         queryset = Movie.objects.all().order_by('-views')
         
-        # DEBUG: Log all query parameters
-        print(f"DEBUG MovieViewSet: Query params = {self.request.query_params}")
-        
         # Enhanced search with keyword extraction
         search_param = self.request.query_params.get('search', None)
         if search_param:
             # Extract keywords using SBERT
             keywords = extractor.extract_keywords(search_param)
-            print(f"DEBUG Extracted keywords: {keywords}")
+            logger.debug("MovieViewSet search %r -> %s", search_param, keywords)
             
             # Apply filters based on extracted keywords
             
-            # Filter by movie title if specified
-            if keywords['movie_title']:
-                queryset = queryset.filter(title__icontains=keywords['movie_title'])
-            
-            # Filter by genres
+            # Filter by genres (tên thể loại chuẩn từ extractor -> so khớp bằng trên cột normalized)
             if keywords['genres']:
                 for genre in keywords['genres']:
-                    queryset = queryset.filter(categories__name__icontains=genre)
+                    queryset = queryset.filter(categories__name_normalized=normalize_text(genre))
             
             # Filter by country
             if keywords['country']:
-                queryset = queryset.filter(country__name__icontains=keywords['country'])
+                queryset = queryset.filter(country__name_normalized=normalize_text(keywords['country']))
             
             # Filter by year
             if keywords['year']:
                 queryset = queryset.filter(release_year=keywords['year'])
             
+            # Filter by movie title if specified (sau các bộ lọc chính xác)
+            if keywords['movie_title']:
+                queryset = filter_title(queryset, keywords['movie_title'])
+            
             # If no specific filters found, use traditional title search
             if not keywords['genres'] and not keywords['country'] and not keywords['year'] and not keywords['movie_title']:
-                queryset = queryset.filter(title__icontains=search_param)
+                queryset = filter_title(queryset, search_param)
         
         # Filter by tmdb_ids (for AI suggestions)
         tmdb_ids_param = self.request.query_params.get('tmdb_ids', None)
         if tmdb_ids_param:
-            print(f"DEBUG MovieViewSet: tmdb_ids_param = {tmdb_ids_param}")
             tmdb_ids = [int(x) for x in tmdb_ids_param.split(',') if x.strip().isdigit()]
-            print(f"DEBUG MovieViewSet: tmdb_ids = {tmdb_ids}")
             if tmdb_ids:
                 queryset = queryset.filter(tmdb_id__in=tmdb_ids)
         
@@ -123,8 +160,8 @@ class MovieViewSet(viewsets.ReadOnlyModelViewSet):
         # Filter by country
         country_param = self.request.query_params.get('country', None)
         if country_param:
-            # Filter by country name or code
-            queryset = queryset.filter(country__name__icontains=country_param)
+            # Filter by country name (không phân biệt hoa thường/dấu)
+            queryset = queryset.filter(country__name_normalized=normalize_text(country_param))
         
         # Filter by year
         year_param = self.request.query_params.get('release_year', None)
@@ -147,16 +184,17 @@ class MovieViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def rate(self, request, tmdb_id=None):
         """Đánh giá phim"""
-        movie = self.get_object()
-        user = request.user
+        movie_id = movie_id_or_404(tmdb_id)
         
         score = request.data.get('score')
         if not score or not (1 <= float(score) <= 10):
             return Response({'error': 'Score must be between 1 and 10'}, status=status.HTTP_400_BAD_REQUEST)
         
-        rating, created = Rating.objects.update_or_create(
-            user=user, movie=movie,
-            defaults={'stars': float(score)}
+        # 1 câu INSERT ... ON CONFLICT, đánh giá lại thì ghi đè số sao
+        bulk_upsert(
+            Rating,
+            [{'user_id': request.user.pk, 'movie_id': movie_id, 'stars': float(score), 'created_at': timezone.now()}],
+            unique_fields=('user', 'movie'), set_fields=('stars',),
         )
         
         return Response({'message': 'Rating saved successfully'}, status=status.HTTP_200_OK)
@@ -164,28 +202,58 @@ class MovieViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def favorite(self, request, tmdb_id=None):
         """Thêm/xóa phim yêu thích"""
-        movie = self.get_object()
-        user = request.user
-        
-        favorite, created = Favorite.objects.get_or_create(user=user, movie=movie)
+        movie_id = movie_id_or_404(tmdb_id)
         
-        if not created:
-            favorite.delete()
+        # Toggle: xóa nếu có, không có thì insert (ON CONFLICT DO NOTHING khi double-click)
+        deleted, _ = Favorite.objects.filter(user=request.user, movie_id=movie_id).delete()
+        if deleted:
             return Response({'message': 'Removed from favorites'}, status=status.HTTP_200_OK)
         
+        bulk_upsert(
+            Favorite,
+            [{'user_id': request.user.pk, 'movie_id': movie_id, 'created_at': timezone.now()}],
+            unique_fields=('user', 'movie'),
+        )
+        
         return Response({'message': 'Added to favorites'}, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def watch(self, request, tmdb_id=None):
         """Đánh dấu đã xem"""
-        movie = self.get_object()
-        user = request.user
+        movie_id = movie_id_or_404(tmdb_id)
         
-        WatchHistory.objects.get_or_create(user=user, movie=movie)
+        # Xem lại thì cập nhật last_watched_at để lên đầu lịch sử
+        bulk_upsert(
+            WatchHistory,
+            # Lần xem đầu: cột NOT NULL phải có giá trị (default= của Django không áp dụng cho SQL thô)
+            [{
+                'user_id': request.user.pk, 'movie_id': movie_id, 'last_watched_at': timezone.now(),
+                'position_seconds': 0, 'finished': False,
+            }],
+            unique_fields=('user', 'movie'), set_fields=('last_watched_at',),
+        )
         
-        # Không tăng views ở đây - chỉ increment_view mới tăng
+        # Không tăng views ở đây - chỉ increment_view mới tăng; chỉ ghi play event cho trending
+        view_counter.record_watch(movie_id)
         return Response({'message': 'Marked as watched'}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def suggest(self, request):
+        """Gợi ý tên phim khi đang gõ (typeahead) - đọc từ prefix index trong bộ nhớ"""
+        query = request.GET.get('q', '')
+        limit = request.GET.get('limit', '')
+        limit = max(1, min(int(limit), 20)) if limit.isdigit() else 8
+        return Response(suggest_index.suggest(query, limit=limit))
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def facets(self, request):
+        """Số phim theo thể loại/quốc gia/năm cho sidebar lọc (theo bộ lọc hiện tại, có cache)"""
+        categories_param = request.GET.get('categories', '')
+        category_ids = [int(id) for id in categories_param.split(',') if id.isdigit()]
+        year_param = request.GET.get('release_year', '')
+        year = int(year_param) if year_param.isdigit() else None
+        return Response(facet_index.counts(category_ids, request.GET.get('country') or None, year))
+
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def top_rated(self, request):
         """Lấy phim có rating cao nhất"""
@@ -199,10 +267,21 @@ class MovieViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def trending(self, request):
-        """Lấy phim trending từ TMDB API"""
+        """Phim trending theo lượt xem gần đây (trending.py); chưa có dữ liệu thì lấy từ TMDB API"""
         window = request.GET.get('window', 'day')
         limit = int(request.GET.get('limit', 10))
         
+        ranked = trending_index.top(window, limit)
+        if ranked:
+            movies_by_id = Movie.objects.in_bulk([movie_id for movie_id, _ in ranked])
+            movies = [movies_by_id[movie_id] for movie_id, _ in ranked if movie_id in movies_by_id]
+            if len(movies) < limit:
+                # Ít play event (mới deploy / ngày vắng): bù chỗ trống bằng phim nhiều lượt xem nhất
+                backfill = Movie.objects.exclude(pk__in=[m.pk for m in movies]).order_by('-views')
+                movies += backfill[:limit - len(movies)]
+            serializer = MovieSerializer(movies, many=True)
+            return Response(serializer.data)
+        
         try:
             # Gọi TMDB API để lấy trending movies
             tmdb_url = f"{settings.TMDB_BASE_URL}/trending/movie/{window}"
@@ -348,9 +427,25 @@ class MovieViewSet(viewsets.ReadOnlyModelViewSet):
         movie = self.get_object()
         
         if request.method == 'GET':
-            # Chỉ lấy main comments (không có parent)
-            comments = Comment.objects.filter(movie=movie, parent=None).order_by('-created_at')
-            serializer = CommentSerializer(comments, many=True)
+            if 'cursor' in request.query_params:
+                # Infinite scroll: trang main comments, mỗi comment kèm reply_count + vài replies đầu
+                paginator = CommentThreadPagination()
+                roots = paginator.paginate_queryset(
+                    Comment.objects.filter(movie=movie, parent=None).select_related('user'), request
+                )
+                for c in roots:
+                    c.movie = movie
+                thread = CommentThread.for_page(roots, request.user, inline_replies_param(request))
+                serializer = CommentSerializer(
+                    thread.roots, many=True, context=thread.serializer_context({'request': request})
+                )
+                return paginator.get_paginated_response(serializer.data)
+
+            # Cả thread trong 1 query, trả về main comments (không có parent) kèm replies lồng nhau
+            thread = CommentThread.for_movie(movie, request.user)
+            serializer = CommentSerializer(
+                thread.roots, many=True, context=thread.serializer_context({'request': request})
+            )
             return Response(serializer.data)
         
         elif request.method == 'POST':
@@ -363,13 +458,49 @@ class MovieViewSet(viewsets.ReadOnlyModelViewSet):
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=True, methods=['post'], permission_classes=[AllowAny])
+    @action(detail=True, methods=['get', 'post'], permission_classes=[IsAuthenticated])
+    def progress(self, request, tmdb_id=None):
+        """Heartbeat vị trí xem (POST, ghi theo lô) / vị trí để xem tiếp (GET)"""
+        movie_id = movie_id_or_404(tmdb_id)
+        
+        if request.method == 'POST':
+            try:
+                position = int(float(request.data.get('position')))
+                duration = int(float(request.data.get('duration')))
+            except (TypeError, ValueError, OverflowError):  # thiếu / không phải số / nan / inf
+                return Response({'error': 'position and duration (seconds) are required'}, status=status.HTTP_400_BAD_REQUEST)
+            if duration <= 0 or not (0 <= position <= duration):
+                return Response({'error': 'position must be between 0 and duration'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            progress_buffer.record(request.user.pk, movie_id, position, duration)
+            return Response({'status': 'accepted'}, status=status.HTTP_202_ACCEPTED)
+        
+        # Heartbeat chưa ghi của worker này mới hơn DB
+        pending = progress_buffer.get(request.user.pk, movie_id)
+        if pending is not None:
+            entry = WatchHistory(position_seconds=pending[0], duration_seconds=pending[1], last_watched_at=pending[2])
+            entry.finished = pending[0] >= pending[1] * WatchHistory.FINISHED_RATIO
+        else:
+            entry = WatchHistory.objects.filter(user=request.user, movie_id=movie_id).first()
+        if entry is None:
+            return Response({'position_seconds': 0, 'duration_seconds': None, 'progress': 0, 'finished': False})
+        return Response({
+            'position_seconds': entry.position_seconds,
+            'duration_seconds': entry.duration_seconds,
+            'progress': entry.progress,
+            'finished': entry.finished,
+            'last_watched_at': entry.last_watched_at,
+        })
+
+    @action(detail=True, methods=['post'], permission_classes=[AllowAny], throttle_classes=[ViewIncrementThrottle])
     def increment_view(self, request, tmdb_id=None):
-        """Tăng lượt xem phim"""
+        """Tăng lượt xem phim (ghi DB theo lô, xem view_counter.py)"""
         movie = self.get_object()
-        movie.views += 1
-        movie.save(update_fields=['views'])
-        return Response({'status': 'success', 'views': movie.views})
+        if is_duplicate_view(request, movie.pk):
+            return Response({'status': 'duplicate', 'views': movie.views + view_counter.pending(movie.pk)})
+        pending = view_counter.increment(movie.pk)
+        # Xấp xỉ: giá trị trong DB + lượt xem worker này chưa ghi
+        return Response({'status': 'success', 'views': movie.views + pending})
 
     @action(detail=True, methods=['get'], permission_classes=[AllowAny])
     def recommendations(self, request, tmdb_id=None):
@@ -390,6 +521,8 @@ class MovieViewSet(viewsets.ReadOnlyModelViewSet):
 class CommentViewSet(viewsets.ModelViewSet):
     queryset = Comment.objects.all().order_by('-created_at')
     permission_classes = [IsOwnerOrReadOnly]
+    pagination_class = CommentResultsSetPagination
+    cursor_ordering = ('-created_at', '-id')
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -433,7 +566,41 @@ class CommentViewSet(viewsets.ModelViewSet):
             # For retrieve, update, delete actions, allow all comments
             queryset = queryset.order_by('-created_at')
         
-        return queryset
+        return queryset.select_related('user', 'movie', 'parent__user')
+
+    def get_thread_response(self, comment):
+        thread = CommentThread.for_roots([comment], self.request.user)
+        serializer = self.get_serializer(comment, context=thread.serializer_context(self.get_serializer_context()))
+        return Response(serializer.data)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        thread = CommentThread.for_roots(page if page is not None else queryset, request.user)
+        context = thread.serializer_context(self.get_serializer_context())
+        serializer = self.get_serializer(thread.roots, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_thread_response(self.get_object())
+
+    @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    def replies(self, request, pk=None):
+        """Replies trực tiếp của comment, cursor pagination; mỗi reply kèm reply_count + vài replies đầu"""
+        comment = self.get_object()
+        paginator = ReplyPagination()
+        page = paginator.paginate_queryset(
+            Comment.objects.filter(parent=comment).select_related('user', 'movie'), request
+        )
+        for c in page:
+            c.parent = comment
+        thread = CommentThread.for_page(page, request.user, inline_replies_param(request))
+        serializer = CommentSerializer(
+            thread.roots, many=True, context=thread.serializer_context(self.get_serializer_context())
+        )
+        return paginator.get_paginated_response(serializer.data)
 
     def perform_create(self, serializer):
         print(f"CommentViewSet.perform_create: Starting...")
@@ -451,23 +618,19 @@ class CommentViewSet(viewsets.ModelViewSet):
         if reaction not in ['like', 'dislike']:
             return Response({'error': 'Invalid reaction'}, status=status.HTTP_400_BAD_REQUEST)
         
-        CommentReaction.objects.update_or_create(
-            user=request.user, 
-            comment=comment, 
-            defaults={'reaction': reaction}
-        )
+        set_reaction(request.user, comment, reaction)
+        comment.refresh_from_db(fields=['likes_count', 'dislikes_count'])
         
-        serializer = self.get_serializer(comment)
-        return Response(serializer.data)
+        return self.get_thread_response(comment)
 
     @action(detail=True, methods=['delete'], permission_classes=[IsAuthenticated])
     def remove_reaction(self, request, pk=None):
         """Remove user's reaction from comment"""
         comment = self.get_object()
-        CommentReaction.objects.filter(user=request.user, comment=comment).delete()
+        remove_reaction(request.user, comment)
+        comment.refresh_from_db(fields=['likes_count', 'dislikes_count'])
         
-        serializer = self.get_serializer(comment)
-        return Response(serializer.data)
+        return self.get_thread_response(comment)
 
 # === RECOMMENDATION ENGINE VIEWS ===
 
@@ -479,61 +642,75 @@ class DashboardStatsView(APIView):
     permission_classes = [IsAdminUser]
     
     def get(self, request):
-        print(f"DEBUG: DashboardStatsView.get called by user: {request.user}")
-        print(f"DEBUG: User is_staff: {request.user.is_staff}")
-        print(f"DEBUG: User is_authenticated: {request.user.is_authenticated}")
-        
-        from django.utils import timezone
-        from datetime import date, timedelta
-        from django.db.models import Count
-        from django.db.models.functions import TruncDate
-        
-        today = date.today()
-        
-        # Get daily comment stats for last 7 days
-        daily_comments = []
-        daily_movies = []
-        daily_users = []
-        daily_ratings = []
-        
-        for i in range(6, -1, -1):  # Last 7 days (including today)
-            day = today - timedelta(days=i)
-            comment_count = Comment.objects.filter(created_at__date=day).count()
-            movie_count = Movie.objects.filter(created_at__date=day).count()
-            user_count = User.objects.filter(date_joined__date=day).count()
-            rating_count = Rating.objects.filter(created_at__date=day).count()
-            
-            daily_comments.append({
-                'date': day.strftime('%d/%m'),
-                'count': comment_count
-            })
-            daily_movies.append({
-                'date': day.strftime('%d/%m'),
-                'count': movie_count
-            })
-            daily_users.append({
-                'date': day.strftime('%d/%m'),
-                'count': user_count
-            })
-            daily_ratings.append({
-                'date': day.strftime('%d/%m'),
-                'count': rating_count
-            })
-        
-        stats = {
-            'total_movies': Movie.objects.count(),
-            'total_users': User.objects.count(),
-            'total_ratings': Rating.objects.count(),
-            'today_comments': Comment.objects.filter(created_at__date=today).count(),
-            'daily_comments': daily_comments,
-            'daily_movies': daily_movies,
-            'daily_users': daily_users,
-            'daily_ratings': daily_ratings,
-            'top_viewed_movies': list(Movie.objects.order_by('-views')[:5].values('title', 'views', 'poster')),
-        }
-        
-        print(f"DEBUG: Stats data prepared: {stats}")
-        return Response(stats)
+        # ?days=7|30|90; snapshot dùng chung giữa các tab admin, tính lại nền khi cũ (xem dashboard.py)
+        days = parse_window(request.GET.get('days'))
+        snapshot = dashboard_snapshots.get(days, lambda: self.build(days))
+        etag = f'"{snapshot["etag"]}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(snapshot['data'], headers=headers)
+
+    def build(self, days):
+        stats = build_dashboard_stats(days)
+        stats['trending_movies'] = self.trending_movies()
+        stats['generated_at'] = timezone.now()
+        return stats
+
+    def trending_movies(self):
+        """Top 5 tuần này theo điểm trending (lượt xem gần đây có suy giảm)"""
+        ranked = trending_index.top('week', 5)
+        movies_by_id = Movie.objects.in_bulk([movie_id for movie_id, _ in ranked])
+        return [
+            {
+                'title': movies_by_id[movie_id].title,
+                'views': movies_by_id[movie_id].views,
+                'poster': movies_by_id[movie_id].poster,
+                'score': round(score, 2),
+            }
+            for movie_id, score in ranked if movie_id in movies_by_id
+        ]
+
+class ThrottleStatsView(APIView):
+    """Số request bị throttle / lượt xem bị loại trùng theo từng scope"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'rates': api_settings.DEFAULT_THROTTLE_RATES,
+            'counters': throttle_counters(),
+        })
+
+class ChatStatsView(APIView):
+    """Chatbot: số message parse local / trúng cache / gọi LLM, độ trễ + circuit breaker của OpenAI (theo process)"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'backend': get_llm_backend().name,
+            'filters': filter_extractor.stats(),
+            'llm': openai_stats(),
+        })
+
+class ExportView(APIView):
+    """
+    Stream toàn bộ 1 bảng để phân tích offline: GET /api/admin/export/{dataset}/?output=csv|jsonl|parquet&gzip=1
+    dataset: movies | ratings | watch_history | favorites | comment_reactions (xem exports.py)
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, dataset):
+        fmt = request.GET.get('output', 'csv')
+        compress = request.GET.get('gzip', '').lower() in ('1', 'true', 'yes')
+        try:
+            stream = exports.export(dataset, fmt, compress)
+        except exports.ExportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(stream, content_type=exports.content_type(fmt, compress))
+        response['Content-Disposition'] = f'attachment; filename="{exports.filename(dataset, fmt, compress)}"'
+        response['Cache-Control'] = 'no-store'
+        return response
 
 class FetchTMDBView(APIView):
     """API để tìm kiếm phim trên TMDB"""
@@ -609,9 +786,14 @@ SEARCH_TOOLS = [
     }
 ]
 
+def sse_event(event, data):
+    """1 sự kiện Server-Sent Events, data dạng JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 class ChatAPIView(APIView):
     """AI movie chatbot thông minh: Kết hợp Function Calling (Lọc chính xác) và Embeddings (Tìm ngữ nghĩa)"""
     permission_classes = [AllowAny]
+    throttle_classes = [ChatThrottle]
 
     # Giữ lại encoder cho trường hợp fallback
     MODEL_NAME = "all-MiniLM-L6-v2"
@@ -627,6 +809,8 @@ class ChatAPIView(APIView):
 
     EMB_IDS, EMB_MATRIX = load_embeddings()
 
+    NO_RESULTS_REPLY = "Xin lỗi, mình không tìm thấy phim nào phù hợp với yêu cầu cụ thể này. Bạn thử từ khóa khác xem sao nhé!"
+
     def post(self, request):
         message = (request.data.get("message") or "").strip()
         history = request.data.get("history") or []
@@ -634,63 +818,56 @@ class ChatAPIView(APIView):
         if not message:
             return Response({"error": "Empty message"}, status=status.HTTP_400_BAD_REQUEST)
 
-        movies = []
-        ai_reply_text = ""
-        
-        # --- BƯỚC 1: HỎI AI XEM USER MUỐN GÌ (Function Calling) ---
-        # Prepare an analysis prompt asking the model to return a JSON with filter fields
-        msgs_analysis = [
-            {"role": "system", "content": "Bạn là một trợ lý giúp trích xuất thông tin lọc phim từ câu truy vấn.\nTrả về một JSON object với các khóa: genres (array of strings), country (string), year (integer or null), keyword (string or null). Nếu không có, trả về {}."},
-            {"role": "user", "content": message}
-        ]
+        # Thời gian từng bước trả về trong header Server-Timing (đo overhead của mình, tách khỏi LLM)
+        timer = Timer()
+        movies = self.find_movies(message, timer)
 
-        analysis_result = None
-        if openai_has_key():
-            try:
-                analysis_text = chat_completion(msgs_analysis, max_tokens=200, temperature=0.0)
-                # Try to parse JSON out of the model output
-                import re, json as _json
-                # Attempt to find a JSON object in the text
-                m = re.search(r"\{[\s\S]*\}", analysis_text)
-                if m:
-                    parsed = _json.loads(m.group(0))
-                else:
-                    # Last resort: try to interpret the whole text as JSON
-                    parsed = _json.loads(analysis_text)
-
-                # Normalize parsed result
-                args = {
-                    'genres': parsed.get('genres') or [],
-                    'country': parsed.get('country'),
-                    'year': parsed.get('year'),
-                    'keyword': parsed.get('keyword')
-                }
-                analysis_result = {'type': 'tool', 'data': {'arguments': _json.dumps(args)}}
-            except Exception as e:
-                print(f"analysis parse error: {e}")
-                analysis_result = None
+        # "stream": true -> Server-Sent Events: danh sách phim trước, câu trả lời stream dần sau
+        if str(request.data.get("stream") or request.query_params.get("stream") or "").lower() in ("1", "true", "yes"):
+            response = self.stream_response(message, movies)
+        # --- BƯỚC 3: TẠO CÂU TRẢ LỜI TỰ NHIÊN ---
+        elif not movies:
+            response = Response({"reply": self.NO_RESULTS_REPLY, "movies": []})
+        else:
+            reply = timer.run('reply', lambda: self.reply_text(message, movies))
+            response = Response({"reply": reply, "movies": movies})
+
+        response["Server-Timing"] = ", ".join(f"{name};dur={ms}" for name, ms in timer.timings.items())
+        return response
+
+    def find_movies(self, message, timer=None):
+        timer = timer or Timer()
+        # --- BƯỚC 1: HỎI AI XEM USER MUỐN GÌ ---
+        # Cache theo message + gộp các request trùng đang chờ; LLM chậm/lỗi -> KeywordExtractor (xem chat_filters.py)
+        args, filter_source = timer.run('filters', lambda: filter_extractor.extract(message))
+        return timer.run('retrieval', lambda: self.search_movies(message, args, filter_source))
+
+    def search_movies(self, message, args, filter_source):
+        """Lọc chính xác theo bộ lọc, rỗng thì tìm theo embeddings; trả list dict phim"""
+        movies = []
 
         # --- BƯỚC 2: XỬ LÝ KẾT QUẢ TỪ AI ---
         used_strict_filter = False
         
         # TRƯỜNG HỢP A: AI phát hiện bộ lọc (VD: "Phim hoạt hình hành động Nhật")
-        if analysis_result and analysis_result['type'] == 'tool':
+        if has_chat_filters(args):
             try:
-                args = json.loads(analysis_result['data']['arguments'])
-                print(f"AI Filters Detected: {args}") # Debug xem AI lọc gì
+                logger.debug("Chat filters (%s): %s", filter_source, args)
 
                 queryset = Movie.objects.all().order_by('-views')
 
-                # 1. Lọc Quốc gia
+                # 1. Lọc Quốc gia (AI có thể trả "Nhật Bản" -> map về tên lưu trong DB "Japan")
                 if args.get('country'):
-                    queryset = queryset.filter(country__name__icontains=args['country'])
+                    country = extractor.resolve_country(args['country']) or args['country']
+                    queryset = queryset.filter(country__name_normalized=normalize_text(country))
 
                 # 2. Lọc Thể loại (QUAN TRỌNG: Logic AND - Lọc lồng nhau)
                 genres = args.get('genres', [])
                 if genres:
                     for genre in genres:
                         # Mỗi lần loop là thu hẹp phạm vi lại (AND)
-                        queryset = queryset.filter(categories__name__icontains=genre)
+                        genre = extractor.resolve_genre(genre) or genre
+                        queryset = queryset.filter(categories__name_normalized=normalize_text(genre))
 
                 # 3. Lọc Năm
                 if args.get('year'):
@@ -698,24 +875,20 @@ class ChatAPIView(APIView):
                 
                 # 4. Lọc keyword (nếu có)
                 if args.get('keyword'):
-                    queryset = queryset.filter(title__icontains=args['keyword'])
+                    queryset = filter_title(queryset, args['keyword'])
 
-                # Lấy kết quả
-                found_movies = queryset.distinct()[:8]
-                
-                # Chuyển đổi sang list dict
-                for m in found_movies:
-                    movies.append(self._format_movie(m))
+                # Lấy kết quả: tmdb_id theo thứ tự rồi hydrate 1 lượt (categories prefetch)
+                movies = hydrate_movies(queryset.distinct().values_list('tmdb_id', flat=True)[:8])
                 
                 used_strict_filter = True
                 
-            except Exception as e:
-                print(f"Filter Error: {e}")
+            except Exception:
+                logger.exception("Chat filter query failed, using embeddings")
 
         # TRƯỜNG HỢP B: AI không tìm thấy bộ lọc HOẶC kết quả rỗng -> Dùng Embeddings (Fallback)
         # (Ví dụ: "Phim nào xem buồn khóc?")
         if not movies:
-            print("Using Embeddings Fallback...")
+            logger.debug("Chat: no strict-filter results, using embeddings")
             encoder = self.get_encoder()
             tmdb_ids = []
             if encoder is not None and ChatAPIView.EMB_IDS.size:
@@ -723,57 +896,64 @@ class ChatAPIView(APIView):
                 ids_arr, sims = get_top_k(query_embedding, k=6)
                 tmdb_ids = [int(x) for x in ids_arr.tolist()] if hasattr(ids_arr, "tolist") else []
             
-            if tmdb_ids:
-                # Dùng IN query để lấy phim từ embeddings
-                qs = Movie.objects.filter(tmdb_id__in=tmdb_ids)
-                # Sắp xếp lại theo thứ tự độ tương đồng (quan trọng)
-                from django.db.models import Case, When
-                preserved_order = Case(*[When(tmdb_id=pk, then=pos) for pos, pk in enumerate(tmdb_ids)])
-                qs = qs.order_by(preserved_order)
-                
-                for m in qs:
-                    movies.append(self._format_movie(m))
+            # Giữ thứ tự độ tương đồng (quan trọng) - hydrate_movies sắp lại trong Python
+            movies = hydrate_movies(tmdb_ids)
 
-        # --- BƯỚC 3: TẠO CÂU TRẢ LỜI TỰ NHIÊN ---
-        if not movies:
-            return Response({
-                "reply": "Xin lỗi, mình không tìm thấy phim nào phù hợp với yêu cầu cụ thể này. Bạn thử từ khóa khác xem sao nhé!", 
-                "movies": []
-            })
+        return movies
 
-        # Xây dựng prompt để AI chém gió dựa trên list phim tìm được
+    def reply_messages(self, message, movies):
+        """Prompt để AI chém gió dựa trên list phim tìm được"""
         prompt_lines = [
             "Bạn là trợ lý gợi ý phim.",
             f"User hỏi: \"{message}\"",
             f"Hệ thống đã tìm thấy {len(movies)} phim phù hợp nhất:",
         ]
         for i, m in enumerate(movies, 1):
-             prompt_lines.append(f"{i}. {m['title']} ({m['release_year']}) - {', '.join(m['categories'])}")
+            prompt_lines.append(f"{i}. {m['title']} ({m['release_year']}) - {', '.join(m['categories'])}")
         
         prompt_lines.append("\nHãy viết câu trả lời ngắn gọn (tiếng Việt) giới thiệu các phim trên.")
+        return [{"role": "user", "content": "\n".join(prompt_lines)}]
 
-        # Gọi OpenAI lần cuối để generate text (không dùng tools nữa)
-        if openai_has_key():
-             # Gọi hàm cũ (chat_completion) hoặc hàm mới đều được, miễn là ra text
-             # Ở đây tôi giả sử bạn dùng hàm chat_completion thường cho việc generate text
-            from .openai_client import chat_completion 
-            msgs_final = [{"role": "user", "content": "\n".join(prompt_lines)}]
-            ai_reply_text = chat_completion(msgs_final, max_tokens=300)
-        else:
-            ai_reply_text = f"Dựa trên yêu cầu, mình tìm thấy: {', '.join([m['title'] for m in movies])}."
-
-        return Response({"reply": ai_reply_text, "movies": movies})
-
-    def _format_movie(self, m):
-        """Helper để format JSON phim"""
-        return {
-            "tmdb_id": m.tmdb_id,
-            "title": m.title,
-            "overview": (m.description or "")[:300],
-            "release_year": m.release_year,
-            "poster": m.poster,
-            "categories": list(m.categories.values_list("name", flat=True))
-        }
+    def template_reply(self, movies):
+        """Câu trả lời không cần LLM"""
+        return f"Dựa trên yêu cầu, mình tìm thấy: {', '.join([m['title'] for m in movies])}."
+
+    def reply_text(self, message, movies):
+        # Gọi LLM lần cuối để generate text; lỗi / không có key -> câu trả lời mẫu
+        llm = get_llm_backend()
+        if llm.available():
+            try:
+                return llm.complete(self.reply_messages(message, movies), max_tokens=300)
+            except Exception as e:
+                logger.warning("Chat reply failed, using template reply: %s", e)
+        return self.template_reply(movies)
+
+    def stream_response(self, message, movies):
+        """
+        text/event-stream: `movies` ngay khi tìm xong, rồi các `token` của câu trả lời khi LLM sinh ra,
+        cuối cùng `done` kèm câu trả lời đầy đủ. LLM lỗi / không có key -> 1 token là câu trả lời mẫu.
+        """
+        def events():
+            yield sse_event("movies", {"movies": movies})
+            parts = []
+            llm = get_llm_backend()
+            if movies and llm.available():
+                try:
+                    for delta in llm.stream(self.reply_messages(message, movies), max_tokens=300):
+                        parts.append(delta)
+                        yield sse_event("token", {"text": delta})
+                except Exception as e:
+                    logger.warning("Chat stream failed, using template reply: %s", e)
+            if not parts:
+                text = self.template_reply(movies) if movies else self.NO_RESULTS_REPLY
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+            yield sse_event("done", {"reply": "".join(parts)})
+
+        response = StreamingHttpResponse(events(), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx: không buffer SSE
+        return response
 
 class EpisodeViewSet(viewsets.ModelViewSet):
     """API cho Admin quản lý (CRUD) các tập phim"""
@@ -787,6 +967,7 @@ class AdminMovieViewSet(viewsets.ModelViewSet):
     serializer_class = AdminMovieSerializer
     permission_classes = [IsAdminUser]
     pagination_class = StandardResultsSetPagination
+    cursor_ordering = ('-created_at', '-id')
     filter_backends = [SearchFilter, DjangoFilterBackend]
     search_fields = ['title', 'tmdb_id', 'id']
     filterset_fields = ['id', 'tmdb_id']
@@ -799,6 +980,7 @@ class AdminCategoryViewSet(viewsets.ModelViewSet):
     filter_backends = [SearchFilter]
     search_fields = ['name']
     pagination_class = StandardResultsSetPagination
+    cursor_ordering = ('name', 'id')
 
 class AdminActorViewSet(viewsets.ModelViewSet):
     """API cho Admin quản lý (CRUD) diễn viên"""
@@ -808,6 +990,7 @@ class AdminActorViewSet(viewsets.ModelViewSet):
     filter_backends = [SearchFilter]
     search_fields = ['name']
     pagination_class = StandardResultsSetPagination
+    cursor_ordering = ('name', 'id')
 
 class AdminCountryViewSet(viewsets.ModelViewSet):
     """API cho Admin quản lý (CRUD) quốc gia"""
@@ -817,6 +1000,7 @@ class AdminCountryViewSet(viewsets.ModelViewSet):
     filter_backends = [SearchFilter]
     search_fields = ['name']
     pagination_class = StandardResultsSetPagination
+    cursor_ordering = ('name', 'id')
 
 class AdminUserViewSet(viewsets.ModelViewSet):
     """API cho Admin/Staff quản lý users - Admin thấy tất cả, Staff chỉ thấy user thường"""
@@ -825,6 +1009,7 @@ class AdminUserViewSet(viewsets.ModelViewSet):
     filter_backends = [SearchFilter]
     search_fields = ['username', 'email', 'nickname']
     pagination_class = StandardResultsSetPagination
+    cursor_ordering = ('-date_joined', '-id')
     
     def get_queryset(self):
         """Filter users based on current user role"""
@@ -880,20 +1065,23 @@ class AdminUserViewSet(viewsets.ModelViewSet):
     def watch_history(self, request, pk=None):
         """Get user watch history"""
         user = self.get_object()
-        history = WatchHistory.objects.filter(user=user).order_by('-last_watched_at')[:50]
+        history = WatchHistory.objects.filter(user=user).select_related('movie').order_by('-last_watched_at')[:50]
         data = [{
             'movie_title': item.movie.title,
             'movie_poster': item.movie.poster,
             'watched_at': item.last_watched_at,
-            'progress': 100  # Default progress since field doesn't exist
+            'progress': item.progress,
+            'position_seconds': item.position_seconds,
         } for item in history]
         return Response(data)
 
 class AdminCommentViewSet(viewsets.ModelViewSet):
     """API cho Admin quản lý comments - Chỉ superuser được truy cập"""
-    queryset = Comment.objects.all().order_by('-created_at')
+    queryset = Comment.objects.select_related('user', 'movie', 'parent__user').order_by('-created_at')
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
+    pagination_class = CommentResultsSetPagination
+    cursor_ordering = ('-created_at', '-id')
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -902,14 +1090,11 @@ class AdminCommentViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def delete_comment(self, request, pk=None):
-        """Xóa comment và tất cả replies"""
+        """Xóa comment và tất cả replies (mọi cấp)"""
         comment = self.get_object()
         
-        # Xóa tất cả replies trước
-        Comment.objects.filter(parent=comment).delete()
-        
-        # Xóa comment chính
-        comment.delete()
+        # Cả subtree trong 1 range query trên Comment.path
+        comment.subtree().delete()
         
         return Response({'status': 'comment deleted successfully'})
     
@@ -931,6 +1116,12 @@ class CountryViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ['name']
     pagination_class = None  # Disable pagination completely to return all countries
 
+    def list(self, request, *args, **kwargs):
+        # Không có search/filter -> trả danh sách từ facet cache (không đọc bảng mỗi lần load trang)
+        if not any(p in request.query_params for p in ('search', 'name')):
+            return Response([{'id': c['id'], 'name': c['name']} for c in facet_index.countries()])
+        return super().list(request, *args, **kwargs)
+
 
 class YearViewSet(viewsets.ReadOnlyModelViewSet):
     """API để lấy danh sách năm phát hành phim"""
@@ -938,12 +1129,5 @@ class YearViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None  # Disable pagination completely to return all years
     
     def list(self, request):
-        # Get distinct years from movies
-        years = Movie.objects.values_list('release_year', flat=True).filter(
-            release_year__isnull=False
-        ).distinct().order_by('-release_year')
-        
-        # Convert to list of integers and filter valid years
-        year_list = [int(year) for year in years if year and 1900 <= year <= 2030]
-        
-        return Response(year_list)
+        # Distinct years (1900-2030, mới nhất trước) lấy từ facet cache
+        return Response(facet_index.years())
@@ -0,0 +1,71 @@
+"""
+Watch progress heartbeats.
+
+The player posts its position every few seconds. Heartbeats are coalesced per
+(user, movie) in a per-worker buffer (latest position wins) and persisted with
+one bulk INSERT ... ON CONFLICT DO UPDATE on WatchHistory from a daemon timer
+thread WATCH_PROGRESS_FLUSH_INTERVAL seconds after the first buffered heartbeat,
+and at exit, so "continue watching" lags the player by at most one interval
+(timer / retry machinery in write_behind.py).
+"""
+import atexit
+
+from django.utils import timezone
+
+from .upserts import bulk_upsert
+from .write_behind import WriteBehindBuffer
+
+
+class ProgressBuffer(WriteBehindBuffer):
+    """Gom heartbeat vị trí xem, chỉ giữ vị trí mới nhất của mỗi (user, movie)"""
+    interval_setting = 'WATCH_PROGRESS_FLUSH_INTERVAL'
+    default_interval = 15
+
+    def __init__(self):
+        super().__init__()
+        self._pending = {}
+
+    def record(self, user_id, movie_id, position, duration=None):
+        with self._lock:
+            self._pending[(user_id, movie_id)] = (position, duration, timezone.now())
+            self._schedule()
+
+    def get(self, user_id, movie_id):
+        """(position, duration, at) đang chờ ghi của worker này, hoặc None"""
+        return self._pending.get((user_id, movie_id))
+
+    def _swap(self):
+        batch, self._pending = self._pending, {}
+        return batch
+
+    def _restore(self, batch):
+        for key, value in batch.items():
+            self._pending.setdefault(key, value)  # heartbeat mới hơn (nếu có) được giữ
+
+    def _size(self, batch):
+        return len(batch)
+
+    def _write(self, batch):
+        from .models import WatchHistory
+
+        rows = [
+            {
+                'user_id': user_id,
+                'movie_id': movie_id,
+                'position_seconds': position,
+                'duration_seconds': duration,
+                'finished': bool(duration) and position >= duration * WatchHistory.FINISHED_RATIO,
+                'last_watched_at': at,
+            }
+            for (user_id, movie_id), (position, duration, at) in batch.items()
+        ]
+        bulk_upsert(
+            WatchHistory, rows,
+            unique_fields=('user', 'movie'),
+            set_fields=('position_seconds', 'duration_seconds', 'finished', 'last_watched_at'),
+        )
+
+
+# Singleton instance
+progress_buffer = ProgressBuffer()
+atexit.register(progress_buffer.flush)
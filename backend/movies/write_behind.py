@@ -0,0 +1,84 @@
+"""
+Shared machinery for the per-worker write-behind buffers (view_counter.py, watch_progress.py).
+
+A subclass keeps its pending data under self._lock and calls self._schedule() when
+it buffers something. A daemon timer then flushes once, `interval` seconds after the
+first buffered item, so an idle worker does not hold data; flush() at interpreter exit
+covers the rest. Only one thread flushes at a time (others keep buffering into a
+fresh batch); a failed write puts the batch back and retries one interval later.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+
+class WriteBehindBuffer:
+    """
+    Base của buffer ghi sau. Subclass cài:
+    - _swap(): lấy batch đang chờ và để buffer rỗng (gọi khi đang giữ _lock)
+    - _restore(batch): trả batch ghi lỗi vào buffer (gọi khi đang giữ _lock)
+    - _size(batch): số mục của batch (0 = không có gì để ghi), flush() trả về giá trị này
+    - _write(batch): ghi DB
+    """
+    interval_setting = None
+    default_interval = 5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._logger = logging.getLogger(type(self).__module__)
+
+    def flush(self) -> int:
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self._lock:
+                batch = self._swap()
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            size = self._size(batch)
+            if not size:
+                return 0
+            try:
+                self._write(batch)
+            except Exception:
+                self._logger.exception("%s flush failed, keeping %d items buffered", type(self).__name__, size)
+                with self._lock:
+                    self._restore(batch)
+                    self._schedule()  # thử lại sau 1 interval
+                return 0
+            return size
+        finally:
+            self._flush_lock.release()
+
+    def _schedule(self):
+        """Hẹn flush sau interval giây nếu chưa hẹn (gọi khi đang giữ _lock)"""
+        if self._timer is None:
+            self._timer = threading.Timer(self._interval(), self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()  # connection DB của thread timer
+
+    def _interval(self):
+        return getattr(settings, self.interval_setting, self.default_interval)
+
+    def _swap(self):
+        raise NotImplementedError
+
+    def _restore(self, batch):
+        raise NotImplementedError
+
+    def _size(self, batch) -> int:
+        raise NotImplementedError
+
+    def _write(self, batch):
+        raise NotImplementedError
@@ -6,4 +6,10 @@ class User(AbstractUser):
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
     nickname = models.CharField(max_length=100, null=True, blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
-    country = models.CharField(max_length=100, null=True, blank=True)
\ No newline at end of file
+    country = models.CharField(max_length=100, null=True, blank=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Thống kê dashboard: user mới theo ngày (WHERE date_joined >= ?)
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
\ No newline at end of file
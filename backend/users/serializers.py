@@ -70,7 +70,18 @@ class WatchHistorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = WatchHistory
-        fields = ("movie", "last_watched_at")
+        fields = ("movie", "last_watched_at", "position_seconds", "duration_seconds", "progress")
+
+
+class ContinueWatchingSerializer(serializers.ModelSerializer):
+    """Bản gọn cho hàng "Xem tiếp": chỉ cần movie đã select_related, không query thêm"""
+    tmdb_id = serializers.IntegerField(source="movie.tmdb_id", read_only=True)
+    title = serializers.CharField(source="movie.title", read_only=True)
+    poster = serializers.CharField(source="movie.poster", read_only=True)
+
+    class Meta:
+        model = WatchHistory
+        fields = ("tmdb_id", "title", "poster", "position_seconds", "duration_seconds", "progress", "last_watched_at")
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
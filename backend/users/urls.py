@@ -5,6 +5,7 @@ from .views import (
         ChangePasswordView,
         RegisterView,
         MyHistoryView,
+        ContinueWatchingView,
         ProfileView,
         GoogleOAuthView)
 from .views_custom import CustomTokenObtainPairView
@@ -22,4 +23,5 @@ urlpatterns = [
     path('profile/comments/', MyCommentsView.as_view(), name='my-comments'),
     path('profile/change-password/', ChangePasswordView.as_view(), name='change-password'),
     path('profile/history/', MyHistoryView.as_view(), name='my-history'),
+    path('profile/continue-watching/', ContinueWatchingView.as_view(), name='continue-watching'),
 ]
\ No newline at end of file
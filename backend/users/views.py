@@ -5,10 +5,12 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import RegisterSerializer
 # Thêm các import mới
-from .serializers import UserRatingSerializer, ChangePasswordSerializer, WatchHistorySerializer, UserProfileSerializer, FavoriteSerializer
+from .serializers import UserRatingSerializer, ChangePasswordSerializer, WatchHistorySerializer, UserProfileSerializer, FavoriteSerializer, ContinueWatchingSerializer
 from movies.serializers import CommentSerializer # Import từ app 'movies'
 from movies.models import Rating, Comment, WatchHistory, Favorite # Import model từ app 'movies'
+from movies.comment_threads import CommentThread
 from .models import User
+from django.db.models import Avg
 import requests
 import json
 import os
@@ -45,7 +47,7 @@ class MyCommentsView(generics.ListAPIView):
     def get_queryset(self):
         # Lọc ra các Comment chỉ thuộc về user đang gửi request
         user = self.request.user
-        return Comment.objects.filter(user=user).order_by('-created_at')
+        return Comment.objects.filter(user=user).select_related('user', 'movie', 'parent__user').order_by('-created_at')
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -53,6 +55,16 @@ class MyCommentsView(generics.ListAPIView):
         context['include_replies'] = False
         return context
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        # Reactions của cả trang lấy trong 1 query GROUP BY
+        thread = CommentThread.for_roots(page if page is not None else queryset, request.user, include_replies=False)
+        serializer = self.get_serializer(thread.roots, many=True, context=thread.serializer_context(self.get_serializer_context()))
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
 class ChangePasswordView(generics.UpdateAPIView):
     """
     API: PUT /api/auth/profile/change-password/
@@ -97,7 +109,54 @@ class MyHistoryView(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return WatchHistory.objects.filter(user=user).order_by('-last_watched_at')
+        # Chỉ giữ WATCH_HISTORY_KEEP mục gần nhất (manage.py compact_watch_history), đọc theo index (user, -last_watched_at)
+        return (
+            WatchHistory.objects.filter(user=user)
+            .select_related('movie__country')
+            .prefetch_related('movie__categories')
+            .order_by('-last_watched_at')
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        items = page if page is not None else list(queryset)
+        movie_ids = [item.movie_id for item in items]
+        # Điểm trung bình và yêu thích của cả trang: 2 query thay vì 2 query mỗi phim
+        averages = dict(
+            Rating.objects.filter(movie_id__in=movie_ids).order_by()
+            .values('movie_id').annotate(avg=Avg('stars')).values_list('movie_id', 'avg')
+        )
+        for item in items:
+            item.movie.avg_rating = averages.get(item.movie_id)
+        context = self.get_serializer_context()
+        context['favorite_movie_ids'] = set(
+            Favorite.objects.filter(user=request.user, movie_id__in=movie_ids).values_list('movie_id', flat=True)
+        )
+        serializer = self.get_serializer(items, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+
+class ContinueWatchingView(generics.ListAPIView):
+    """
+    API: GET /api/auth/profile/continue-watching/
+    Phim user đang xem dở (chưa xem hết), mới nhất trước, kèm vị trí để xem tiếp.
+    1 query trên partial index watchhistory_continue_idx.
+    """
+    serializer_class = ContinueWatchingSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        limit = self.request.query_params.get('limit', '')
+        limit = min(int(limit), 50) if limit.isdigit() else 20
+        return (
+            WatchHistory.objects.filter(user=self.request.user, finished=False, position_seconds__gt=0)
+            .select_related('movie')
+            .order_by('-last_watched_at')[:limit]
+        )
 
 
 class ProfileView(generics.RetrieveUpdateAPIView):
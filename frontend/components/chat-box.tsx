@@ -44,15 +44,49 @@ export default function ChatBox() {
       const res = await fetch(`${API_BASE}/chat/`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ message: text, history: historyToSend }),
+        body: JSON.stringify({ message: text, history: historyToSend, stream: true }),
       })
-      const data = await res.json()
-      const botMsg: ChatMessage = {
-        role: "bot",
-        text: data.reply || "Không có câu trả lời.",
-        movies: data.movies || [],
+
+      // Server trả JSON (lỗi, throttle...) thay vì stream
+      if (!res.body || !(res.headers.get("content-type") || "").includes("text/event-stream")) {
+        const data = await res.json()
+        const botMsg: ChatMessage = {
+          role: "bot",
+          text: data.reply || "Không có câu trả lời.",
+          movies: data.movies || [],
+        }
+        setMessages((m) => [...m, botMsg])
+        return
+      }
+
+      // SSE: "movies" đến ngay khi tìm xong, sau đó từng "token" của câu trả lời, cuối cùng "done"
+      setMessages((m) => [...m, { role: "bot", text: "", movies: [] }])
+      const updateBot = (patch: (msg: ChatMessage) => ChatMessage) =>
+        setMessages((m) => [...m.slice(0, -1), patch(m[m.length - 1])])
+
+      const reader = res.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ""
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const events = buffer.split("\n\n")
+        buffer = events.pop() || ""
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1]
+          const payload = raw.match(/^data: (.*)$/m)?.[1]
+          if (!event || !payload) continue
+          const data = JSON.parse(payload)
+          if (event === "movies") {
+            updateBot((msg) => ({ ...msg, movies: data.movies || [] }))
+          } else if (event === "token") {
+            updateBot((msg) => ({ ...msg, text: msg.text + data.text }))
+          } else if (event === "done") {
+            updateBot((msg) => ({ ...msg, text: data.reply || msg.text || "Không có câu trả lời." }))
+          }
+        }
       }
-      setMessages((m) => [...m, botMsg])
     } catch (err) {
       setMessages((m) => [...m, { role: "bot", text: "Lỗi kết nối tới server." }])
     } finally {
@@ -155,7 +189,7 @@ export default function ChatBox() {
                 </div>
               </div>
             ))}
-            {loading && (
+            {loading && messages[messages.length - 1]?.role !== "bot" && (
               <div className="flex justify-start">
                 <div className="bg-muted rounded-lg rounded-bl-none px-3 py-2">
                   <div className="flex gap-1">